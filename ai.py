@@ -0,0 +1,410 @@
+"""Компьютерный противник: negamax с альфа-бета отсечением и таблицей транспозиций.
+
+Поиск идет по настоящим тактам падения: в каждой точке решения фигура
+находится в зоне перемещения и может сдвинуться влево, остаться или
+сдвинуться вправо (как в Game.request_move()). Ниже зоны перемещения выбора
+нет, поэтому такие такты проматываются без ветвления.
+"""
+
+import random
+import threading
+import time
+
+from engine import GRID_WIDTH, GRID_HEIGHT, MOVE_ZONE_ROWS, WIN_LENGTH, PIECES, STAY, DROP
+
+# Оценки позиций
+WIN_SCORE = 1000000
+INFINITY = 10 ** 9
+WINDOW_SCORES = (0, 1, 8, 60)  # вес окна с 0..3 своими фигурами
+
+# Типы записей в таблице транспозиций
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+def _build_windows():
+    """Все окна из WIN_LENGTH клеток внутри зоны размещения"""
+    windows = []
+    for row in range(MOVE_ZONE_ROWS, GRID_HEIGHT):
+        for col in range(GRID_WIDTH):
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row = row + dr * (WIN_LENGTH - 1)
+                end_col = col + dc * (WIN_LENGTH - 1)
+                if end_row < GRID_HEIGHT and 0 <= end_col < GRID_WIDTH:
+                    windows.append(tuple((row + dr * k, col + dc * k) for k in range(WIN_LENGTH)))
+    return windows
+
+
+WINDOWS = _build_windows()
+
+
+class Zobrist:
+    """Случайные 64-битные ключи для фигур на доске и падающей фигуры"""
+    def __init__(self, seed=20240601):
+        rng = random.Random(seed)
+
+        def table():
+            return {piece: [[rng.getrandbits(64) for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+                    for piece in PIECES.values()}
+
+        self.cells = table()    # фиксированные фигуры
+        self.falling = table()  # падающая фигура
+
+    def key(self, core):
+        """Полный ключ позиции (инкрементальные обновления делает поиск)"""
+        key = 0
+        for row in range(GRID_HEIGHT):
+            for col, piece in enumerate(core.board[row]):
+                if piece:
+                    key ^= self.cells[piece][row][col]
+        piece = core.current_piece
+        if piece:
+            key ^= self.falling[piece['type']][piece['row']][piece['col']]
+        return key
+
+
+class SearchTimeout(Exception):
+    """Время на ход вышло или поиск отменен"""
+
+
+class AlphaBetaAI:
+    """Итеративное углубление negamax с ограниченной таблицей транспозиций"""
+    def __init__(self, time_budget=0.3, table_size=1 << 18, max_depth=40, tablebase=None):
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.zobrist = Zobrist()
+
+        # Таблица эндшпиля (tablebase.Tablebase): позиции из нее не ищутся
+        self.tablebase = tablebase
+
+        # Таблица фиксированного размера (степень двойки), слот = ключ & маска
+        self.table_size = table_size
+        self.table_mask = table_size - 1
+        self.table = [None] * table_size
+        self.generation = 0
+
+        self._deadline = None
+        self._cancelled = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Сброс накопленной статистики"""
+        self.nodes = 0
+        self.search_time = 0.0
+        self.table_probes = 0
+        self.table_hits = 0
+        self.table_stores = 0
+        self.table_replacements = 0
+        self.tablebase_hits = 0
+        self.last_depth = 0
+        self.last_value = 0
+
+    def stats(self):
+        """Статистика для настройки: узлы в секунду и попадания в таблицу"""
+        return {
+            'nodes': self.nodes,
+            'nodes_per_sec': self.nodes / self.search_time if self.search_time else 0.0,
+            'table_probes': self.table_probes,
+            'table_hits': self.table_hits,
+            'table_hit_rate': self.table_hits / self.table_probes if self.table_probes else 0.0,
+            'table_stores': self.table_stores,
+            'table_replacements': self.table_replacements,
+            'tablebase_hits': self.tablebase_hits,
+            'depth': self.last_depth,
+            'value': self.last_value
+        }
+
+    def cancel(self, cancelled=True):
+        """Прервать текущий поиск (из другого потока); cancel(False) снимает отмену для analyze()"""
+        self._cancelled = cancelled
+
+    def choose_action(self, core):
+        """Лучший сдвиг для падающей фигуры в позиции core"""
+        piece = core.current_piece
+        if core.game_over or piece['row'] >= MOVE_ZONE_ROWS:
+            return STAY
+
+        actions = core.legal_actions()
+        if len(actions) == 1:
+            return actions[0]
+
+        # Точный ответ из таблицы эндшпиля
+        if self.tablebase is not None:
+            known = self.tablebase.lookup(core)
+            if known:
+                self.tablebase_hits += 1
+                return known[1]
+
+        start = time.perf_counter()
+        self._deadline = start + self.time_budget
+        self._cancelled = False
+        self.generation += 1
+        root_key = self.zobrist.key(core)
+        best_action = STAY
+
+        try:
+            for depth in range(1, self.max_depth + 1):
+                value, action = self._search_root(core, root_key, depth)
+                best_action = action
+                self.last_depth = depth
+                self.last_value = value
+                # Найден форсированный результат - глубже искать незачем
+                if abs(value) >= WIN_SCORE - self.max_depth:
+                    break
+        except SearchTimeout:
+            pass
+        finally:
+            self.search_time += time.perf_counter() - start
+
+        return best_action
+
+    def analyze(self, core, report=None, max_depth=None):
+        """Оценки всех сдвигов падающей фигуры с итеративным углублением (для подсказок).
+
+        В отличие от choose_action() времени не отводится: анализ идет до
+        max_depth, до форсированного результата по всем сдвигам или до
+        cancel(). Флаг отмены здесь не сбрасывается - это делает вызывающий
+        через cancel(False), пока еще не выбрал позицию для анализа.
+        После каждой глубины вызывается report(depth, values); если он вернул
+        False, анализ прекращается. Возвращает {действие: оценка} последней
+        завершенной глубины с точки зрения владельца фигуры.
+        """
+        piece = core.current_piece
+        if core.game_over or piece['row'] >= MOVE_ZONE_ROWS:
+            return {}
+
+        max_depth = max_depth or self.max_depth
+        actions = core.legal_actions()
+        player = core.current_player
+        start = time.perf_counter()
+        self._deadline = float('inf')
+        self.generation += 1
+        root_key = self.zobrist.key(core)
+        values = {}
+
+        try:
+            for depth in range(1, max_depth + 1):
+                # Полное окно для каждого сдвига: нужны точные оценки всех, а не только лучшего
+                current = {}
+                for action in actions:
+                    current[action] = self._child_value(core, root_key, action, player, depth,
+                                                        -INFINITY, INFINITY, 1)
+                values = current
+                best_action = max(actions, key=values.get)
+                self._store(root_key, depth, values[best_action], EXACT, best_action)
+                self.last_depth = depth
+                self.last_value = values[best_action]
+                if report is not None and report(depth, dict(values)) is False:
+                    break
+                if all(abs(value) >= WIN_SCORE - self.max_depth for value in values.values()):
+                    break
+        except SearchTimeout:
+            pass
+        finally:
+            self.search_time += time.perf_counter() - start
+
+        return values
+
+    def _search_root(self, core, key, depth):
+        """Корень поиска: возвращает (оценка, действие)"""
+        player = core.current_player
+        entry = self._probe(key)
+        tt_action = entry[4] if entry else None
+
+        alpha = -INFINITY
+        best_value = -INFINITY
+        best_action = STAY
+        for action in self._ordered(core.legal_actions(), tt_action):
+            value = self._child_value(core, key, action, player, depth, alpha, INFINITY, 1)
+            if value > best_value:
+                best_value = value
+                best_action = action
+            alpha = max(alpha, value)
+
+        self._store(key, depth, best_value, EXACT, best_action)
+        return best_value, best_action
+
+    def _negamax(self, core, key, depth, alpha, beta, ply):
+        """Оценка позиции с точки зрения владельца падающей фигуры"""
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and (self._cancelled or time.perf_counter() > self._deadline):
+            raise SearchTimeout()
+
+        alpha_orig = alpha
+        entry = self._probe(key)
+        tt_action = None
+        if entry:
+            _, entry_depth, value, flag, tt_action, _ = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        if depth == 0:
+            return self.evaluate(core)
+
+        player = core.current_player
+        best_value = -INFINITY
+        best_action = None
+        for action in self._ordered(core.legal_actions(), tt_action):
+            value = self._child_value(core, key, action, player, depth, alpha, beta, ply + 1)
+            if value > best_value:
+                best_value = value
+                best_action = action
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha_orig:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self._store(key, depth, best_value, flag, best_action)
+        return best_value
+
+    def _child_value(self, core, key, action, player, depth, alpha, beta, ply):
+        """Оценка хода action с точки зрения player"""
+        child, child_key = self._advance(core, key, action)
+        if child.game_over:
+            winner = child.winner()
+            if winner == 'draw':
+                return 0
+            return WIN_SCORE - ply if winner == player else ply - WIN_SCORE
+
+        # Следующая точка решения может принадлежать тому же игроку
+        if child.current_player == player:
+            return self._negamax(child, child_key, depth - 1, alpha, beta, ply)
+        return -self._negamax(child, child_key, depth - 1, -beta, -alpha, ply)
+
+    def _advance(self, core, key, action):
+        """Такт с действием action и падение до следующей точки решения.
+
+        Возвращает (копия ядра, новый ключ Zobrist).
+        """
+        zobrist = self.zobrist
+        child = core.copy()
+        piece = child.current_piece
+        key ^= zobrist.falling[piece['type']][piece['row']][piece['col']]
+
+        # Ниже зоны перемещения выбора нет - сразу в точку приземления
+        placed = child.step(action)
+        if not placed and piece['row'] >= MOVE_ZONE_ROWS:
+            placed = child.step(DROP)
+
+        if placed:
+            # piece - та же фигура, step() менял ее на месте
+            key ^= zobrist.cells[piece['type']][piece['row']][piece['col']]
+            piece = child.current_piece
+            if piece is None:
+                return child, key
+        key ^= zobrist.falling[piece['type']][piece['row']][piece['col']]
+        return child, key
+
+    def _ordered(self, actions, first):
+        """Действие из таблицы транспозиций проверяется первым"""
+        if first is None or first not in actions or actions[0] == first:
+            return actions
+        return (first,) + tuple(action for action in actions if action != first)
+
+    def _probe(self, key):
+        """Поиск записи в таблице: (ключ, глубина, оценка, тип, действие, поколение)"""
+        self.table_probes += 1
+        entry = self.table[key & self.table_mask]
+        if entry and entry[0] == key:
+            self.table_hits += 1
+            return entry
+        return None
+
+    def _store(self, key, depth, value, flag, action):
+        """Запись в таблицу: заменяем старое поколение или менее глубокий результат"""
+        slot = key & self.table_mask
+        entry = self.table[slot]
+        if entry is None:
+            self.table_stores += 1
+        elif entry[5] != self.generation or depth >= entry[1] or entry[0] == key:
+            self.table_replacements += 1
+        else:
+            return
+        self.table[slot] = (key, depth, value, flag, action, self.generation)
+
+    def evaluate(self, core):
+        """Эвристика: открытые окна из 4 клеток в зоне размещения"""
+        board = core.board
+        own = PIECES[core.current_player]
+        score = 0
+        for window in WINDOWS:
+            mine = 0
+            theirs = 0
+            for row, col in window:
+                piece = board[row][col]
+                if piece == own:
+                    mine += 1
+                elif piece:
+                    theirs += 1
+            if not theirs:
+                score += WINDOW_SCORES[mine]
+            elif not mine:
+                score -= WINDOW_SCORES[theirs]
+        return score
+
+
+class ComputerPlayer:
+    """Компьютер за один цвет: поиск идет в фоновом потоке и не тормозит отрисовку"""
+    def __init__(self, color, time_budget=0.3, table_size=1 << 18, tablebase=None):
+        self.color = color
+        self.ai = AlphaBetaAI(time_budget, table_size, tablebase=tablebase)
+        self.last_stats = None
+        self._thread = None
+        self._position = None  # позиция, для которой запущен поиск
+        self._result = None    # (позиция, действие) от последнего поиска
+        self._applied = None   # позиция, для которой ход уже отправлен
+
+    def update(self, game):
+        """Вызывается каждый кадр: запускает поиск и передает готовый ход в игру"""
+        core = game.core
+        if core.game_over or core.current_player != self.color:
+            return
+        if core.current_piece['row'] >= MOVE_ZONE_ROWS:
+            return
+
+        position = (core.round_id, core.ply)  # как hints.position_key
+        if position == self._applied:
+            return
+
+        # Готовый ход для текущей позиции
+        result = self._result
+        if result and result[0] == position:
+            game.request_move(result[1])
+            self._applied = position
+            return
+
+        # Поиск по устаревшей позиции прерываем, новый запускаем после его завершения
+        if self._thread and self._thread.is_alive():
+            if self._position != position:
+                self.ai.cancel()
+            return
+
+        if self._position != position:
+            self._position = position
+            self._thread = threading.Thread(target=self._think, args=(position, core.copy()), daemon=True)
+            self._thread.start()
+
+    def pop_stats(self):
+        """Статистика последнего завершенного поиска (один раз)"""
+        stats = self.last_stats
+        self.last_stats = None
+        return stats
+
+    def _think(self, position, core):
+        """Тело фонового потока"""
+        action = self.ai.choose_action(core)
+        self.last_stats = self.ai.stats()
+        self._result = (position, action)
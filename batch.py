@@ -0,0 +1,230 @@
+"""Пакетный симулятор: тысячи партий на массивах NumPy, которые идут синхронно.
+
+Каждый вызов step() применяет к каждой партии один такт Game.update(): сдвиг
+фигуры в зоне перемещения и падение на одну строку. Завершенные партии
+записываются в статистику и сразу начинаются заново.
+
+Запуск: python batch.py --games 4096 --ticks 2000 [--verify]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from engine import (GameCore, GRID_WIDTH, GRID_HEIGHT, MOVE_ZONE_ROWS, WIN_LENGTH, WIN_DIRECTIONS, PLACEMENT_CELLS,
+                    END_LINE as CORE_END_LINE, END_MOVE_ZONE as CORE_END_MOVE_ZONE, END_FULL as CORE_END_FULL)
+
+# Коды клеток и игроков
+EMPTY = 0
+BLUE = 1  # крестики
+RED = 2   # нолики
+DRAW = 3  # ничья в массиве победителей
+PLAYER_CODES = {'blue': BLUE, 'red': RED, 'draw': DRAW}
+
+# Причины завершения партии
+END_LINE = 1       # 4 в ряд
+END_MOVE_ZONE = 2  # фигура осталась в зоне перемещения
+END_FULL = 3       # зона размещения заполнена
+
+REASON_CODES = {CORE_END_LINE: END_LINE, CORE_END_MOVE_ZONE: END_MOVE_ZONE, CORE_END_FULL: END_FULL}
+
+
+class BatchSimulator:
+    """N партий в виде массивов: доски (N, 10, 7) int8 и позиции падающих фигур"""
+    def __init__(self, n_games, first_player=BLUE):
+        self.n_games = n_games
+        self.first_player = first_player
+        self._index = np.arange(n_games)
+
+        # Доски и падающие фигуры
+        self.boards = np.zeros((n_games, GRID_HEIGHT, GRID_WIDTH), dtype=np.int8)
+        self.player = np.full(n_games, first_player, dtype=np.int8)
+        self.row = np.zeros(n_games, dtype=np.int8)
+        self.col = np.full(n_games, GRID_WIDTH // 2, dtype=np.int8)
+
+        # Заполненность зоны размещения и номер такта в партии
+        self.filled = np.zeros(n_games, dtype=np.int16)
+        self.ply = np.zeros(n_games, dtype=np.int32)
+
+        # Результаты последнего такта (действительны там, где done)
+        self.done = np.zeros(n_games, dtype=bool)
+        self.winner = np.zeros(n_games, dtype=np.int8)
+        self.end_reason = np.zeros(n_games, dtype=np.int8)
+        self.final_ply = np.zeros(n_games, dtype=np.int32)
+
+        # Накопленная статистика по всем завершенным партиям
+        self.ticks = 0
+        self.games_finished = 0
+        self.winner_counts = np.zeros(4, dtype=np.int64)
+        self.reason_counts = np.zeros(4, dtype=np.int64)
+
+    def step(self, actions):
+        """Один такт во всех партиях; actions - массив из -1, 0, 1 (или одно число).
+
+        Возвращает маску партий, завершившихся на этом такте (они уже сброшены).
+        """
+        actions = np.broadcast_to(np.asarray(actions, dtype=np.int8), (self.n_games,))
+        index = self._index
+        row = self.row
+        col = self.col
+
+        # Сдвиг по диагонали только в зоне перемещения и только на свободную клетку
+        new_col = col + actions
+        move = (row < MOVE_ZONE_ROWS) & (actions != 0) & (new_col >= 0) & (new_col < GRID_WIDTH)
+        safe_col = np.clip(new_col, 0, GRID_WIDTH - 1)
+        move &= self.boards[index, row + 1, safe_col] == EMPTY
+        np.copyto(col, new_col, where=move)
+
+        # Перемещение фигуры вниз
+        row += 1
+        self.ply += 1
+        self.ticks += 1
+
+        # Фигура фиксируется на дне или на другой фигуре
+        below = np.minimum(row + 1, GRID_HEIGHT - 1)
+        landed = (row >= GRID_HEIGHT - 1) | (self.boards[index, below, col] != EMPTY)
+
+        self.done[:] = False
+        landed_games = np.flatnonzero(landed)
+        if landed_games.size:
+            self._place(landed_games)
+
+        finished = np.flatnonzero(self.done)
+        if finished.size:
+            self._finish(finished)
+        return self.done
+
+    def _place(self, games):
+        """Фиксация фигур и проверка условий завершения для партий games"""
+        row = self.row[games]
+        col = self.col[games]
+        player = self.player[games]
+        self.boards[games, row, col] = player
+
+        # Условие 3: фигура в зоне перемещения - проиграл поставивший ее
+        in_move_zone = row < MOVE_ZONE_ROWS
+        winner = np.where(in_move_zone, 3 - player, 0).astype(np.int8)
+        reason = np.where(in_move_zone, END_MOVE_ZONE, 0).astype(np.int8)
+        self.filled[games] += ~in_move_zone
+
+        # Условие 1: 4 в ряд через поставленную фигуру
+        placed = ~in_move_zone
+        line = np.zeros(games.size, dtype=bool)
+        if placed.any():
+            line[placed] = self._check_lines(games[placed], row[placed], col[placed], player[placed])
+        winner[line] = player[line]
+        reason[line] = END_LINE
+
+        # Условие 2: зона размещения заполнена
+        full = placed & ~line & (self.filled[games] == PLACEMENT_CELLS)
+        winner[full] = DRAW
+        reason[full] = END_FULL
+
+        done = reason != 0
+        self.done[games] = done
+        self.winner[games] = winner
+        self.end_reason[games] = reason
+
+        # В остальных партиях ход переходит к другому игроку
+        playing = games[~done]
+        self.player[playing] = 3 - self.player[playing]
+        self.row[playing] = 0
+        self.col[playing] = GRID_WIDTH // 2
+
+    def _check_lines(self, games, row, col, player):
+        """Маска партий, где фигура в (row, col) собрала WIN_LENGTH в ряд"""
+        boards = self.boards
+        found = np.zeros(games.size, dtype=bool)
+        for dr, dc in WIN_DIRECTIONS:
+            count = np.ones(games.size, dtype=np.int8)
+            for sign in (1, -1):
+                # Длина непрерывной серии своих фигур в одну сторону
+                run = np.ones(games.size, dtype=bool)
+                for k in range(1, WIN_LENGTH):
+                    r = row + sign * k * dr
+                    c = col + sign * k * dc
+                    inside = (r >= 0) & (r < GRID_HEIGHT) & (c >= 0) & (c < GRID_WIDTH)
+                    cell = boards[games, np.clip(r, 0, GRID_HEIGHT - 1), np.clip(c, 0, GRID_WIDTH - 1)]
+                    run &= inside & (cell == player)
+                    count += run
+            found |= count >= WIN_LENGTH
+        return found
+
+    def _finish(self, games):
+        """Учет результатов и сброс завершенных партий"""
+        self.final_ply[games] = self.ply[games]
+        self.games_finished += games.size
+        self.winner_counts += np.bincount(self.winner[games], minlength=4)
+        self.reason_counts += np.bincount(self.end_reason[games], minlength=4)
+
+        self.boards[games] = EMPTY
+        self.player[games] = self.first_player
+        self.row[games] = 0
+        self.col[games] = GRID_WIDTH // 2
+        self.filled[games] = 0
+        self.ply[games] = 0
+
+
+def verify(n_games=256, ticks=3000, seed=0):
+    """Сверка с GameCore на случайных последовательностях действий.
+
+    Возвращает число проверенных завершенных партий, при расхождении - AssertionError.
+    """
+    rng = np.random.default_rng(seed)
+    sim = BatchSimulator(n_games)
+    cores = [GameCore() for _ in range(n_games)]
+    checked = 0
+
+    for _ in range(ticks):
+        actions = rng.integers(-1, 2, size=n_games, dtype=np.int8)
+        done = sim.step(actions)
+        for i, core in enumerate(cores):
+            core.step(int(actions[i]))
+            if done[i]:
+                assert core.is_terminal(), f"партия {i}: ядро не завершило игру"
+                assert sim.winner[i] == PLAYER_CODES[core.winner()], f"партия {i}: разные победители"
+                assert sim.end_reason[i] == REASON_CODES[core.end_reason], f"партия {i}: разные причины"
+                assert sim.final_ply[i] == core.ply, f"партия {i}: разная длина"
+                core.reset()
+                checked += 1
+            else:
+                assert not core.is_terminal(), f"партия {i}: симулятор не завершил игру"
+                piece = core.current_piece
+                assert (sim.row[i], sim.col[i]) == (piece['row'], piece['col']), f"партия {i}: разные позиции"
+    return checked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетная симуляция случайных партий")
+    parser.add_argument('--games', type=int, default=4096, help="число партий в пакете")
+    parser.add_argument('--ticks', type=int, default=2000, help="число тактов")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verify', action='store_true', help="сверить результаты с GameCore")
+    args = parser.parse_args()
+
+    if args.verify:
+        checked = verify(seed=args.seed)
+        print(f"Проверено партий: {checked}, расхождений нет")
+
+    rng = np.random.default_rng(args.seed)
+    sim = BatchSimulator(args.games)
+    actions = rng.integers(-1, 2, size=(64, args.games), dtype=np.int8)
+
+    start = time.perf_counter()
+    for tick in range(args.ticks):
+        sim.step(actions[tick % len(actions)])
+    elapsed = time.perf_counter() - start
+
+    total = max(sim.games_finished, 1)
+    print(f"Тактов в секунду: {sim.ticks * args.games / elapsed:,.0f}")
+    print(f"Партий: {sim.games_finished} ({sim.games_finished / elapsed:,.0f} в секунду)")
+    print(f"Синие: {sim.winner_counts[BLUE] / total:.1%}, красные: {sim.winner_counts[RED] / total:.1%}, "
+          f"ничьи: {sim.winner_counts[DRAW] / total:.1%}")
+    print(f"4 в ряд: {sim.reason_counts[END_LINE] / total:.1%}, "
+          f"зона перемещения: {sim.reason_counts[END_MOVE_ZONE] / total:.1%}, "
+          f"поле заполнено: {sim.reason_counts[END_FULL] / total:.1%}")
+
+
+if __name__ == "__main__":
+    main()
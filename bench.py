@@ -0,0 +1,381 @@
+"""Набор бенчмарков горячих путей: правила, поиск, отрисовка и запуск.
+
+Все случайные позиции строятся из фиксированного зерна, результат
+выводится в JSON. С --baseline результат сравнивается с сохраненным, и
+если какой-то замер стал медленнее больше чем на --threshold, процесс
+завершается с кодом 1.
+
+Запуск:
+    python bench.py --save baseline.json
+    python bench.py --baseline baseline.json --threshold 0.25
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from bitboard import BitboardCore
+from engine import GameCore, GRID_WIDTH, GRID_HEIGHT, MOVE_ZONE_ROWS, ACTIONS
+
+# Приветствие pygame печатается в stdout при импорте и портило бы JSON отчета
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+SEED = 12345
+
+# Реестр бенчмарков: имя -> функция подготовки, возвращающая (число операций, функция замера)
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Регистрация бенчмарка"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class Skip(Exception):
+    """Бенчмарк нельзя выполнить в этом окружении"""
+
+
+def dense_positions(core_class, count, rng):
+    """Плотно заполненные зоны размещения без линий и клетки для проверки"""
+    positions = []
+    while len(positions) < count:
+        core = core_class()
+        for _ in range((GRID_HEIGHT - MOVE_ZONE_ROWS) * GRID_WIDTH - 2):
+            col = rng.choice([c for c in range(GRID_WIDTH) if core.heights[c] < GRID_HEIGHT - MOVE_ZONE_ROWS])
+            core.current_piece = {'type': rng.choice('XO'), 'row': core.landing_row(col), 'col': col}
+            core.place_piece()
+            if core.game_over:
+                break
+        if not core.game_over:
+            cells = [(row, col) for row in range(MOVE_ZONE_ROWS, GRID_HEIGHT) for col in range(GRID_WIDTH)
+                     if core.board[row][col]]
+            positions.append((core, cells))
+    return positions
+
+
+def random_actions(rng, count):
+    return [rng.choice(ACTIONS) for _ in range(count)]
+
+
+@benchmark('rules.check_win.list')
+def bench_check_win_list():
+    positions = dense_positions(GameCore, 20, random.Random(SEED))
+
+    def run():
+        for core, cells in positions:
+            for row, col in cells:
+                core.check_win(row, col)
+    return sum(len(cells) for _, cells in positions), run
+
+
+@benchmark('rules.check_win.bitboard')
+def bench_check_win_bitboard():
+    positions = dense_positions(BitboardCore, 20, random.Random(SEED))
+
+    def run():
+        for core, cells in positions:
+            for row, col in cells:
+                core.check_win(row, col)
+    return sum(len(cells) for _, cells in positions), run
+
+
+@benchmark('rules.zone_full')
+def bench_zone_full():
+    positions = dense_positions(GameCore, 20, random.Random(SEED))
+
+    def run():
+        for _ in range(50):
+            for core, _ in positions:
+                core.is_placement_zone_full()
+    return 50 * len(positions), run
+
+
+def play_games(core_class, actions, games):
+    """Случайные партии через step(): возвращает число тактов"""
+    plies = 0
+    index = 0
+    core = core_class()
+    for _ in range(games):
+        core.reset()
+        while not core.game_over:
+            core.step(actions[index % len(actions)])
+            index += 1
+        plies += core.ply
+    return plies
+
+
+@benchmark('rules.simulate.core')
+def bench_simulate_core():
+    actions = random_actions(random.Random(SEED), 4096)
+    plies = play_games(GameCore, actions, 200)
+    return plies, lambda: play_games(GameCore, actions, 200)
+
+
+@benchmark('rules.simulate.bitboard')
+def bench_simulate_bitboard():
+    actions = random_actions(random.Random(SEED), 4096)
+    plies = play_games(BitboardCore, actions, 200)
+    return plies, lambda: play_games(BitboardCore, actions, 200)
+
+
+@benchmark('rules.simulate.game_update')
+def bench_simulate_game_update():
+    try:
+        import lab6
+    except ImportError as error:
+        raise Skip(str(error))
+    actions = random_actions(random.Random(SEED), 4096)
+
+    def run():
+        # Game.update() ровно через период после такта: обычный путь с одним тактом,
+        # а не навёрстывание после долгой паузы (MAX_CATCH_UP)
+        index = 0
+        game = lab6.Game()
+        for _ in range(100):
+            game.reset_game()
+            while not game.game_over:
+                game.request_move(actions[index % len(actions)])
+                game.last_move_time = time.perf_counter() - lab6.FALL_PERIOD
+                game.update()
+                index += 1
+        return index
+    return run(), run
+
+
+@benchmark('rules.batch')
+def bench_batch():
+    try:
+        import numpy as np
+        from batch import BatchSimulator
+    except ImportError as error:
+        raise Skip(str(error))
+    games = 1024
+    actions = np.random.default_rng(SEED).integers(-1, 2, size=(64, games), dtype=np.int8)
+
+    def run():
+        sim = BatchSimulator(games)
+        for tick in range(200):
+            sim.step(actions[tick % len(actions)])
+    return 200 * games, run
+
+
+@benchmark('search.alphabeta')
+def bench_alphabeta():
+    from ai import AlphaBetaAI
+    rng = random.Random(SEED)
+    positions = []
+    core = GameCore()
+    while len(positions) < 5:
+        core.step(rng.choice(ACTIONS))
+        if core.game_over:
+            core.reset()
+        elif core.current_piece['row'] == 0 and core.ply > 20:
+            positions.append(core.copy())
+
+    def run():
+        # Фиксированная глубина без ограничения времени - одинаковая работа при каждом запуске
+        nodes = 0
+        for position in positions:
+            ai = AlphaBetaAI(time_budget=3600, table_size=1 << 16, max_depth=6)
+            ai.choose_action(position)
+            nodes += ai.nodes
+        return nodes
+    return run(), run
+
+
+def headless_lab6():
+    """lab6 с окном на фиктивном видеодрайвере"""
+    try:
+        import lab6
+    except ImportError as error:
+        raise Skip(str(error))
+    lab6.init_app(headless=True)
+    return lab6
+
+
+def sample_game(lab6):
+    """Раунд в середине игры для отрисовки"""
+    game = lab6.Game()
+    rng = random.Random(SEED)
+    for _ in range(120):
+        if game.core.game_over:
+            break
+        game.core.step(rng.choice(ACTIONS))
+    return game
+
+
+@benchmark('render.board')
+def bench_render_board():
+    lab6 = headless_lab6()
+    return 100, lambda: [lab6.draw_game_board() for _ in range(100)]
+
+
+@benchmark('render.pieces')
+def bench_render_pieces():
+    lab6 = headless_lab6()
+    game = sample_game(lab6)
+
+    def run():
+        for _ in range(100):
+            lab6.draw_pieces(game)
+            lab6.draw_current_piece(game)
+    return 100, run
+
+
+@benchmark('render.main_menu')
+def bench_render_menu():
+    lab6 = headless_lab6()
+    play_button = lab6.Button(lab6.PLAY_BUTTON_X, lab6.PLAY_BUTTON_Y, lab6.BUTTON_WIDTH, lab6.BUTTON_HEIGHT,
+                              "Играть", lab6.PLAY_BUTTON_COLOR, (100, 255, 100))
+    exit_button = lab6.Button(lab6.EXIT_BUTTON_X, lab6.EXIT_BUTTON_Y, lab6.BUTTON_WIDTH, lab6.BUTTON_HEIGHT,
+                              "Выход", lab6.EXIT_BUTTON_COLOR, (255, 100, 100))
+    return 100, lambda: [lab6.draw_main_menu(3, 5, 'blue', play_button, exit_button) for _ in range(100)]
+
+
+@benchmark('render.dirty_frame')
+def bench_render_dirty():
+    lab6 = headless_lab6()
+    actions = random_actions(random.Random(SEED), 4096)
+    menu_button = lab6.Button(lab6.MENU_BUTTON_X, lab6.MENU_BUTTON_Y, lab6.BUTTON_WIDTH, lab6.BUTTON_HEIGHT,
+                              "Меню", lab6.BUTTON_COLOR, (100, 255, 100))
+
+    def run():
+        # Кадр на каждый такт случайной партии
+        renderer = lab6.DirtyRenderer()
+        game = lab6.Game()
+        frames = 0
+        for action in actions[:300]:
+            if game.core.game_over:
+                game.reset_game()
+                renderer.invalidate()
+            game.core.step(action)
+            renderer.draw(game, menu_button)
+            frames += 1
+        return frames
+    return run(), run
+
+
+@benchmark('startup.import')
+def bench_import():
+    lab6 = headless_lab6()
+
+    def run():
+        return lab6.measure_startup()['import']
+    return 1, run
+
+
+@benchmark('startup.first_frame')
+def bench_first_frame():
+    # Запуск целиком в свежем процессе: импорт, окно и шрифты (init_app), первый кадр меню
+    headless_lab6()
+    code = "import lab6; lab6.init_app(headless=True); lab6.draw_first_frame()"
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    return 1, lambda: subprocess.check_call([sys.executable, '-c', code], env=env, cwd=cwd)
+
+
+def measure(setup, repeat, min_time):
+    """Лучшее время одной операции (нс) среди repeat запусков"""
+    ops, run = setup()
+    best = None
+    for _ in range(repeat):
+        loops = 0
+        start = time.perf_counter()
+        while True:
+            run()
+            loops += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        per_op = elapsed / (loops * ops) * 1e9
+        best = per_op if best is None else min(best, per_op)
+    return best
+
+
+def run_benchmarks(pattern='*', repeat=5, min_time=0.2, verbose=True):
+    """Выполнение выбранных бенчмарков, результат - словарь для JSON"""
+    results = {}
+    skipped = {}
+    for name, setup in BENCHMARKS.items():
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        try:
+            ns_per_op = measure(setup, repeat, min_time)
+        except Skip as reason:
+            skipped[name] = str(reason)
+            continue
+        results[name] = {'ns_per_op': ns_per_op, 'ops_per_sec': 1e9 / ns_per_op}
+        if verbose:
+            print(f"{name:<32} {ns_per_op:>14,.0f} нс/оп {1e9 / ns_per_op:>14,.0f} оп/с", file=sys.stderr)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'seed': SEED,
+            'repeat': repeat,
+        },
+        'results': results,
+        'skipped': skipped,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Замеры, ставшие медленнее базовых больше чем на threshold: [(имя, было, стало)]"""
+    regressions = []
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name)
+        if base and result['ns_per_op'] > base['ns_per_op'] * (1 + threshold):
+            regressions.append((name, base['ns_per_op'], result['ns_per_op']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки горячих путей")
+    parser.add_argument('--only', default='*', help="шаблон имен, например 'rules.*'")
+    parser.add_argument('--repeat', type=int, default=5, help="повторов каждого замера")
+    parser.add_argument('--min-time', type=float, default=0.2, help="минимальная длительность повтора, секунд")
+    parser.add_argument('--output', metavar='PATH', help="записать результат в JSON (по умолчанию - stdout)")
+    parser.add_argument('--save', metavar='PATH', help="сохранить результат как базовый")
+    parser.add_argument('--baseline', metavar='PATH', help="сравнить с базовым результатом")
+    parser.add_argument('--threshold', type=float, default=0.2, help="допустимое замедление (0.2 = 20%%)")
+    parser.add_argument('--list', action='store_true', help="список бенчмарков")
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(BENCHMARKS))
+        return
+
+    report = run_benchmarks(args.only, args.repeat, args.min_time)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    elif not args.save:
+        print(text)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"РЕГРЕССИЯ {name}: {before:,.0f} -> {after:,.0f} нс/оп ({after / before - 1:+.0%})",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
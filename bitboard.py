@@ -0,0 +1,269 @@
+"""Битовое представление доски: фигуры каждого игрока упакованы в целое число.
+
+Клетка (row, col) хранится в бите col * STRIDE + row. Над каждой колонкой
+оставлен пустой бит-разделитель, поэтому сдвиги не переносят линию через
+край поля и проверка 4 в ряд сводится к нескольким сдвигам и AND
+(развернутая проверка в find_win_line рассчитана на WIN_LENGTH = 4).
+"""
+
+from engine import (GameCore, ROUND_IDS, DEFAULT_GEOMETRY, GRID_WIDTH, GRID_HEIGHT, MOVE_ZONE_ROWS, PLACEMENT_CELLS,
+                    WIN_DIRECTIONS, WIN_LENGTH, OPPONENT, PIECES, LEFT, STAY, RIGHT, DROP,
+                    END_LINE, END_MOVE_ZONE, END_FULL)
+
+# Шаг между колонками (высота поля + бит-разделитель)
+STRIDE = GRID_HEIGHT + 1
+
+# Смещение индекса бита для каждого направления в порядке WIN_DIRECTIONS
+BIT_DIRECTIONS = tuple(dc * STRIDE + dr for dr, dc in WIN_DIRECTIONS)
+
+
+def cell_index(row, col):
+    """Номер бита клетки"""
+    return col * STRIDE + row
+
+
+def cell_of(index):
+    """Клетка (row, col) по номеру бита"""
+    return index % STRIDE, index // STRIDE
+
+
+def line_starts(bits, shift):
+    """Биты, с которых начинается WIN_LENGTH фигур подряд с шагом shift"""
+    for _ in range(WIN_LENGTH - 1):
+        bits &= bits >> shift
+    return bits
+
+
+def has_line(bits):
+    """Есть ли на доске хотя бы одна выигрышная линия"""
+    for delta in BIT_DIRECTIONS:
+        if line_starts(bits, abs(delta)):
+            return True
+    return False
+
+
+def _line_windows(index):
+    """Маски начал линий, проходящих через клетку, для каждого направления"""
+    windows = []
+    for delta in BIT_DIRECTIONS:
+        shift = abs(delta)
+        # Клетка входит в линию, если линия начинается не дальше WIN_LENGTH-1 шагов до нее
+        window = 0
+        for k in range(WIN_LENGTH):
+            if index >= k * shift:
+                window |= 1 << (index - k * shift)
+        windows.append(window)
+    return tuple(windows)
+
+
+# Предвычисленные маски для каждой клетки поля
+LINE_WINDOWS = [_line_windows(index) for index in range(GRID_WIDTH * STRIDE)]
+
+# Сдвиги по направлениям: горизонталь, вертикаль, две диагонали
+SHIFT_H, SHIFT_V, SHIFT_D, SHIFT_A = (abs(delta) for delta in BIT_DIRECTIONS)
+
+
+def find_win_line(bits, row, col):
+    """Выигрышная линия через клетку (row, col) в формате Game.winning_line или None"""
+    index = col * STRIDE + row
+    if not bits >> index & 1:
+        return None
+
+    # Сдвиг и AND по всем четырем направлениям сразу: после двух шагов
+    # бит означает начало четырех фигур подряд
+    window_h, window_v, window_d, window_a = LINE_WINDOWS[index]
+    h = bits & bits >> SHIFT_H
+    v = bits & bits >> SHIFT_V
+    d = bits & bits >> SHIFT_D
+    a = bits & bits >> SHIFT_A
+    hit_h = h & h >> 2 * SHIFT_H & window_h
+    hit_v = v & v >> 2 * SHIFT_V & window_v
+    hit_d = d & d >> 2 * SHIFT_D & window_d
+    hit_a = a & a >> 2 * SHIFT_A & window_a
+    if not (hit_h | hit_v | hit_d | hit_a):
+        return None
+
+    # Первое направление с линией (в том же порядке, что и GameCore.check_win)
+    if hit_h:
+        delta = BIT_DIRECTIONS[0]
+    elif hit_v:
+        delta = BIT_DIRECTIONS[1]
+    elif hit_d:
+        delta = BIT_DIRECTIONS[2]
+    else:
+        delta = BIT_DIRECTIONS[3]
+
+    # Концы линии: идем от клетки в обе стороны, пока биты установлены
+    start = index
+    while start - delta >= 0 and bits >> (start - delta) & 1:
+        start -= delta
+    end = index
+    while end + delta >= 0 and bits >> (end + delta) & 1:
+        end += delta
+
+    start_row, start_col = cell_of(start)
+    end_row, end_col = cell_of(end)
+    return (start_row, start_col, end_row, end_col)
+
+
+class BitboardCore(GameCore):
+    """GameCore, в котором состояние доски - только битовые маски и высоты колонок.
+
+    Горячий путь (step(), legal_actions(), place_piece(), check_win()) не
+    трогает список board: из-за гравитации клетка (row, col) занята, если
+    row >= GRID_HEIGHT - heights[col], а линия ищется сдвигами масок.
+    Список board для отрисовки, эвристик и сериализации строится из масок
+    при первом обращении и кэшируется до следующей фиксации фигуры; он
+    только для чтения - изменения в нем в маски не попадают.
+
+    Маски посчитаны для стандартного поля, другие размеры не поддерживаются.
+    """
+    def __init__(self, first_player='blue', geometry=None):
+        if geometry is not None and geometry != DEFAULT_GEOMETRY:
+            raise ValueError("битовые доски рассчитаны только на стандартное поле")
+        super().__init__(first_player)
+
+    def reset(self, first_player='blue'):
+        """Сброс состояния игры к начальному"""
+        # Битовые доски для каждого типа фигур и кэш списка board
+        self.bitboards = {'X': 0, 'O': 0}
+        self._board = None
+
+        self.heights = [0] * GRID_WIDTH
+        self.filled = 0
+        self.current_player = first_player
+        self.current_piece = None
+        self.game_over = False
+        self.result = None
+        self.end_reason = None
+        self.winning_line = None
+        self.ply = 0
+        self.round_id = next(ROUND_IDS)
+        self.start_turn()
+
+    @property
+    def board(self):
+        """Доска списком строк (как GameCore.board), собранная из масок"""
+        board = self._board
+        if board is None:
+            x_bits = self.bitboards['X']
+            board = [[None] * GRID_WIDTH for _ in range(GRID_HEIGHT)]
+            for col, height in enumerate(self.heights):
+                for row in range(GRID_HEIGHT - height, GRID_HEIGHT):
+                    board[row][col] = 'X' if x_bits >> (col * STRIDE + row) & 1 else 'O'
+            self._board = board
+        return board
+
+    def copy(self):
+        """Независимая копия состояния (для поиска и симуляций); кэш board общий, он не меняется"""
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone.bitboards = dict(self.bitboards)
+        clone.heights = self.heights[:]
+        if self.current_piece:
+            clone.current_piece = dict(self.current_piece)
+        return clone
+
+    def legal_actions(self):
+        """Действия, которые приводят к разным результатам на следующем такте"""
+        if self.game_over:
+            return ()
+        piece = self.current_piece
+        row = piece['row']
+        if row >= MOVE_ZONE_ROWS:
+            return (STAY,)
+
+        # Клетка снизу в соседней колонке свободна, если колонка ниже row + 1
+        col = piece['col']
+        heights = self.heights
+        limit = GRID_HEIGHT - 1 - row
+        if col > 0 and heights[col - 1] < limit:
+            if col < GRID_WIDTH - 1 and heights[col + 1] < limit:
+                return (LEFT, STAY, RIGHT)
+            return (LEFT, STAY)
+        if col < GRID_WIDTH - 1 and heights[col + 1] < limit:
+            return (STAY, RIGHT)
+        return (STAY,)
+
+    def step(self, action=STAY):
+        """Один такт падения фигуры (см. GameCore.step) по высотам колонок, без списка board"""
+        if self.game_over:
+            return False
+
+        piece = self.current_piece
+        self.ply += 1
+        heights = self.heights
+        col = piece['col']
+
+        if action == DROP:
+            piece['row'] = GRID_HEIGHT - 1 - heights[col]
+            self.place_piece()
+            return True
+
+        row = piece['row']
+        if action and row < MOVE_ZONE_ROWS:
+            new_col = col + action
+            if 0 <= new_col < GRID_WIDTH and row + heights[new_col] < GRID_HEIGHT - 1:
+                col = new_col
+                piece['col'] = col
+
+        row += 1
+        piece['row'] = row
+
+        # Дно или фигура снизу: колонка дошла до строки row + 1
+        if row + heights[col] >= GRID_HEIGHT - 1:
+            self.place_piece()
+            return True
+        return False
+
+    def place_piece(self):
+        """Фиксация фигуры: бит в маске, высота колонки и условия завершения (как в GameCore.check_game_over)"""
+        piece = self.current_piece
+        if not piece:
+            return
+
+        row = piece['row']
+        col = piece['col']
+        player = self.current_player
+        bits = self.bitboards[piece['type']] | 1 << (col * STRIDE + row)
+        self.bitboards[piece['type']] = bits
+        self._board = None
+        self.heights[col] += 1
+
+        if row < MOVE_ZONE_ROWS:
+            # Фигура осталась в зоне перемещения: проиграл поставивший ее
+            self.game_over = True
+            self.result = OPPONENT[player]
+            self.end_reason = END_MOVE_ZONE
+        else:
+            self.filled += 1
+            line = find_win_line(bits, row, col)
+            if line:
+                self.game_over = True
+                self.result = player
+                self.end_reason = END_LINE
+                self.winning_line = line
+            elif self.filled == PLACEMENT_CELLS:
+                self.game_over = True
+                self.result = 'draw'
+                self.end_reason = END_FULL
+
+        if self.game_over:
+            self.current_piece = None
+        else:
+            # Следующий ход соперника (как GameCore.start_turn)
+            player = OPPONENT[player]
+            self.current_player = player
+            self.current_piece = {'type': PIECES[player], 'row': 0, 'col': GRID_WIDTH // 2}
+
+    def check_win(self, row, col):
+        """Проверка наличия выигрышной комбинации из 4 фигур"""
+        index = col * STRIDE + row
+        bits = self.bitboards['X']
+        if not bits >> index & 1:
+            bits = self.bitboards['O']
+        return find_win_line(bits, row, col)
+
+    def is_placement_zone_full(self):
+        """Проверка заполненности зоны размещения по счетчику фигур"""
+        return self.filled == PLACEMENT_CELLS
@@ -0,0 +1,79 @@
+"""Простые боты для самоигры и фабрика ботов по текстовому описанию.
+
+Бот - любой объект с методом choose_action(core), возвращающим сдвиг
+для очередного такта (LEFT, STAY или RIGHT).
+"""
+
+import random
+
+from ai import AlphaBetaAI
+from engine import MOVE_ZONE_ROWS, STAY, DROP
+
+
+class RandomBot:
+    """Случайный сдвиг на каждом такте"""
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def choose_action(self, core):
+        return self.rng.choice(core.legal_actions())
+
+
+class GreedyBot:
+    """Сдвиг, после которого фигура (падая дальше прямо) выигрывает или хотя бы не проигрывает"""
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def choose_action(self, core):
+        piece = core.current_piece
+        if piece['row'] >= MOVE_ZONE_ROWS:
+            return STAY
+
+        player = core.current_player
+        best = []
+        best_score = None
+        for action in core.legal_actions():
+            child = core.copy()
+            if not child.step(action):
+                child.step(DROP)
+
+            # Выигрыш лучше продолжения игры, продолжение лучше ничьей и проигрыша
+            if not child.game_over:
+                score = 1
+            elif child.winner() == player:
+                score = 3
+            elif child.winner() == 'draw':
+                score = 0
+            else:
+                score = -1
+
+            if best_score is None or score > best_score:
+                best_score = score
+                best = [action]
+            elif score == best_score:
+                best.append(action)
+        return self.rng.choice(best)
+
+
+class SearchBot:
+    """Альфа-бета поиск с ограничением времени на такт"""
+    def __init__(self, time_budget=0.02, seed=None):
+        self.ai = AlphaBetaAI(time_budget, table_size=1 << 16)
+
+    def choose_action(self, core):
+        return self.ai.choose_action(core)
+
+
+BOTS = {
+    'random': lambda arg, seed: RandomBot(seed),
+    'greedy': lambda arg, seed: GreedyBot(seed),
+    'alphabeta': lambda arg, seed: SearchBot(float(arg) if arg else 0.02, seed),
+}
+
+
+def make_bot(spec, seed=None):
+    """Бот по описанию вида 'random', 'greedy' или 'alphabeta:0.05' (время на такт)"""
+    name, _, arg = spec.partition(':')
+    if name not in BOTS:
+        raise ValueError(f"неизвестный бот: {spec!r} (доступны: {', '.join(BOTS)})")
+    return BOTS[name](arg, seed)
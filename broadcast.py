@@ -0,0 +1,479 @@
+"""Трансляция раунда зрителям: ключевые кадры и изменения по тактам.
+
+Доска целиком передается только в ключевом кадре - в начале раунда и
+каждые keyframe_interval тактов. На каждом такте отправляется одно
+короткое сообщение: новое положение фигуры, фиксация фигуры (с новой
+падающей фигурой) или конец раунда с выигрышной линией. Сообщения -
+структуры фиксированного размера, тип определяется первым байтом:
+
+    K  ключевой кадр: такт, игрок, фигура, доска (по 9 байт на X и O),
+       победитель, причина, линия                                30 байт
+    M  фигура сдвинулась: такт, строка, колонка                    5 байт
+    P  фигура зафиксирована: такт, клетка и тип фигуры, следующий
+       игрок и его фигура                                         9 байт
+    O  конец раунда: такт, клетка и тип последней фигуры,
+       победитель, причина, линия                                12 байт
+
+Хаб рассылает сообщения всем подписчикам локального сокета (TCP или Unix).
+Новому подписчику сразу отправляются последний ключевой кадр и изменения
+после него, так что он синхронизируется, не дожидаясь следующего кадра.
+Игра никогда не ждет зрителей: подписчик, у которого копится
+неотправленный буфер, отключается.
+
+Запуск: python broadcast.py 127.0.0.1:8766 --tick 0.5 [--spectators 2000 --duration 30]
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import struct
+import threading
+import time
+
+from bitboard import BitboardCore
+from bots import make_bot
+from engine import GRID_WIDTH, GRID_HEIGHT, MOVE_ZONE_ROWS, PIECES, STAY
+from replay import PLAYERS, WINNERS, END_REASONS
+from server import percentile
+
+# Сообщения потока (первое поле - тип)
+KEYFRAME = struct.Struct('<BHBbb9s9sBB4b')
+MOVE = struct.Struct('<BHbb')
+PLACE = struct.Struct('<BHbbBBbb')
+OVER = struct.Struct('<BHbbBBB4b')
+
+KEYFRAME_TYPE = ord('K')
+MOVE_TYPE = ord('M')
+PLACE_TYPE = ord('P')
+OVER_TYPE = ord('O')
+MESSAGES = {KEYFRAME_TYPE: KEYFRAME, MOVE_TYPE: MOVE, PLACE_TYPE: PLACE, OVER_TYPE: OVER}
+
+PIECE_TYPES = (None, 'X', 'O')
+BOARD_BYTES = (GRID_WIDTH * GRID_HEIGHT + 7) // 8
+NO_LINE = (-1, -1, -1, -1)
+
+# Ключевой кадр - через столько тактов после предыдущего
+KEYFRAME_INTERVAL = 16
+
+# Предел неотправленных данных подписчика и размер буфера его сокета
+MAX_BUFFER = 16 * 1024
+SEND_BUFFER = 16 * 1024
+
+
+def parse_address(text):
+    """'host:port', 'port' или путь Unix-сокета -> ('tcp', host, port) или ('unix', path)"""
+    host, sep, port = text.rpartition(':')
+    if sep and port.isdigit():
+        return ('tcp', host or '127.0.0.1', int(port))
+    if text.isdigit():
+        return ('tcp', '127.0.0.1', int(text))
+    return ('unix', text)
+
+
+def pack_board(board):
+    """Доска -> (биты X, биты O), клетка (row, col) - бит row * ширина + col"""
+    bits = {'X': 0, 'O': 0}
+    for row, cells in enumerate(board):
+        for col, piece in enumerate(cells):
+            if piece:
+                bits[piece] |= 1 << (row * GRID_WIDTH + col)
+    return bits['X'].to_bytes(BOARD_BYTES, 'little'), bits['O'].to_bytes(BOARD_BYTES, 'little')
+
+
+def unpack_board(x_data, o_data):
+    """Обратное pack_board: доска в виде списка строк"""
+    x_bits = int.from_bytes(x_data, 'little')
+    o_bits = int.from_bytes(o_data, 'little')
+    board = []
+    for row in range(GRID_HEIGHT):
+        cells = []
+        for col in range(GRID_WIDTH):
+            bit = 1 << (row * GRID_WIDTH + col)
+            cells.append('X' if x_bits & bit else 'O' if o_bits & bit else None)
+        board.append(cells)
+    return board
+
+
+def encode_keyframe(core):
+    """Ключевой кадр: полное состояние раунда"""
+    piece = core.current_piece
+    row, col = (piece['row'], piece['col']) if piece else (-1, -1)
+    x_data, o_data = pack_board(core.board)
+    return KEYFRAME.pack(KEYFRAME_TYPE, core.ply & 0xFFFF, PLAYERS.index(core.current_player), row, col,
+                         x_data, o_data, WINNERS.index(core.result), END_REASONS.index(core.end_reason),
+                         *(core.winning_line or NO_LINE))
+
+
+def encode_tick(core, piece, placed):
+    """Изменение за один такт step().
+
+    piece - падающая фигура до такта (step() меняет ее на месте, поэтому
+    после такта в ней клетка, куда она попала), placed - результат step().
+    """
+    ply = core.ply & 0xFFFF
+    if not placed:
+        return MOVE.pack(MOVE_TYPE, ply, piece['row'], piece['col'])
+    piece_code = PIECE_TYPES.index(piece['type'])
+    if core.game_over:
+        return OVER.pack(OVER_TYPE, ply, piece['row'], piece['col'], piece_code, WINNERS.index(core.result),
+                         END_REASONS.index(core.end_reason), *(core.winning_line or NO_LINE))
+    new_piece = core.current_piece
+    return PLACE.pack(PLACE_TYPE, ply, piece['row'], piece['col'], piece_code,
+                      PLAYERS.index(core.current_player), new_piece['row'], new_piece['col'])
+
+
+class Broadcaster:
+    """Кодирование тактов раунда для хаба.
+
+    publish(data, keyframe) - функция публикации (SpectatorHub.publish или
+    HubThread.publish).
+    """
+    def __init__(self, publish, keyframe_interval=KEYFRAME_INTERVAL):
+        self.publish = publish
+        self.keyframe_interval = keyframe_interval
+        self.since_keyframe = 0
+
+    def start(self, core):
+        """Начало раунда (или подключение к уже идущему)"""
+        self.publish(encode_keyframe(core), True)
+        self.since_keyframe = 0
+
+    def step(self, core, piece, placed):
+        """После каждого step() ядра"""
+        self.publish(encode_tick(core, piece, placed), False)
+        self.since_keyframe += 1
+        if not core.game_over and self.since_keyframe >= self.keyframe_interval:
+            self.start(core)
+
+
+class StreamDecoder:
+    """Разбор потока на сообщения (кортежи полей структуры)"""
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """Добавить полученные байты; вернуть список полностью принятых сообщений"""
+        buffer = self.buffer
+        buffer += data
+        messages = []
+        offset = 0
+        while offset < len(buffer):
+            layout = MESSAGES.get(buffer[offset])
+            if layout is None:
+                raise ValueError(f"неизвестный тип сообщения: {buffer[offset]}")
+            if len(buffer) - offset < layout.size:
+                break
+            messages.append(layout.unpack_from(buffer, offset))
+            offset += layout.size
+        del buffer[:offset]
+        return messages
+
+
+class SpectatorState:
+    """Состояние раунда у зрителя, собранное из потока.
+
+    Атрибуты называются так же, как у Game (board, current_piece,
+    winning_line, ...), поэтому состояние рисуется функциями отрисовки lab6.
+    До первого ключевого кадра и после пропуска такта synced = False, и
+    изменения не применяются до следующего ключевого кадра.
+    """
+    def __init__(self):
+        self.board = [[None] * GRID_WIDTH for _ in range(GRID_HEIGHT)]
+        self.current_player = None
+        self.current_piece = None
+        self.game_over = False
+        self.result = None
+        self.end_reason = None
+        self.winning_line = None
+        self.ply = 0
+        self.synced = False
+        self.keyframes = 0
+        self.desyncs = 0
+
+    @property
+    def winner(self):
+        return self.result
+
+    def apply(self, message):
+        """Применить одно сообщение StreamDecoder"""
+        kind = message[0]
+        if kind == KEYFRAME_TYPE:
+            (_, self.ply, player, row, col, x_data, o_data, winner, reason, *line) = message
+            self.board = unpack_board(x_data, o_data)
+            self.current_player = PLAYERS[player]
+            self.current_piece = self._piece(row, col) if row >= 0 else None
+            self.result = WINNERS[winner]
+            self.end_reason = END_REASONS[reason]
+            self.game_over = self.result is not None
+            self.winning_line = tuple(line) if line[0] >= 0 else None
+            self.synced = True
+            self.keyframes += 1
+            return
+
+        if not self.synced:
+            return
+        ply = message[1]
+        if ply != (self.ply + 1) & 0xFFFF:
+            # Пропущен такт: ждем следующего ключевого кадра
+            self.synced = False
+            self.desyncs += 1
+            return
+        self.ply = ply
+
+        if kind == MOVE_TYPE:
+            self.current_piece['row'] = message[2]
+            self.current_piece['col'] = message[3]
+        elif kind == PLACE_TYPE:
+            _, _, row, col, piece, player, new_row, new_col = message
+            self.board[row][col] = PIECE_TYPES[piece]
+            self.current_player = PLAYERS[player]
+            self.current_piece = self._piece(new_row, new_col)
+        else:  # OVER_TYPE
+            _, _, row, col, piece, winner, reason, *line = message
+            self.board[row][col] = PIECE_TYPES[piece]
+            self.current_piece = None
+            self.result = WINNERS[winner]
+            self.end_reason = END_REASONS[reason]
+            self.game_over = True
+            self.winning_line = tuple(line) if line[0] >= 0 else None
+
+    def _piece(self, row, col):
+        return {'type': PIECES[self.current_player], 'row': row, 'col': col}
+
+
+class SpectatorHub:
+    """Рассылка потока подписчикам в одном цикле событий"""
+    def __init__(self, max_buffer=MAX_BUFFER):
+        self.max_buffer = max_buffer
+        self.subscribers = set()
+        # Последний ключевой кадр и изменения после него - для новых подписчиков
+        self.backlog = []
+
+        # Статистика
+        self.subscribed = 0
+        self.dropped = 0
+        self.messages = 0
+        self.bytes_sent = 0
+        self.publish_times = []
+
+    async def start(self, address, backlog=4096):
+        """Прослушивание адреса parse_address(); возвращает asyncio.Server"""
+        if address[0] == 'unix':
+            return await asyncio.start_unix_server(self.accept, address[1], backlog=backlog)
+        return await asyncio.start_server(self.accept, address[1], address[2], backlog=backlog)
+
+    async def accept(self, reader, writer):
+        """Подписчик: догоняющие данные, затем рассылка до отключения"""
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            # Буфер ядра тоже ограничен, иначе медленный подписчик долго копил бы данные незаметно
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+        self.subscribed += 1
+        if self.backlog:
+            writer.write(b''.join(self.backlog))
+        self.subscribers.add(writer)
+        try:
+            # Подписчик ничего не присылает: ждем отключения
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+    def publish(self, data, keyframe=False):
+        """Одно сообщение всем подписчикам; медленные отключаются, игра не ждет"""
+        start = time.perf_counter()
+        if keyframe:
+            self.backlog = [data]
+        else:
+            self.backlog.append(data)
+
+        max_buffer = self.max_buffer
+        slow = []
+        for writer in self.subscribers:
+            transport = writer.transport
+            if transport.get_write_buffer_size() > max_buffer:
+                slow.append(writer)
+            else:
+                writer.write(data)
+        for writer in slow:
+            self.subscribers.discard(writer)
+            writer.transport.abort()
+            self.dropped += 1
+
+        self.messages += 1
+        self.bytes_sent += len(data) * len(self.subscribers)
+        self.publish_times.append(time.perf_counter() - start)
+        del self.publish_times[:-1000]
+
+    def stats(self):
+        """Подписчики, отключенные медленные и время рассылки одного сообщения"""
+        return {
+            'subscribers': len(self.subscribers),
+            'subscribed': self.subscribed,
+            'dropped': self.dropped,
+            'messages': self.messages,
+            'bytes_sent': self.bytes_sent,
+            'publish_p50': percentile(self.publish_times, 0.50),
+            'publish_p99': percentile(self.publish_times, 0.99),
+        }
+
+
+class HubThread:
+    """Хаб в отдельном потоке со своим циклом событий (для игры на pygame).
+
+    publish() только ставит рассылку в очередь цикла хаба и сразу
+    возвращается, поэтому кадр игры не ждет сети.
+    """
+    def __init__(self, address, max_buffer=MAX_BUFFER):
+        self.hub = SpectatorHub(max_buffer)
+        self.loop = asyncio.new_event_loop()
+        self._error = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(address,), daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+
+    def _run(self, address):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(self.hub.start(address))
+        except OSError as error:
+            self._error = error
+            self._ready.set()
+            return
+        self._ready.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    def publish(self, data, keyframe=False):
+        self.loop.call_soon_threadsafe(self.hub.publish, data, keyframe)
+
+    async def _shutdown(self):
+        # Закрываем прием и подписчиков и ждем завершения их задач
+        self.server.close()
+        for writer in list(self.hub.subscribers):
+            writer.transport.abort()
+        current = asyncio.current_task()
+        await asyncio.gather(*(task for task in asyncio.all_tasks() if task is not current),
+                             return_exceptions=True)
+        self.loop.stop()
+
+    def close(self):
+        """Отключить подписчиков и остановить цикл хаба"""
+        if self._thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+            self._thread.join(1.0)
+
+
+def connect(address):
+    """Блокирующее подключение зрителя к хабу"""
+    if address[0] == 'unix':
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address[1])
+    else:
+        sock = socket.create_connection(address[1:])
+    return sock
+
+
+async def play_rounds(hub, bots, tick_period, seed, stop_at):
+    """Партии ботов с трансляцией: такт раз в tick_period, пауза в 2 такта между раундами"""
+    rng = random.Random(seed)
+    players = {'blue': make_bot(bots[0], rng.randrange(1 << 30)), 'red': make_bot(bots[1], rng.randrange(1 << 30))}
+    broadcaster = Broadcaster(hub.publish)
+    core = BitboardCore()
+    broadcaster.start(core)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time()
+    while loop.time() < stop_at:
+        deadline += tick_period
+        await asyncio.sleep(max(deadline - loop.time(), 0))
+        if core.game_over:
+            core.reset()
+            broadcaster.start(core)
+            continue
+        piece = core.current_piece
+        action = players[core.current_player].choose_action(core) if piece['row'] < MOVE_ZONE_ROWS else STAY
+        placed = core.step(action)
+        broadcaster.step(core, piece, placed)
+        if core.game_over:
+            deadline += tick_period
+    return core
+
+
+async def run_spectator(address, states):
+    """Зритель без окна для нагрузки: собирает состояние из потока до отключения"""
+    if address[0] == 'unix':
+        reader, writer = await asyncio.open_unix_connection(address[1])
+    else:
+        reader, writer = await asyncio.open_connection(address[1], address[2])
+    decoder = StreamDecoder()
+    state = SpectatorState()
+    states.append(state)
+    try:
+        while True:
+            data = await reader.read(4096)
+            if not data:
+                break
+            for message in decoder.feed(data):
+                state.apply(message)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(address, bots, tick_period, seed, duration, spectators):
+    hub = SpectatorHub()
+    listener = await hub.start(address)
+    print(f"Трансляция на {address[1:]}, такт {tick_period} с")
+    loop = asyncio.get_running_loop()
+    stop_at = loop.time() + duration if duration else float('inf')
+    states = []
+    async with listener:
+        tasks = [asyncio.create_task(run_spectator(address, states)) for _ in range(spectators)]
+        core = await play_rounds(hub, bots, tick_period, seed, stop_at)
+        # Даем зрителям дочитать последние такты
+        await asyncio.sleep(0.5)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return hub, core, states
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Трансляция партий ботов зрителям")
+    parser.add_argument('address', help="host:port, порт или путь Unix-сокета")
+    parser.add_argument('--bots', nargs=2, default=['greedy', 'greedy'], metavar=('BLUE', 'RED'),
+                        help="боты: random, greedy, alphabeta[:секунд на такт]")
+    parser.add_argument('--tick', type=float, default=1.0, help="период такта, секунд")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--duration', type=float, default=0.0, help="длительность, секунд (0 - без конца)")
+    parser.add_argument('--spectators', type=int, default=0,
+                        help="зрителей без окна в этом же процессе (для проверки нагрузки)")
+    args = parser.parse_args()
+
+    try:
+        hub, core, states = asyncio.run(serve(parse_address(args.address), args.bots, args.tick, args.seed,
+                                              args.duration, args.spectators))
+    except KeyboardInterrupt:
+        return
+
+    stats = hub.stats()
+    print(f"Сообщений: {stats['messages']}, отправлено: {stats['bytes_sent'] / 1024:.1f} КБ, "
+          f"подключалось: {stats['subscribed']}, отключено медленных: {stats['dropped']}")
+    print(f"Рассылка одного сообщения: p50 {stats['publish_p50'] * 1000:.2f} мс, "
+          f"p99 {stats['publish_p99'] * 1000:.2f} мс")
+    if states:
+        in_sync = sum(1 for state in states if state.synced and state.board == core.board)
+        print(f"Зрителей с доской как у сервера: {in_sync}/{len(states)}, "
+              f"пропусков тактов: {sum(state.desyncs for state in states)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""Набор данных из самоигры для обучения оценки позиций.
+
+Партии играются ботами из bots.py по правилам ядра (как в Game.update()).
+В каждой точке решения - фигура в зоне перемещения - записывается образец:
+доска с точки зрения ходящего (плоскость 0 - его фигуры, 1 - соперника),
+падающая фигура (строка, колонка, цвет), выбранный сдвиг и итог партии для
+ходящего (1 - победа, 0 - ничья, -1 - поражение).
+
+Партии делятся на пакеты, пакеты играются в процессах-исполнителях, а
+результаты принимаются строго по порядку пакетов и складываются в шарды
+фиксированного размера (сжатые .npz). Повторы отбрасываются по хешу
+канонической позиции: позиция и ее зеркальное отражение считаются одной.
+В памяти - только буфер одного шарда, ограниченное число пакетов в работе
+и отсортированный массив хешей.
+
+Продолжение после остановки: в каждом шарде записан номер пакета, с
+которого нужно продолжить, а хеши уже записанных образцов восстанавливаются
+из шардов. Повторно сыгранная часть пакета отбрасывается как повтор,
+поэтому продолжение дает те же шарды, что и запуск без остановки.
+
+Запуск: python dataset.py data/ --shards 20 --shard-size 65536 --workers 8 [--bots greedy greedy]
+"""
+
+import argparse
+import collections
+import glob
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch import BLUE, RED
+from bitboard import BitboardCore, STRIDE
+from bots import make_bot
+from engine import GRID_WIDTH, GRID_HEIGHT, MOVE_ZONE_ROWS, OPPONENT, PIECES, STAY
+
+# Образец: доска (2, высота, ширина) int8, фигура (строка, колонка, цвет), сдвиг, итог для ходящего
+Sample = collections.namedtuple('Sample', 'board piece action outcome')
+
+PLAYER_CODES = {'blue': BLUE, 'red': RED}
+
+# Байт на битовую доску (STRIDE * GRID_WIDTH бит)
+BITBOARD_BYTES = (STRIDE * GRID_WIDTH + 7) // 8
+
+# Номер бита каждой клетки в порядке (строка, колонка) - для развертки битовых досок в тензор
+CELL_BITS = np.array([col * STRIDE + row for row in range(GRID_HEIGHT) for col in range(GRID_WIDTH)])
+
+COLUMN_MASK = (1 << STRIDE) - 1
+
+MANIFEST = 'dataset.json'
+SHARD_PATTERN = 'shard-{:05d}.npz'
+
+# Номер пакета смешивается с общим зерном, как в tournament.py
+SEED_STRIDE = 1000003
+
+
+def mirror_bits(bits):
+    """Битовая доска, отраженная слева направо"""
+    mirrored = 0
+    for col in range(GRID_WIDTH):
+        mirrored |= (bits >> (col * STRIDE) & COLUMN_MASK) << ((GRID_WIDTH - 1 - col) * STRIDE)
+    return mirrored
+
+
+def position_hash(mover, opponent, row, col):
+    """64-битный хеш канонической позиции: меньшая из позиции и ее отражения"""
+    key = (mover.to_bytes(BITBOARD_BYTES, 'little') + opponent.to_bytes(BITBOARD_BYTES, 'little')
+           + bytes((row, col)))
+    mirrored = (mirror_bits(mover).to_bytes(BITBOARD_BYTES, 'little')
+                + mirror_bits(opponent).to_bytes(BITBOARD_BYTES, 'little') + bytes((row, GRID_WIDTH - 1 - col)))
+    digest = hashlib.blake2b(min(key, mirrored), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def board_tensors(movers, opponents):
+    """Битовые доски (списки чисел) в тензор (n, 2, высота, ширина) int8"""
+    planes = []
+    for boards in (movers, opponents):
+        raw = b''.join(bits.to_bytes(BITBOARD_BYTES, 'little') for bits in boards)
+        bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8).reshape(len(boards), BITBOARD_BYTES),
+                             axis=1, bitorder='little')
+        planes.append(bits[:, CELL_BITS].reshape(len(boards), GRID_HEIGHT, GRID_WIDTH))
+    return np.stack(planes, axis=1).astype(np.int8)
+
+
+def selfplay(blue, red, rng, epsilon=0.0, games=None):
+    """Генератор образцов из games партий ботов blue и red (None - без конца).
+
+    Образец - (свои фигуры, фигуры соперника, строка, колонка, цвет, сдвиг,
+    итог) с битовыми досками; образцы партии выдаются после ее завершения,
+    когда известен итог. С вероятностью epsilon вместо хода бота берется
+    случайный сдвиг - так в наборе больше разных позиций.
+    """
+    bots = {'blue': blue, 'red': red}
+    core = BitboardCore()
+    played = 0
+    while games is None or played < games:
+        played += 1
+        core.reset()
+        records = []
+        while not core.game_over:
+            piece = core.current_piece
+            # Ниже зоны перемещения выбора нет: образцов нет, бота не спрашиваем
+            if piece['row'] >= MOVE_ZONE_ROWS:
+                core.step(STAY)
+                continue
+            player = core.current_player
+            if epsilon and rng.random() < epsilon:
+                action = rng.choice(core.legal_actions())
+            else:
+                action = bots[player].choose_action(core)
+            own = PIECES[player]
+            records.append((core.bitboards[own], core.bitboards[PIECES[OPPONENT[player]]],
+                            piece['row'], piece['col'], player, action))
+            core.step(action)
+
+        winner = core.winner()
+        for mover, opponent, row, col, player, action in records:
+            outcome = 0 if winner == 'draw' else (1 if winner == player else -1)
+            yield mover, opponent, row, col, player, action, outcome
+
+
+def selfplay_samples(blue='greedy', red='greedy', seed=0, epsilon=0.1):
+    """Бесконечный генератор Sample (с тензором доски) для обучения в том же процессе"""
+    rng = random.Random(seed)
+    records = selfplay(make_bot(blue, seed * 2), make_bot(red, seed * 2 + 1), rng, epsilon)
+    for mover, opponent, row, col, player, action, outcome in records:
+        board = board_tensors([mover], [opponent])[0]
+        yield Sample(board, (row, col, PLAYER_CODES[player]), action, outcome)
+
+
+def play_chunk(blue, red, games, seed, epsilon):
+    """Сыграть пакет партий в процессе-исполнителе; вернуть столбцы образцов и хеши позиций"""
+    rng = random.Random(seed)
+    records = selfplay(make_bot(blue, seed * 2), make_bot(red, seed * 2 + 1), rng, epsilon, games)
+
+    movers, opponents, pieces, actions, outcomes, hashes = [], [], [], [], [], []
+    for mover, opponent, row, col, player, action, outcome in records:
+        movers.append(mover)
+        opponents.append(opponent)
+        pieces.append((row, col, PLAYER_CODES[player]))
+        actions.append(action)
+        outcomes.append(outcome)
+        hashes.append(position_hash(mover, opponent, row, col))
+
+    return {
+        'boards': board_tensors(movers, opponents),
+        'pieces': np.array(pieces, dtype=np.int8).reshape(-1, 3),
+        'actions': np.array(actions, dtype=np.int8),
+        'outcomes': np.array(outcomes, dtype=np.int8),
+        'hashes': np.array(hashes, dtype=np.uint64),
+    }
+
+
+class SeenHashes:
+    """Множество хешей в отсортированных массивах NumPy (8 байт на позицию).
+
+    Новые хеши добавляются отдельным уровнем; соседние уровни сливаются,
+    когда младший дорастает до старшего, поэтому уровней - порядка log(n).
+    """
+    def __init__(self):
+        self.levels = []
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels)
+
+    def contains(self, hashes):
+        """Маска хешей, которые уже есть"""
+        found = np.zeros(len(hashes), dtype=bool)
+        for level in self.levels:
+            index = np.searchsorted(level, hashes)
+            index[index == len(level)] = 0
+            found |= level[index] == hashes
+        return found
+
+    def add(self, hashes):
+        """Добавить хеши (без повторов с уже добавленными)"""
+        if not len(hashes):
+            return
+        self.levels.append(np.sort(hashes))
+        while len(self.levels) > 1 and len(self.levels[-1]) >= len(self.levels[-2]):
+            last = self.levels.pop()
+            self.levels[-1] = np.union1d(self.levels[-1], last)
+
+    def new_mask(self, hashes):
+        """Маска образцов, которые стоит взять: хеша еще нет и это его первое вхождение"""
+        mask = np.zeros(len(hashes), dtype=bool)
+        _, first = np.unique(hashes, return_index=True)
+        mask[first] = True
+        mask &= ~self.contains(hashes)
+        return mask
+
+
+def shard_path(directory, index):
+    return os.path.join(directory, SHARD_PATTERN.format(index))
+
+
+def write_shard(path, columns, next_chunk):
+    """Запись шарда (атомарно, через временный файл)"""
+    temp = path + '.tmp'
+    with open(temp, 'wb') as f:
+        np.savez_compressed(f, next_chunk=np.int64(next_chunk), **columns)
+    os.replace(temp, path)
+
+
+def load_shard(path):
+    """Столбцы шарда: boards, pieces, actions, outcomes, hashes и next_chunk"""
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def shard_paths(directory):
+    """Готовые шарды по порядку"""
+    return sorted(glob.glob(os.path.join(directory, SHARD_PATTERN.replace('{:05d}', '[0-9]' * 5))))
+
+
+def read_samples(directory):
+    """Генератор Sample по всем шардам каталога (шарды читаются по одному)"""
+    for path in shard_paths(directory):
+        shard = load_shard(path)
+        for board, piece, action, outcome in zip(shard['boards'], shard['pieces'],
+                                                 shard['actions'], shard['outcomes']):
+            yield Sample(board, tuple(int(x) for x in piece), int(action), int(outcome))
+
+
+def check_manifest(directory, params):
+    """Параметры набора: при продолжении они должны совпадать с записанными"""
+    path = os.path.join(directory, MANIFEST)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved != params:
+            raise ValueError(f"в {directory} уже есть набор с другими параметрами: {saved}")
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(params, f, ensure_ascii=False, indent=2)
+
+
+def export(directory, shards, shard_size=65536, bots=('greedy', 'greedy'), epsilon=0.1, workers=None,
+           chunk_games=20, seed=0, progress=None):
+    """Довести число шардов в каталоге до shards.
+
+    Возвращает словарь со статистикой: шарды, образцы, партии, повторы, время.
+    """
+    os.makedirs(directory, exist_ok=True)
+    blue, red = bots
+    check_manifest(directory, {'shard_size': shard_size, 'bots': [blue, red], 'epsilon': epsilon,
+                               'chunk_games': chunk_games, 'seed': seed})
+
+    # Восстановление после остановки: хеши записанных образцов и следующий пакет
+    seen = SeenHashes()
+    next_chunk = 0
+    existing = shard_paths(directory)
+    for path in existing:
+        shard = load_shard(path)
+        seen.add(shard['hashes'])
+        next_chunk = int(shard['next_chunk'])
+    index = len(existing)
+
+    stats = {'shards': 0, 'samples': 0, 'games': 0, 'duplicates': 0, 'resumed_from': index}
+    start = time.perf_counter()
+    if index >= shards:
+        stats['elapsed'] = 0.0
+        return stats
+
+    # Буфер одного шарда
+    buffer = {
+        'boards': np.empty((shard_size, 2, GRID_HEIGHT, GRID_WIDTH), dtype=np.int8),
+        'pieces': np.empty((shard_size, 3), dtype=np.int8),
+        'actions': np.empty(shard_size, dtype=np.int8),
+        'outcomes': np.empty(shard_size, dtype=np.int8),
+        'hashes': np.empty(shard_size, dtype=np.uint64),
+    }
+    filled = 0
+
+    workers = workers or os.cpu_count()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending = collections.deque()
+    chunk = next_chunk
+    try:
+        while index < shards:
+            # Не больше двух пакетов в работе на процесс: память ограничена
+            while len(pending) < workers * 2:
+                pending.append((chunk, executor.submit(play_chunk, blue, red, chunk_games,
+                                                       seed * SEED_STRIDE + chunk, epsilon)))
+                chunk += 1
+
+            # Пакеты принимаются по порядку - от этого зависит продолжение после остановки
+            chunk_index, future = pending.popleft()
+            result = future.result()
+            stats['games'] += chunk_games
+            mask = seen.new_mask(result['hashes'])
+            stats['duplicates'] += len(mask) - int(mask.sum())
+            taken = {name: column[mask] for name, column in result.items()}
+            seen.add(taken['hashes'])
+
+            offset = 0
+            count = len(taken['hashes'])
+            while offset < count and index < shards:
+                size = min(shard_size - filled, count - offset)
+                for name, column in taken.items():
+                    buffer[name][filled:filled + size] = column[offset:offset + size]
+                filled += size
+                offset += size
+                if filled == shard_size:
+                    # Пакет, часть которого не вошла в шард, при продолжении играется заново
+                    write_shard(shard_path(directory, index), buffer,
+                                chunk_index if offset < count else chunk_index + 1)
+                    index += 1
+                    filled = 0
+                    stats['shards'] += 1
+                    stats['samples'] += shard_size
+                    if progress:
+                        progress(index, shards, stats, time.perf_counter() - start)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    stats['elapsed'] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Набор образцов из самоигры ботов")
+    parser.add_argument('directory', help="каталог для шардов")
+    parser.add_argument('--shards', type=int, default=10, help="сколько шардов должно быть в каталоге")
+    parser.add_argument('--shard-size', type=int, default=65536, help="образцов в шарде")
+    parser.add_argument('--bots', nargs=2, default=['greedy', 'greedy'], metavar=('BLUE', 'RED'),
+                        help="боты: random, greedy, alphabeta[:секунд на такт]")
+    parser.add_argument('--epsilon', type=float, default=0.1, help="доля случайных сдвигов")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="число процессов")
+    parser.add_argument('--chunk', type=int, default=20, help="партий в одном пакете")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for spec in args.bots:
+        try:
+            make_bot(spec)
+        except ValueError as error:
+            parser.error(str(error))
+
+    def progress(done, total, stats, elapsed):
+        print(f"\rШардов: {done}/{total}, образцов в секунду: {stats['samples'] / elapsed:,.0f}",
+              end='', file=sys.stderr, flush=True)
+
+    try:
+        stats = export(args.directory, args.shards, args.shard_size, args.bots, args.epsilon, args.workers,
+                       args.chunk, args.seed, progress)
+    except ValueError as error:
+        parser.error(str(error))
+    print(file=sys.stderr)
+
+    elapsed = stats['elapsed']
+    total = stats['samples'] + stats['duplicates']
+    print(f"Записано шардов: {stats['shards']} (продолжение с {stats['resumed_from']}), "
+          f"образцов: {stats['samples']}, партий: {stats['games']}")
+    print(f"Повторов отброшено: {stats['duplicates']} ({stats['duplicates'] / max(total, 1):.1%}), "
+          f"{stats['samples'] / elapsed if elapsed else 0:,.0f} образцов в секунду")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Игровое ядро крестиков-ноликов с гравитацией без зависимостей от pygame.
+
+Ядро не знает ни о времени, ни об окне: один вызов step(action) — это один
+такт падения фигуры, который в графической версии происходит раз в секунду.
+
+Размеры поля и длина выигрышной линии задаются для каждой партии через
+Geometry; константы ниже описывают стандартное поле 7x10.
+"""
+
+import itertools
+
+# Размеры стандартного поля
+GRID_WIDTH = 7  # ширина игрового поля в клетках
+GRID_HEIGHT = 10  # высота игрового поля в клетках (4 верхние + 6 нижних)
+MOVE_ZONE_ROWS = 4  # верхние строки - зона перемещения
+WIN_LENGTH = 4  # сколько фигур в ряд нужно для победы
+
+# Действия игрока на очередном такте
+LEFT = -1
+STAY = 0
+RIGHT = 1
+ACTIONS = (LEFT, STAY, RIGHT)
+DROP = 2  # жесткий сброс: фигура сразу падает до точки приземления
+
+# Причины завершения раунда (условия из check_game_over)
+END_LINE = 'line'            # 4 в ряд
+END_MOVE_ZONE = 'move_zone'  # фигура осталась в зоне перемещения
+END_FULL = 'full'            # зона размещения заполнена
+END_REASONS = (END_LINE, END_MOVE_ZONE, END_FULL)
+
+# Число клеток в зоне размещения стандартного поля
+PLACEMENT_CELLS = (GRID_HEIGHT - MOVE_ZONE_ROWS) * GRID_WIDTH
+
+# Фигуры игроков и очередность ходов
+PIECES = {'blue': 'X', 'red': 'O'}
+OPPONENT = {'blue': 'red', 'red': 'blue'}
+
+# Номера раундов: общие для всех ядер процесса, чтобы ключ (round_id, ply)
+# не повторялся ни после reset(), ни у нового ядра на месте удаленного
+ROUND_IDS = itertools.count(1)
+
+# Направления для проверки: горизонталь, вертикаль, две диагонали
+WIN_DIRECTIONS = (
+    (0, 1),   # горизонталь
+    (1, 0),   # вертикаль
+    (1, 1),   # диагональ
+    (1, -1)   # диагональ
+)
+
+
+class Geometry:
+    """Размеры поля и длина выигрышной линии одной партии"""
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, move_zone_rows=MOVE_ZONE_ROWS, win_length=WIN_LENGTH):
+        if width < 1:
+            raise ValueError("ширина поля должна быть не меньше 1")
+        if not 1 <= move_zone_rows < height:
+            raise ValueError("зона перемещения должна занимать от 1 строки до высоты поля без одной")
+        if win_length < 2:
+            raise ValueError("выигрышная линия должна быть не короче 2 фигур")
+        self.width = width
+        self.height = height
+        self.move_zone_rows = move_zone_rows
+        self.win_length = win_length
+        self.placement_cells = (height - move_zone_rows) * width
+
+    def as_tuple(self):
+        return (self.width, self.height, self.move_zone_rows, self.win_length)
+
+    def __eq__(self, other):
+        return isinstance(other, Geometry) and self.as_tuple() == other.as_tuple()
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def __repr__(self):
+        return 'Geometry(width={}, height={}, move_zone_rows={}, win_length={})'.format(*self.as_tuple())
+
+
+# Стандартное поле
+DEFAULT_GEOMETRY = Geometry()
+
+
+class GameCore:
+    """Правила игры: доска, падающая фигура и условия завершения раунда.
+
+    Все проверки локальны: линия ищется только вокруг поставленной фигуры
+    (не дальше win_length - 1 клеток в каждую сторону), заполненность зоны -
+    по счетчику, поэтому ход не дорожает с ростом поля.
+    """
+    def __init__(self, first_player='blue', geometry=None):
+        # Размеры копируются в атрибуты ядра, чтобы не обращаться к geometry в горячих методах
+        self.geometry = geometry or DEFAULT_GEOMETRY
+        self.width = self.geometry.width
+        self.height = self.geometry.height
+        self.move_zone_rows = self.geometry.move_zone_rows
+        self.win_length = self.geometry.win_length
+        self.reset(first_player)
+
+    def reset(self, first_player='blue'):
+        """Сброс состояния игры к начальному"""
+        # Игровое поле (height строк, width колонок)
+        self.board = [[None] * self.width for _ in range(self.height)]
+
+        # Высота заполнения каждой колонки и число фигур в зоне размещения
+        self.heights = [0] * self.width
+        self.filled = 0
+
+        # Текущий игрок (по умолчанию синий начинает)
+        self.current_player = first_player
+
+        # Текущая падающая фигура
+        self.current_piece = None
+
+        # Состояние игры
+        self.game_over = False
+        self.result = None
+        self.end_reason = None
+        self.winning_line = None
+
+        # Количество сыгранных тактов и номер раунда
+        self.ply = 0
+        self.round_id = next(ROUND_IDS)
+
+        # Запуск первого хода
+        self.start_turn()
+
+    def copy(self):
+        """Независимая копия состояния (для поиска и симуляций)"""
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone.board = [row[:] for row in self.board]
+        clone.heights = self.heights[:]
+        if self.current_piece:
+            clone.current_piece = dict(self.current_piece)
+        return clone
+
+    def start_turn(self):
+        """Начало хода игрока"""
+        # Создаем новую падающую фигуру
+        self.current_piece = {
+            'type': PIECES[self.current_player],
+            'row': 0,
+            'col': self.width // 2  # центральная колонка
+        }
+
+    def landing_row(self, col):
+        """Строка, на которой остановится фигура, падающая в колонке col"""
+        return self.height - 1 - self.heights[col]
+
+    def landing_cell(self):
+        """Клетка, куда упадет текущая фигура без дальнейших сдвигов"""
+        if not self.current_piece:
+            return None
+        col = self.current_piece['col']
+        return self.landing_row(col), col
+
+    def legal_actions(self):
+        """Действия, которые приводят к разным результатам на следующем такте.
+
+        DROP сюда не входит: он дает тот же результат, что и STAY на всех
+        оставшихся тактах.
+        """
+        if self.game_over:
+            return ()
+
+        row = self.current_piece['row']
+        col = self.current_piece['col']
+
+        # Вне зоны перемещения фигура только падает
+        if row >= self.move_zone_rows:
+            return (STAY,)
+
+        # Сдвиг возможен, только если клетка снизу в новой колонке свободна
+        below = self.board[row + 1]
+        actions = [STAY]
+        if col > 0 and below[col - 1] is None:
+            actions.insert(0, LEFT)
+        if col < self.width - 1 and below[col + 1] is None:
+            actions.append(RIGHT)
+        return tuple(actions)
+
+    def step(self, action=STAY):
+        """Один такт падения фигуры со сдвигом action (-1, 0 или 1) или жесткий сброс DROP.
+
+        Возвращает True, если на этом такте фигура была зафиксирована.
+        """
+        if self.game_over:
+            return False
+
+        piece = self.current_piece
+        self.ply += 1
+
+        # Жесткий сброс: сразу в точку приземления, дальше обычная фиксация
+        if action == DROP:
+            piece['row'] = self.landing_row(piece['col'])
+            self.place_piece()
+            return True
+
+        # Применяем сдвиг только если фигура в зоне перемещения
+        if action and piece['row'] < self.move_zone_rows:
+            new_col = piece['col'] + action
+
+            # Проверяем, можно ли переместиться в новую колонку
+            # и свободна ли клетка снизу в новой колонке
+            if 0 <= new_col < self.width and self.board[piece['row'] + 1][new_col] is None:
+                # Перемещаем фигуру по диагонали
+                piece['col'] = new_col
+
+        # Перемещение фигуры вниз
+        piece['row'] += 1
+        row = piece['row']
+
+        # Если достигли дна или под фигурой есть другая фигура
+        if row >= self.height - 1 or self.board[row + 1][piece['col']] is not None:
+            self.place_piece()
+            return True
+        return False
+
+    def place_piece(self):
+        """Фиксация фигуры на игровом поле"""
+        if not self.current_piece:
+            return
+
+        # Фиксация фигуры на доске
+        row = self.current_piece['row']
+        col = self.current_piece['col']
+        self.board[row][col] = self.current_piece['type']
+        self.heights[col] += 1
+        if row >= self.move_zone_rows:
+            self.filled += 1
+
+        # Проверка условий завершения игры
+        self.check_game_over(row, col)
+
+        # Если игра не завершена, передаем ход другому игроку
+        if not self.game_over:
+            self.current_player = OPPONENT[self.current_player]
+            self.start_turn()
+        else:
+            self.current_piece = None
+
+    def check_game_over(self, last_row, last_col):
+        """Проверка условий завершения игрового раунда"""
+        # Условие 3: Фигура в зоне перемещения
+        if last_row < self.move_zone_rows:
+            self.game_over = True
+            # Проиграл игрок, который поставил фигуру
+            self.result = OPPONENT[self.current_player]
+            self.end_reason = END_MOVE_ZONE
+            return
+
+        # Условие 1: Проверка 4 в ряд
+        self.winning_line = self.check_win(last_row, last_col)
+        if self.winning_line:
+            self.game_over = True
+            self.result = self.current_player
+            self.end_reason = END_LINE
+            return
+
+        # Условие 2: Зона размещения заполнена
+        if self.is_placement_zone_full():
+            self.game_over = True
+            self.result = 'draw'  # ничья
+            self.end_reason = END_FULL
+
+    def check_win(self, row, col):
+        """Проверка наличия выигрышной комбинации из win_length фигур.
+
+        Возвращает (start_row, start_col, end_row, end_col) или None. Линия
+        длиннее win_length может появиться, только если фигура соединила две
+        линии короче win_length, поэтому обход не выходит за 2 * win_length клеток.
+        """
+        board = self.board
+        piece = board[row][col]
+        if not piece:
+            return None
+        height = self.height
+        width = self.width
+
+        for dr, dc in WIN_DIRECTIONS:
+            # Идем в обратном направлении до края линии
+            start_row, start_col = row, col
+            r, c = row - dr, col - dc
+            while 0 <= r < height and 0 <= c < width and board[r][c] == piece:
+                start_row, start_col = r, c
+                r -= dr
+                c -= dc
+
+            # Идем в прямом направлении до края линии
+            end_row, end_col = row, col
+            r, c = row + dr, col + dc
+            while 0 <= r < height and 0 <= c < width and board[r][c] == piece:
+                end_row, end_col = r, c
+                r += dr
+                c += dc
+
+            # Длина линии вдоль направления
+            count = max(abs(end_row - start_row), abs(end_col - start_col)) + 1
+            if count >= self.win_length:
+                return (start_row, start_col, end_row, end_col)
+
+        return None
+
+    def is_placement_zone_full(self):
+        """Проверка заполненности зоны размещения по счетчику фигур"""
+        return self.filled == self.geometry.placement_cells
+
+    def is_terminal(self):
+        """Завершен ли раунд"""
+        return self.game_over
+
+    def winner(self):
+        """Победитель раунда: 'blue', 'red', 'draw' или None, пока игра идет"""
+        return self.result
@@ -0,0 +1,202 @@
+"""Подсказки для падающей фигуры: анализ сдвигов в фоновом потоке.
+
+Для каждого сдвига, который разрешает Game.request_move() (влево, на
+месте, вправо), предсказывается клетка приземления и ее немедленный
+исход, а также клетки, где соперник следующей фигурой собирает линию.
+Затем те же сдвиги оцениваются поиском AlphaBetaAI.analyze() с
+углублением, пока позиция не изменится.
+
+Позиция меняется на каждом такте ядра (start_turn() и place_piece()
+вызываются из step()), поэтому анализ привязан к (id(ядра), ply): при
+новой позиции текущий поиск отменяется и начинается заново. Поток
+отрисовки ничего не ждет: готовые результаты публикуются присваиванием
+неизменяемого HintResult атрибуту result, а читаются одним чтением этого
+атрибута.
+"""
+
+import threading
+from collections import namedtuple
+
+from ai import AlphaBetaAI, WIN_SCORE
+from engine import OPPONENT, PIECES
+
+# Оценка одного сдвига: клетка приземления без дальнейших сдвигов,
+# немедленный исход ('win', 'loss' или None) и оценка поиска (None, пока ее нет)
+DriftHint = namedtuple('DriftHint', 'action cell outcome value')
+
+# Результат анализа позиции: сдвиги, клетки, где соперник выигрывает
+# следующей фигурой, и глубина поиска, на которой получены оценки
+HintResult = namedtuple('HintResult', 'position drifts threats depth')
+
+# Виды отметок на поле
+HINT_WIN = 'win'          # сдвиг выигрывает (сразу или форсированно)
+HINT_LOSS = 'loss'        # сдвиг проигрывает
+HINT_NEUTRAL = 'neutral'  # исход не определен
+HINT_THREAT = 'threat'    # соперник выиграет, поставив фигуру в эту клетку
+
+# Оценки поиска по модулю выше этой - форсированный выигрыш или проигрыш
+FORCED = WIN_SCORE // 2
+
+
+def position_key(core):
+    """Ключ позиции: меняется на каждом такте и при новом раунде.
+
+    id ядра для этого не годится: Game переиспользует ядро между раундами,
+    а освобожденный id может достаться новому ядру.
+    """
+    return (core.round_id, core.ply)
+
+
+def quick_analysis(position, core):
+    """Клетки приземления сдвигов и угрозы без поиска (доли миллисекунды)"""
+    probe = core.copy()
+    board = probe.board
+    player = core.current_player
+
+    drifts = []
+    for action in core.legal_actions():
+        child = core.copy()
+        piece = child.current_piece
+        if child.step(action):
+            # step() менял фигуру на месте: в piece клетка, где она зафиксирована
+            cell = (piece['row'], piece['col'])
+        else:
+            cell = child.landing_cell()
+        drifts.append(DriftHint(action, cell, landing_outcome(probe, cell, PIECES[player]), None))
+
+    # Клетки, где соперник выиграет следующей фигурой
+    threat_piece = PIECES[OPPONENT[player]]
+    threats = []
+    for col in range(core.width):
+        row = probe.landing_row(col)
+        if row >= core.move_zone_rows:
+            board[row][col] = threat_piece
+            if probe.check_win(row, col):
+                threats.append((row, col))
+            board[row][col] = None
+
+    return HintResult(position, tuple(drifts), tuple(threats), 0)
+
+
+def landing_outcome(probe, cell, piece):
+    """Немедленный исход фигуры piece в клетке cell: 'win', 'loss' или None"""
+    row, col = cell
+    if row < probe.move_zone_rows:
+        return HINT_LOSS
+    probe.board[row][col] = piece
+    line = probe.check_win(row, col)
+    probe.board[row][col] = None
+    return HINT_WIN if line else None
+
+
+def hint_marks(result):
+    """Отметки для отрисовки: кортеж (строка, колонка, вид, лучший ли сдвиг)"""
+    if result is None:
+        return ()
+    # Лучший сдвиг выделяется, только если оценки различаются
+    best = None
+    values = [drift.value for drift in result.drifts if drift.value is not None]
+    if len(values) > 1 and min(values) != max(values):
+        best = max(values)
+
+    marks = []
+    for drift in result.drifts:
+        kind = drift.outcome or HINT_NEUTRAL
+        if drift.value is not None and not drift.outcome:
+            if drift.value >= FORCED:
+                kind = HINT_WIN
+            elif drift.value <= -FORCED:
+                kind = HINT_LOSS
+        marks.append((drift.cell[0], drift.cell[1], kind, best is not None and drift.value == best))
+    for row, col in result.threats:
+        marks.append((row, col, HINT_THREAT, False))
+    return tuple(marks)
+
+
+class HintAnalyzer:
+    """Фоновый анализ позиции текущего раунда.
+
+    update(game) вызывается каждый кадр из потока отрисовки и только
+    передает новую позицию рабочему потоку; current(game) и marks(game)
+    возвращают последний опубликованный результат для этой позиции.
+    deep=False - без поиска (например, для нестандартного поля, на которое
+    не рассчитана эвристика AlphaBetaAI).
+    """
+    def __init__(self, deep=True, table_size=1 << 18):
+        self.ai = AlphaBetaAI(table_size=table_size) if deep else None
+        self.result = None
+        self.analyses = 0
+        self._position = None
+        self._request = None  # (позиция, копия ядра) для рабочего потока
+        self._closed = False
+        self._marked = None
+        self._marks = ()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def update(self, game):
+        """Передать рабочему потоку позицию, если она изменилась"""
+        core = game.core
+        position = position_key(core)
+        if position == self._position:
+            return
+        self._position = position
+        self._request = None if core.game_over else (position, core.copy())
+        if self.ai:
+            self.ai.cancel()
+        self._wake.set()
+
+    def current(self, game):
+        """Результат анализа текущей позиции или None, если он еще не готов"""
+        result = self.result
+        if result is not None and result.position == position_key(game.core):
+            return result
+        return None
+
+    def marks(self, game):
+        """Отметки текущей позиции (пересчитываются только при новом результате)"""
+        result = self.current(game)
+        if result is not self._marked:
+            self._marked = result
+            self._marks = hint_marks(result)
+        return self._marks
+
+    def close(self):
+        """Остановить рабочий поток"""
+        self._closed = True
+        if self.ai:
+            self.ai.cancel()
+        self._wake.set()
+        self._thread.join()
+
+    def _worker(self):
+        """Тело рабочего потока"""
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                return
+            # Отмена снимается до чтения запроса: более новый запрос отменит этот анализ
+            if self.ai:
+                self.ai.cancel(False)
+            request = self._request
+            if request is None:
+                continue
+
+            position, core = request
+            result = quick_analysis(position, core)
+            self.result = result
+            self.analyses += 1
+            if self.ai is None or len(result.drifts) < 2:
+                continue
+
+            def report(depth, values):
+                # Устаревшую позицию не публикуем и не углубляем
+                if self._request is not request:
+                    return False
+                drifts = tuple(drift._replace(value=values[drift.action]) for drift in result.drifts)
+                self.result = result._replace(drifts=drifts, depth=depth)
+                return True
+
+            self.ai.analyze(core, report)
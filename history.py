@@ -0,0 +1,247 @@
+"""История сыгранных раундов в SQLite.
+
+Запись идет в фоновом потоке пакетами, поэтому цикл отрисовки не ждет
+диска: record() только кладет раунд в очередь и обновляет сводку в
+памяти. Итоги по победителям хранятся в отдельной таблице totals,
+которая обновляется в той же транзакции, что и вставка раундов, так что
+при открытии сводка читается из нескольких строк, а не подсчетом по всей
+истории.
+
+Просмотр: python history.py history.db --recent 20 [--winner blue]
+"""
+
+import argparse
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+
+# История по умолчанию - в домашнем каталоге пользователя
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.gravity_tictactoe_history.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rounds (
+    id INTEGER PRIMARY KEY,
+    finished_at REAL NOT NULL,
+    first_player TEXT NOT NULL,
+    winner TEXT,
+    end_reason TEXT,
+    plies INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    replay_path TEXT,
+    replay_index INTEGER
+);
+CREATE INDEX IF NOT EXISTS rounds_finished ON rounds (finished_at);
+CREATE INDEX IF NOT EXISTS rounds_winner ON rounds (winner, finished_at);
+CREATE TABLE IF NOT EXISTS totals (
+    winner TEXT PRIMARY KEY,
+    rounds INTEGER NOT NULL
+);
+"""
+
+RoundRecord = namedtuple('RoundRecord',
+                         'finished_at first_player winner end_reason plies duration replay_path replay_index')
+
+# Сколько раундов записывать одной транзакцией и как долго ждать, пока пакет наберется
+BATCH_SIZE = 64
+FLUSH_INTERVAL = 0.5
+
+# Сколько flush() ждет фоновый поток, секунд
+FLUSH_TIMEOUT = 10.0
+
+_STOP = object()
+
+
+class HistoryStore:
+    """История раундов со сводкой в памяти.
+
+    path=None - без файла: сводка считается только за время работы программы.
+    """
+    def __init__(self, path=DEFAULT_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.lost = 0  # раунды, которые не удалось записать
+        self._summary = {'blue': 0, 'red': 0, 'draw': 0, 'last_winner': None, 'rounds': 0}
+        self._queue = None
+        self._thread = None
+        if path is None:
+            return
+
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            for winner, rounds in db.execute("SELECT winner, rounds FROM totals"):
+                self._summary[winner] = rounds
+                self._summary['rounds'] += rounds
+            row = db.execute("SELECT winner FROM rounds ORDER BY id DESC LIMIT 1").fetchone()
+            if row:
+                self._summary['last_winner'] = row[0]
+        db.close()
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        # WAL: чтение из основного потока не ждет записи в фоновом
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def record(self, winner, end_reason, plies, duration, first_player='blue', replay_path=None, replay_index=None):
+        """Завершенный раунд: сводка обновляется сразу, запись в базу - в фоне"""
+        summary = self._summary
+        if winner in ('blue', 'red', 'draw'):
+            summary[winner] += 1
+        summary['last_winner'] = winner
+        summary['rounds'] += 1
+        if self._queue is not None:
+            self._queue.put(RoundRecord(time.time(), first_player, winner, end_reason, plies, duration,
+                                        replay_path, replay_index))
+
+    def summary(self):
+        """Итоги по победителям и победитель последнего раунда (без обращения к базе)"""
+        return dict(self._summary)
+
+    def _writer(self):
+        """Фоновый поток: пакетная запись раундов.
+
+        Ошибка базы (например, "database is locked" от второго экземпляра
+        игры) теряет только текущий пакет: она выводится в stderr, ожидающие
+        flush() освобождаются, и поток продолжает работу.
+        """
+        db = None
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch = []
+            deadline = time.perf_counter() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    # Запрос flush(): пишем то, что уже набрано
+                    try:
+                        db = self._write(db, batch)
+                    finally:
+                        item.set()
+                    batch = []
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+            db = self._write(db, batch)
+        if db is not None:
+            db.close()
+
+    def _write(self, db, batch):
+        """Запись пакета; возвращает соединение (None после ошибки - переподключение в следующий раз)"""
+        if not batch:
+            return db
+        try:
+            if db is None:
+                db = self._connect()
+            self._insert(db, batch)
+        except sqlite3.Error as error:
+            self.lost += len(batch)
+            print(f"История: пакет из {len(batch)} раундов не записан в {self.path}: {error}", file=sys.stderr)
+            if db is not None:
+                db.close()
+            return None
+        return db
+
+    def _insert(self, db, batch):
+        with db:
+            db.executemany(
+                "INSERT INTO rounds (finished_at, first_player, winner, end_reason, plies, duration,"
+                " replay_path, replay_index) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch
+            )
+            counts = {}
+            for record in batch:
+                counts[record.winner] = counts.get(record.winner, 0) + 1
+            db.executemany(
+                "INSERT INTO totals (winner, rounds) VALUES (?, ?)"
+                " ON CONFLICT (winner) DO UPDATE SET rounds = rounds + excluded.rounds",
+                counts.items()
+            )
+        self.written += len(batch)
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Дождаться записи всех раундов из очереди; False, если не дождались за timeout секунд"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Записать остаток очереди и остановить фоновый поток"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _query(self, sql, args=()):
+        """Запрос к базе после записи очереди (не для цикла отрисовки)"""
+        if self.path is None:
+            return []
+        self.flush()
+        db = sqlite3.connect(self.path)
+        try:
+            return db.execute(sql, args).fetchall()
+        finally:
+            db.close()
+
+    def totals(self):
+        """Число раундов по победителям из таблицы totals"""
+        return dict(self._query("SELECT winner, rounds FROM totals"))
+
+    def recent(self, limit=20, winner=None):
+        """Последние раунды (по индексу времени завершения), при необходимости - одного победителя"""
+        columns = "finished_at, first_player, winner, end_reason, plies, duration, replay_path, replay_index"
+        if winner:
+            rows = self._query(f"SELECT {columns} FROM rounds WHERE winner = ? ORDER BY finished_at DESC LIMIT ?",
+                               (winner, limit))
+        else:
+            rows = self._query(f"SELECT {columns} FROM rounds ORDER BY finished_at DESC LIMIT ?", (limit,))
+        return [RoundRecord(*row) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="История сыгранных раундов")
+    parser.add_argument('path', nargs='?', default=DEFAULT_PATH, help="файл истории")
+    parser.add_argument('--recent', type=int, default=20, help="сколько последних раундов показать")
+    parser.add_argument('--winner', choices=['blue', 'red', 'draw'], help="только раунды с этим исходом")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        parser.error(f"нет файла истории: {args.path}")
+    with HistoryStore(args.path) as store:
+        totals = store.totals()
+        print(f"Раундов: {sum(totals.values())}, синие: {totals.get('blue', 0)}, "
+              f"красные: {totals.get('red', 0)}, ничьи: {totals.get('draw', 0)}")
+        for record in store.recent(args.recent, args.winner):
+            finished = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.finished_at))
+            replay = f"  {record.replay_path}#{record.replay_index}" if record.replay_path else ''
+            print(f"{finished}  {record.winner or '-':<5} {record.end_reason or '-':<10} "
+                  f"{record.plies:>4} тактов  {record.duration:6.1f} с{replay}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,23 @@
+import argparse
+import atexit
+import os
 import pygame
+import subprocess
 import sys
 import time
+from collections import OrderedDict
 
-# Инициализация Pygame
-pygame.init()
+from engine import GameCore, Geometry, DEFAULT_GEOMETRY, GRID_WIDTH, GRID_HEIGHT, DROP
+from profiler import FrameProfiler, NullProfiler
+
+# Компьютер, подсказки, история, архив партий, таблица эндшпиля и трансляция
+# импортируются в main() только при включенных опциях: импорт lab6 остается
+# быстрым и не тянет asyncio, sqlite3, multiprocessing и mmap
 
 # Константы
 SCREEN_WIDTH = 550
 SCREEN_HEIGHT = 550
 CELL_SIZE = 50
-GRID_WIDTH = 7  # ширина игрового поля в клетках
-GRID_HEIGHT = 10  # высота игрового поля в клетках (4 верхние + 6 нижних)
 
 # Цвета
 BACKGROUND = (255, 255, 128)  # фон интерфейса
@@ -25,10 +32,22 @@ EXIT_BUTTON_COLOR = (255, 0, 0)  # цвет кнопки "Выход"
 PLAY_BUTTON_COLOR = (0, 255, 0)  # цвет кнопки "Играть"
 TEXT_BG_COLOR = (128, 64, 0)  # фон текста информации
 TEXT_COLOR = (0, 0, 0)        # цвет текста
+HINT_COLORS = {                # рамки подсказок по исходу сдвига (ключи - hints.HINT_*)
+    'win': (0, 160, 0),
+    'loss': (255, 0, 0),
+    'neutral': (255, 255, 255),
+    'threat': (255, 128, 0)
+}
 
 # Рассчет размеров игрового поля
 BOARD_WIDTH = GRID_WIDTH * CELL_SIZE
 BOARD_HEIGHT = GRID_HEIGHT * CELL_SIZE
+MIN_CELL_SIZE = 12  # мельче клетки большого поля не уменьшаются, а прокручиваются
+
+# Период падения фигуры на одну клетку, секунд
+FALL_PERIOD = 1.0
+MAX_CATCH_UP = 5  # после паузы дольше стольких тактов (перетаскивание окна, отладчик) такты не навёрстываются
+FPS_LIMIT = 60  # частота кадров по умолчанию, пока что-то движется
 
 # Позиция игрового поля (центрирование по горизонтали)
 BOARD_X = (SCREEN_WIDTH - BOARD_WIDTH) // 2
@@ -44,13 +63,76 @@ MENU_BUTTON_Y = BOARD_HEIGHT + 10  # в игровом раунде
 PLAY_BUTTON_Y = 420
 EXIT_BUTTON_Y = 420
 
-# Создание окна
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Крестики-нолики с гравитацией")
+# Окно и шрифты создаются в init_app(), импорт модуля их не трогает
+screen = None
+font = None
+title_font = None
+
+def init_app(headless=False):
+    """Инициализация Pygame, создание окна и шрифтов.
+    
+    В режиме headless используется фиктивный видеодрайвер SDL, поэтому
+    дисплей не нужен (тесты, серверы, измерения).
+    """
+    global screen, font, title_font
+    if screen is not None:
+        return screen
+    
+    if headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    
+    # Нужны только окно и шрифты, звук и джойстики не инициализируем
+    pygame.display.init()
+    pygame.font.init()
+    
+    # Создание окна
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Крестики-нолики с гравитацией")
+    
+    # Шрифты: встроенный шрифт по умолчанию (SysFont(None) дает тот же шрифт,
+    # но сначала сканирует все системные шрифты)
+    font = pygame.font.Font(None, 36)
+    title_font = pygame.font.Font(None, 48)
+    return screen
+
+class TextCache:
+    """Ограниченный LRU-кэш отрисованных надписей.
+    
+    Ключ - (шрифт, текст, цвет), поэтому при изменении счета новая строка
+    просто получает новую запись, а старые вытесняются при переполнении.
+    """
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def render(self, font, text, color):
+        """Поверхность с надписью (из кэша или новая)"""
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+    
+    def invalidate(self):
+        """Сброс кэша (например, после смены шрифта)"""
+        self.surfaces.clear()
+    
+    def stats(self):
+        """Счетчики попаданий и промахов"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.surfaces)}
 
-# Шрифты
-font = pygame.font.SysFont(None, 36)
-title_font = pygame.font.SysFont(None, 48)
+# Кэш надписей интерфейса
+text_cache = TextCache()
 
 class Button:
     """Класс для создания кнопок"""
@@ -61,15 +143,31 @@ class Button:
         self.hover_color = hover_color or color
         self.is_hovered = False
         
-    def draw(self, surface):
-        """Отрисовка кнопки"""
-        color = self.hover_color if self.is_hovered else self.color
-        pygame.draw.rect(surface, color, self.rect, border_radius=10)
-        pygame.draw.rect(surface, TEXT_COLOR, self.rect, 2, border_radius=10)
+        # Заранее собранные изображения кнопки: обычное и при наведении
+        self.surfaces = None
+    
+    def compose(self, color):
+        """Изображение кнопки заданного цвета вместе с рамкой и надписью"""
+        surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        local_rect = surface.get_rect()
+        pygame.draw.rect(surface, color, local_rect, border_radius=10)
+        pygame.draw.rect(surface, TEXT_COLOR, local_rect, 2, border_radius=10)
         
-        text_surf = font.render(self.text, True, TEXT_COLOR)
-        text_rect = text_surf.get_rect(center=self.rect.center)
+        text_surf = text_cache.render(font, self.text, TEXT_COLOR)
+        text_rect = text_surf.get_rect(center=local_rect.center)
         surface.blit(text_surf, text_rect)
+        return surface
+    
+    def set_text(self, text):
+        """Смена надписи (изображения будут собраны заново)"""
+        self.text = text
+        self.surfaces = None
+        
+    def draw(self, surface):
+        """Отрисовка кнопки"""
+        if self.surfaces is None:
+            self.surfaces = (self.compose(self.color), self.compose(self.hover_color))
+        surface.blit(self.surfaces[self.is_hovered], self.rect)
         
     def check_hover(self, pos):
         """Проверка наведения курсора"""
@@ -83,289 +181,399 @@ class Button:
         return False
 
 class Game:
-    def __init__(self):
+    """Игровой раунд в реальном времени: тонкая обертка над GameCore с таймером падения.
+    
+    broadcaster - broadcast.Broadcaster для трансляции раунда зрителям (или None).
+    """
+    def __init__(self, geometry=None, broadcaster=None):
+        self.core = GameCore(geometry=geometry)
+        self.broadcaster = broadcaster
         self.reset_game()
     
     def reset_game(self):
         """Сброс состояния игры к начальному"""
-        # Игровое поле (10 строк, 7 колонок)
-        self.board = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-        
-        # Текущий игрок (синий начинает)
-        self.current_player = 'blue'
-        
-        # Текущая падающая фигура
-        self.current_piece = None
+        self.core.reset()
         
         # Ожидающее перемещение (влево/вправо)
         self.pending_move = 0
         
-        # Состояние игры
-        self.game_over = False
-        self.winner = None
-        self.winning_line = None
+        # Действия по тактам для записи партии
+        self.actions = []
         
-        # Время последнего перемещения фигуры
-        self.last_move_time = time.time()
+        # Время последнего такта (монотонные часы) и начала раунда
+        self.last_move_time = time.perf_counter()
+        self.started = time.time()
         
-        # Запуск первого хода
-        self.start_turn()
+        if self.broadcaster:
+            self.broadcaster.start(self.core)
     
-    def start_turn(self):
-        """Начало хода игрока"""
-        # Создаем новую падающую фигуру
-        piece_type = 'X' if self.current_player == 'blue' else 'O'
-        self.current_piece = {
-            'type': piece_type,
-            'row': 0,
-            'col': GRID_WIDTH // 2  # центральная колонка
-        }
-        self.pending_move = 0  # сброс ожидающего перемещения
-        self.last_move_time = time.time()
+    # Состояние раунда хранится в ядре, отрисовка читает его через свойства
+    @property
+    def geometry(self):
+        return self.core.geometry
+    
+    @property
+    def board(self):
+        return self.core.board
+    
+    @property
+    def current_player(self):
+        return self.core.current_player
+    
+    @property
+    def current_piece(self):
+        return self.core.current_piece
+    
+    @property
+    def game_over(self):
+        return self.core.game_over
+    
+    @property
+    def winner(self):
+        return self.core.winner()
+    
+    @property
+    def winning_line(self):
+        return self.core.winning_line
     
     def request_move(self, direction):
         """Запрос на перемещение фигуры влево/вправо"""
-        if not self.current_piece or self.game_over:
+        if self.core.game_over:
             return
             
         # Запоминаем направление для применения при следующем падении
         self.pending_move = direction
     
-    def update(self):
-        """Обновление состояния игры"""
-        if not self.current_piece or self.game_over:
-            return
-            
-        # Проверка времени для перемещения фигуры вниз
-        current_time = time.time()
-        if current_time - self.last_move_time < 1.0:
+    def hard_drop(self):
+        """Жесткий сброс: фигура сразу падает в точку приземления"""
+        if self.core.game_over:
             return
-            
-        # Применяем ожидающее перемещение только если фигура в зоне перемещения
-        if self.current_piece['row'] < 4:
-            new_col = self.current_piece['col'] + self.pending_move
-            
-            # Проверяем, можно ли переместиться в новую колонку
-            if 0 <= new_col < GRID_WIDTH:
-                # Проверяем, свободна ли клетка снизу в новой колонке
-                next_row = self.current_piece['row'] + 1
-                if next_row < GRID_HEIGHT and self.board[next_row][new_col] is None:
-                    # Перемещаем фигуру по диагонали
-                    self.current_piece['col'] = new_col
-                else:
-                    # Если клетка снизу занята, перемещаем только вниз
-                    pass
-            
-            # Сбрасываем ожидающее перемещение
-            self.pending_move = 0
         
-        # Перемещение фигуры вниз
-        self.current_piece['row'] += 1
-        self.last_move_time = current_time
+        self.actions.append(DROP)
+        self.step(DROP)
+        self.pending_move = 0
+        self.last_move_time = time.perf_counter()
+    
+    def update(self, now=None):
+        """Такты падения с фиксированным шагом FALL_PERIOD; возвращает число сделанных тактов.
         
-        # Проверка достижения дна или другой фигуры
-        row = self.current_piece['row']
-        col = self.current_piece['col']
+        Такты идут ровно через FALL_PERIOD от предыдущего, а не от момента
+        вызова, поэтому частота кадров на темп игры не влияет: медленный
+        кадр догоняется несколькими тактами, частые кадры просто не делают
+        ни одного.
+        """
+        if self.core.game_over:
+            return 0
         
-        # Если достигли дна
-        if row >= GRID_HEIGHT - 1:
-            self.place_piece()
-            return
-            
-        # Если под фигурой есть другая фигура
-        if self.board[row + 1][col] is not None:
-            self.place_piece()
+        now = time.perf_counter() if now is None else now
+        lag = now - self.last_move_time
+        if lag < FALL_PERIOD:
+            return 0
+        
+        # Долгая пауза: один такт и отсчет заново, без серии тактов подряд
+        if lag > FALL_PERIOD * MAX_CATCH_UP:
+            self.last_move_time = now
+            self.tick()
+            return 1
+        
+        ticks = 0
+        while now - self.last_move_time >= FALL_PERIOD:
+            self.last_move_time += FALL_PERIOD
+            ticks += 1
+            if not self.tick():
+                break
+        return ticks
     
-    def place_piece(self):
-        """Фиксация фигуры на игровом поле"""
-        if not self.current_piece:
-            return
-            
-        # Фиксация фигуры на доске
-        row = self.current_piece['row']
-        col = self.current_piece['col']
-        piece_type = self.current_piece['type']
-        self.board[row][col] = piece_type
-        
-        # Проверка условий завершения игры
-        self.check_game_over(row, col)
-        
-        # Если игра не завершена, передаем ход другому игроку
-        if not self.game_over:
-            self.current_player = 'red' if self.current_player == 'blue' else 'blue'
-            self.start_turn()
-        else:
-            self.current_piece = None
-    
-    def check_game_over(self, last_row, last_col):
-        """Проверка условий завершения игрового раунда"""
-        # Условие 3: Фигура в зоне перемещения
-        if last_row < 4:  # зона перемещения = верхние 4 строки
-            self.game_over = True
-            # Проиграл игрок, который поставил фигуру
-            self.winner = 'red' if self.current_player == 'blue' else 'blue'
-            return
-            
-        # Условие 1: Проверка 4 в ряд
-        self.winning_line = self.check_win(last_row, last_col)
-        if self.winning_line:
-            self.game_over = True
-            self.winner = self.current_player
-            return
-            
-        # Условие 2: Зона размещения заполнена
-        if self.is_placement_zone_full():
-            self.game_over = True
-            self.winner = 'draw'  # ничья
+    def fall_progress(self, now=None):
+        """Доля периода падения, прошедшая с последнего такта (от 0 до 1), для плавной отрисовки"""
+        if self.core.game_over:
+            return 0.0
+        now = time.perf_counter() if now is None else now
+        return min(max((now - self.last_move_time) / FALL_PERIOD, 0.0), 1.0)
     
-    def check_win(self, row, col):
-        """Проверка наличия выигрышной комбинации из 4 фигур"""
-        piece = self.board[row][col]
+    def next_cell(self):
+        """Клетка, в которую фигура перейдет на следующем такте (с ожидающим сдвигом, если он возможен)"""
+        piece = self.core.current_piece
         if not piece:
             return None
-            
-        # Направления для проверки: горизонталь, вертикаль, две диагонали
-        directions = [
-            (0, 1),   # горизонталь
-            (1, 0),   # вертикаль
-            (1, 1),   # диагональ
-            (1, -1)   # диагональ
-        ]
+        col = piece['col']
+        if self.pending_move in self.core.legal_actions():
+            col += self.pending_move
+        return piece['row'] + 1, col
+    
+    def tick(self):
+        """Один такт падения без проверки времени (для scheduler.TickScheduler).
         
-        for dr, dc in directions:
-            count = 1  # текущая фигура
-            
-            # Проверка в одном направлении
-            r, c = row + dr, col + dc
-            while 0 <= r < GRID_HEIGHT and 0 <= c < GRID_WIDTH and self.board[r][c] == piece:
-                count += 1
-                r += dr
-                c += dc
-                
-            # Проверка в противоположном направлении
-            r, c = row - dr, col - dc
-            while 0 <= r < GRID_HEIGHT and 0 <= c < GRID_WIDTH and self.board[r][c] == piece:
-                count += 1
-                r -= dr
-                c -= dc
-                
-            # Если нашли 4 в ряд
-            if count >= 4:
-                # Рассчитываем координаты линии для отрисовки
-                start_row, start_col = row, col
-                end_row, end_col = row, col
-                
-                # Идем в одном направлении
-                r, c = row, col
-                while 0 <= r < GRID_HEIGHT and 0 <= c < GRID_WIDTH and self.board[r][c] == piece:
-                    start_row, start_col = r, c
-                    r -= dr
-                    c -= dc
-                
-                # Идем в противоположном направлении
-                r, c = row, col
-                while 0 <= r < GRID_HEIGHT and 0 <= c < GRID_WIDTH and self.board[r][c] == piece:
-                    end_row, end_col = r, c
-                    r += dr
-                    c += dc
-                
-                return (start_row, start_col, end_row, end_col)
+        Возвращает False, когда раунд завершен и будить его больше не нужно.
+        """
+        if self.core.game_over:
+            return False
         
-        return None
+        # Один такт ядра; ожидающее перемещение расходуется в любом случае
+        self.actions.append(self.pending_move)
+        self.step(self.pending_move)
+        self.pending_move = 0
+        return not self.core.game_over
+    
+    def step(self, action):
+        """Такт ядра с передачей изменений зрителям"""
+        piece = self.core.current_piece
+        placed = self.core.step(action)
+        if self.broadcaster:
+            self.broadcaster.step(self.core, piece, placed)
+    
+    def check_win(self, row, col):
+        """Проверка наличия выигрышной комбинации из 4 фигур"""
+        return self.core.check_win(row, col)
     
     def is_placement_zone_full(self):
         """Проверка заполненности зоны размещения"""
-        for row in range(4, GRID_HEIGHT):  # зона размещения = строки 4-9
-            for col in range(GRID_WIDTH):
-                if self.board[row][col] is None:
-                    return False
-        return True
-
-def draw_game_board():
-    """Отрисовка игровой доски с зонами"""
+        return self.core.is_placement_zone_full()
+
+class Viewport:
+    """Видимая часть поля: размер клетки и прокрутка.
+    
+    Стандартное поле целиком помещается над кнопкой "Меню" и рисуется как
+    раньше. Большое поле уменьшается до MIN_CELL_SIZE, а то, что не
+    поместилось, прокручивается; рисуются только видимые клетки.
+    """
+    def __init__(self, geometry=DEFAULT_GEOMETRY, area=None):
+        self.geometry = geometry
+        self.area = area or pygame.Rect(0, 0, SCREEN_WIDTH, BOARD_HEIGHT)
+        fit = min(self.area.width // geometry.width, self.area.height // geometry.height)
+        self.top = 0
+        self.left = 0
+        self.set_cell_size(max(MIN_CELL_SIZE, min(CELL_SIZE, fit)))
+    
+    def set_cell_size(self, cell_size):
+        """Новый масштаб; число видимых клеток и положение поля пересчитываются"""
+        geometry = self.geometry
+        self.cell_size = cell_size
+        self.cols = min(geometry.width, self.area.width // cell_size)
+        self.rows = min(geometry.height, self.area.height // cell_size)
+        # Поле по центру по горизонтали и у верхнего края области
+        self.x = self.area.x + (self.area.width - self.cols * cell_size) // 2
+        self.y = self.area.y
+        self.rect = pygame.Rect(self.x, self.y, self.cols * cell_size, self.rows * cell_size)
+        self.scroll_to(self.top, self.left)
+    
+    def state(self):
+        """Все, от чего зависит положение клеток на экране"""
+        return (self.cell_size, self.top, self.left)
+    
+    def scroll_to(self, top, left):
+        """Первая видимая строка и колонка (с ограничением краями поля)"""
+        self.top = min(max(top, 0), self.geometry.height - self.rows)
+        self.left = min(max(left, 0), self.geometry.width - self.cols)
+    
+    def scroll(self, rows, cols):
+        self.scroll_to(self.top + rows, self.left + cols)
+    
+    def zoom(self, step):
+        """Крупнее (step > 0) или мельче; центр видимой области остается на месте"""
+        center_row = self.top + self.rows // 2
+        center_col = self.left + self.cols // 2
+        cell_size = min(max(self.cell_size + step * 4, MIN_CELL_SIZE), CELL_SIZE)
+        self.set_cell_size(cell_size)
+        self.scroll_to(center_row - self.rows // 2, center_col - self.cols // 2)
+    
+    def follow(self, row, col, margin=2):
+        """Минимальная прокрутка, при которой клетка видна с запасом margin клеток"""
+        top = self.top
+        left = self.left
+        margin_rows = min(margin, (self.rows - 1) // 2)
+        margin_cols = min(margin, (self.cols - 1) // 2)
+        if row < top + margin_rows:
+            top = row - margin_rows
+        elif row >= top + self.rows - margin_rows:
+            top = row - self.rows + margin_rows + 1
+        if col < left + margin_cols:
+            left = col - margin_cols
+        elif col >= left + self.cols - margin_cols:
+            left = col - self.cols + margin_cols + 1
+        self.scroll_to(top, left)
+    
+    def visible_rows(self):
+        return range(self.top, self.top + self.rows)
+    
+    def visible_cols(self):
+        return range(self.left, self.left + self.cols)
+    
+    def is_visible(self, row, col):
+        return self.top <= row < self.top + self.rows and self.left <= col < self.left + self.cols
+    
+    def cell_pos(self, row, col):
+        """Левый верхний угол клетки на экране"""
+        return (self.x + (col - self.left) * self.cell_size, self.y + (row - self.top) * self.cell_size)
+    
+    def cell_at(self, x, y):
+        """Клетка под точкой экрана (может быть вне поля)"""
+        return (self.top + (y - self.y) // self.cell_size, self.left + (x - self.x) // self.cell_size)
+
+# Видимая часть поля текущей партии
+viewport = Viewport()
+
+def set_geometry(geometry):
+    """Новая видимая часть для поля geometry"""
+    global viewport
+    viewport = Viewport(geometry)
+    return viewport
+
+def draw_game_board(surface=None):
+    """Отрисовка видимой части игровой доски с зонами"""
+    surface = screen if surface is None else surface
+    size = viewport.cell_size
+    move_zone_rows = viewport.geometry.move_zone_rows
+    
     # Отрисовка зон
-    for row in range(GRID_HEIGHT):
-        for col in range(GRID_WIDTH):
-            # Определение цвета зоны
-            if row < 4:  # верхние 4 строки - зона перемещения
-                color = MOVE_ZONE
-            else:  # нижние 6 строк - зона размещения
-                color = PLACE_ZONE
-            
+    for row in viewport.visible_rows():
+        # Определение цвета зоны: верхние строки - зона перемещения, остальные - зона размещения
+        color = MOVE_ZONE if row < move_zone_rows else PLACE_ZONE
+        for col in viewport.visible_cols():
             # Расчет координат клетки
-            x = BOARD_X + col * CELL_SIZE
-            y = BOARD_Y + row * CELL_SIZE
+            x, y = viewport.cell_pos(row, col)
             
             # Отрисовка клетки
-            pygame.draw.rect(screen, color, (x, y, CELL_SIZE, CELL_SIZE))
+            pygame.draw.rect(surface, color, (x, y, size, size))
             
             # Отрисовка границ клетки
-            pygame.draw.rect(screen, GRID_COLOR, (x, y, CELL_SIZE, CELL_SIZE), 1)
+            pygame.draw.rect(surface, GRID_COLOR, (x, y, size, size), 1)
 
 def draw_pieces(game):
-    """Отрисовка фигур на игровом поле"""
-    for row in range(GRID_HEIGHT):
-        for col in range(GRID_WIDTH):
-            piece = game.board[row][col]
+    """Отрисовка фигур в видимой части игрового поля"""
+    board = game.board
+    left = viewport.left
+    right = left + viewport.cols
+    for row in viewport.visible_rows():
+        cells = board[row]
+        for col in range(left, right):
+            piece = cells[col]
             if piece:
-                x = BOARD_X + col * CELL_SIZE
-                y = BOARD_Y + row * CELL_SIZE
-                
-                if piece == 'X':
-                    draw_x(x, y)
-                else:  # 'O'
-                    draw_o(x, y)
-
-def draw_current_piece(game):
-    """Отрисовка текущей падающей фигуры"""
-    if not game.current_piece:
-        return
-        
+                draw_piece(piece, row, col)
+
+def piece_position(game, progress=0.0):
+    """Левый верхний угол падающей фигуры на экране или None.
+    
+    progress - доля такта (Game.fall_progress()): фигура рисуется между
+    текущей клеткой и клеткой следующего такта, а не прыгает на целую клетку.
+    """
     piece = game.current_piece
-    row = piece['row']
-    col = piece['col']
+    if not piece:
+        return None
+    x, y = viewport.cell_pos(piece['row'], piece['col'])
+    if progress > 0:
+        next_x, next_y = viewport.cell_pos(*game.next_cell())
+        x = round(x + (next_x - x) * progress)
+        y = round(y + (next_y - y) * progress)
+    return x, y
+
+def piece_rect(position):
+    """Часть прямоугольника фигуры в точке position, попадающая в видимую часть поля"""
+    size = viewport.cell_size
+    return pygame.Rect(position, (size, size)).clip(viewport.rect)
+
+def draw_current_piece(game, progress=0.0):
+    """Отрисовка текущей падающей фигуры (часть вне видимой области отсекается)"""
+    position = piece_position(game, progress)
+    if position is None or not piece_rect(position):
+        return
     
-    # Проверка, что фигура в пределах поля
-    if 0 <= row < GRID_HEIGHT and 0 <= col < GRID_WIDTH:
-        x = BOARD_X + col * CELL_SIZE
-        y = BOARD_Y + row * CELL_SIZE
-        
-        if piece['type'] == 'X':
-            draw_x(x, y)
-        else:  # 'O'
-            draw_o(x, y)
+    clip = screen.get_clip()
+    screen.set_clip(clip.clip(viewport.rect))
+    if game.current_piece['type'] == 'X':
+        draw_x(*position)
+    else:  # 'O'
+        draw_o(*position)
+    screen.set_clip(clip)
+
+def draw_hints(marks):
+    """Отрисовка подсказок: рамки клеток приземления сдвигов и точки угроз соперника"""
+    size = viewport.cell_size
+    for row, col, kind, best in marks:
+        if not viewport.is_visible(row, col):
+            continue
+        rect = cell_rect(row, col)
+        color = HINT_COLORS[kind]
+        if kind == 'threat':
+            # Угроза - точка в углу клетки, чтобы не закрывать рамку сдвига
+            radius = max(2, size // 8)
+            pygame.draw.circle(screen, color, (rect.right - radius * 2, rect.top + radius * 2), radius)
+        else:
+            # Лучший по оценке поиска сдвиг - толстой рамкой
+            width = line_width(size, 5 if best else 2)
+            pygame.draw.rect(screen, color, rect.inflate(-width * 2, -width * 2), width)
+
+def line_width(size, width):
+    """Толщина линии, рассчитанной на клетку CELL_SIZE, для клетки size"""
+    return max(1, round(width * size / CELL_SIZE))
+
+def draw_x_shape(surface, x, y, size=CELL_SIZE):
+    """Отрисовка крестика примитивами"""
+    offset = size // 5
+    pygame.draw.line(surface, X_COLOR, 
+                    (x + offset, y + offset), 
+                    (x + size - offset, y + size - offset), line_width(size, 3))
+    pygame.draw.line(surface, X_COLOR, 
+                    (x + offset, y + size - offset), 
+                    (x + size - offset, y + offset), line_width(size, 3))
+
+def draw_o_shape(surface, x, y, size=CELL_SIZE):
+    """Отрисовка нолика примитивами"""
+    center = (x + size // 2, y + size // 2)
+    radius = size // 2 - size // 5
+    pygame.draw.circle(surface, O_COLOR, center, radius, line_width(size, 3))
+
+class PieceSprites:
+    """Атлас с заранее нарисованными крестиком и ноликом для клетки size"""
+    def __init__(self, size=CELL_SIZE):
+        self.atlas = pygame.Surface((size * 2, size), pygame.SRCALPHA)
+        draw_x_shape(self.atlas, 0, 0, size)
+        draw_o_shape(self.atlas, size, 0, size)
+        self.areas = {
+            'X': pygame.Rect(0, 0, size, size),
+            'O': pygame.Rect(size, 0, size, size)
+        }
+    
+    def blit(self, surface, piece, x, y):
+        """Копирование фигуры из атласа в клетку с левым верхним углом (x, y)"""
+        surface.blit(self.atlas, (x, y), self.areas[piece])
+
+# Атласы по размеру клетки создаются при первой отрисовке фигуры
+piece_sprites = {}
+
+def get_piece_sprites(size=CELL_SIZE):
+    """Общий атлас фигур для клетки size"""
+    sprites = piece_sprites.get(size)
+    if sprites is None:
+        sprites = piece_sprites[size] = PieceSprites(size)
+    return sprites
 
 def draw_x(x, y):
     """Отрисовка крестика"""
-    offset = 10
-    pygame.draw.line(screen, X_COLOR, 
-                    (x + offset, y + offset), 
-                    (x + CELL_SIZE - offset, y + CELL_SIZE - offset), 3)
-    pygame.draw.line(screen, X_COLOR, 
-                    (x + offset, y + CELL_SIZE - offset), 
-                    (x + CELL_SIZE - offset, y + offset), 3)
+    get_piece_sprites(viewport.cell_size).blit(screen, 'X', x, y)
 
 def draw_o(x, y):
     """Отрисовка нолика"""
-    center = (x + CELL_SIZE // 2, y + CELL_SIZE // 2)
-    radius = CELL_SIZE // 2 - 10
-    pygame.draw.circle(screen, O_COLOR, center, radius, 3)
+    get_piece_sprites(viewport.cell_size).blit(screen, 'O', x, y)
 
 def draw_winning_line(game):
-    """Отрисовка выигрышной линии"""
+    """Отрисовка выигрышной линии (часть вне видимой области отсекается)"""
     if not game.winning_line:
         return
         
     start_row, start_col, end_row, end_col = game.winning_line
+    half = viewport.cell_size // 2
     
     # Расчет координат центров клеток
-    start_x = BOARD_X + start_col * CELL_SIZE + CELL_SIZE // 2
-    start_y = BOARD_Y + start_row * CELL_SIZE + CELL_SIZE // 2
-    end_x = BOARD_X + end_col * CELL_SIZE + CELL_SIZE // 2
-    end_y = BOARD_Y + end_row * CELL_SIZE + CELL_SIZE // 2
+    start_x, start_y = viewport.cell_pos(start_row, start_col)
+    end_x, end_y = viewport.cell_pos(end_row, end_col)
     
-    # Отрисовка линии
-    pygame.draw.line(screen, WIN_LINE_COLOR, (start_x, start_y), (end_x, end_y), 5)
+    # Отрисовка линии в пределах поля (и текущей области отсечения, если она есть)
+    clip = screen.get_clip()
+    screen.set_clip(clip.clip(viewport.rect))
+    pygame.draw.line(screen, WIN_LINE_COLOR, (start_x + half, start_y + half), (end_x + half, end_y + half),
+                     line_width(viewport.cell_size, 5))
+    screen.set_clip(clip)
 
 def draw_main_menu(blue_score, red_score, last_winner, play_button, exit_button):
     """Отрисовка главного меню"""
@@ -380,7 +588,7 @@ def draw_main_menu(blue_score, red_score, last_winner, play_button, exit_button)
     else:
         winner_text += "Еще не играли"
     
-    winner_surf = font.render(winner_text, True, TEXT_COLOR)
+    winner_surf = text_cache.render(font, winner_text, TEXT_COLOR)
     winner_rect = winner_surf.get_rect(center=(SCREEN_WIDTH // 2, 100))
     
     # Фон для текста
@@ -395,16 +603,16 @@ def draw_main_menu(blue_score, red_score, last_winner, play_button, exit_button)
     screen.blit(winner_surf, winner_rect)
     
     # Счет игроков
-    score_text = font.render("Счёт", True, TEXT_COLOR)
+    score_text = text_cache.render(font, "Счёт", TEXT_COLOR)
     score_rect = score_text.get_rect(center=(SCREEN_WIDTH // 2, 230))
 
-    score_text2 = font.render(":", True, TEXT_COLOR)
+    score_text2 = text_cache.render(font, ":", TEXT_COLOR)
     score_rect2 = score_text2.get_rect(center=(SCREEN_WIDTH // 2, 270))
     
-    blue_score_text = font.render(f"{blue_score}", True, X_COLOR)
+    blue_score_text = text_cache.render(font, f"{blue_score}", X_COLOR)
     blue_score_rect = blue_score_text.get_rect(center=(SCREEN_WIDTH // 2 - 25, 270))
     
-    red_score_text = font.render(f"{red_score}", True, O_COLOR)
+    red_score_text = text_cache.render(font, f"{red_score}", O_COLOR)
     red_score_rect = red_score_text.get_rect(center=(SCREEN_WIDTH // 2 + 25, 270))
     
     # Фон для счета
@@ -426,15 +634,595 @@ def draw_main_menu(blue_score, red_score, last_winner, play_button, exit_button)
     play_button.draw(screen)
     exit_button.draw(screen)
 
+class DirtyRenderer:
+    """Отрисовка раунда по измененным областям экрана.
+    
+    Фон с зонами и решеткой рисуется один раз в отдельную поверхность
+    (заново - после прокрутки или смены масштаба). Каждый кадр
+    восстанавливаются и перерисовываются только видимые клетки, где
+    что-то поменялось, а на экран отправляются только их прямоугольники.
+    """
+    def __init__(self):
+        self.layer = None
+        self.view_state = None
+        self.invalidate()
+    
+    def invalidate(self):
+        """Следующий кадр будет полностью перерисован (смена экрана, изменение окна)"""
+        self.full_redraw = True
+        self.piece_state = None
+        self.board = None
+        self.winning_line = None
+        self.button_state = None
+        self.marks = ()
+    
+    def bake_layer(self):
+        """Статический слой: фон, зоны и решетка"""
+        self.layer = pygame.Surface(screen.get_size())
+        self.layer.fill(BACKGROUND)
+        draw_game_board(self.layer)
+        self.view_state = viewport.state()
+    
+    def draw(self, game, menu_button, marks=(), progress=0.0):
+        """Отрисовка кадра; возвращает список измененных прямоугольников или None для всего экрана.
+        
+        marks - отметки подсказок (hints.hint_marks), progress - доля такта
+        для плавного падения фигуры (Game.fall_progress()).
+        """
+        if (self.layer is None or self.layer.get_size() != screen.get_size()
+                or self.view_state != viewport.state()):
+            self.bake_layer()
+            self.full_redraw = True
+        
+        # Фигура сравнивается по точке на экране, а не по клетке: между тактами она движется.
+        # Тип входит в состояние: после сброса следующая фигура появляется в той же точке
+        position = piece_position(game, progress)
+        piece_state = None
+        if position and piece_rect(position):
+            piece_state = (position, game.current_piece['type'])
+        
+        # Сравнивается только видимая часть доски
+        left = viewport.left
+        right = left + viewport.cols
+        board = [row[left:right] for row in game.board[viewport.top:viewport.top + viewport.rows]]
+        button_state = (game.game_over, menu_button.is_hovered)
+        
+        if self.full_redraw:
+            screen.blit(self.layer, (0, 0))
+            draw_pieces(game)
+            draw_current_piece(game, progress)
+            draw_hints(marks)
+            draw_winning_line(game)
+            if game.game_over:
+                menu_button.draw(screen)
+            dirty = None
+        else:
+            dirty = []
+            
+            # Падающая фигура: старое и новое положение. Между тактами фигура не совпадает
+            # с клетками, поэтому область расширяется до целых клеток: иначе отсечение
+            # проходило бы через рамки подсказок, а рамка с отсечением рисуется иначе
+            if piece_state != self.piece_state:
+                for state in (self.piece_state, piece_state):
+                    if state:
+                        dirty.append(cells_rect(piece_rect(state[0])))
+            
+            # Новые фигуры на доске
+            for i, cells in enumerate(board):
+                if cells != self.board[i]:
+                    for j, cell in enumerate(cells):
+                        if cell != self.board[i][j]:
+                            dirty.append(cell_rect(viewport.top + i, left + j))
+            
+            # Подсказки: клетки старых и новых отметок
+            if marks != self.marks:
+                for row, col, _, _ in self.marks + marks:
+                    if viewport.is_visible(row, col):
+                        dirty.append(cell_rect(row, col))
+            
+            # Выигрышная линия
+            if game.winning_line != self.winning_line:
+                for line in (self.winning_line, game.winning_line):
+                    if line:
+                        rect = winning_line_rect(line).clip(viewport.rect)
+                        if rect:
+                            dirty.append(rect)
+            
+            # Кнопка "Меню": появление и наведение
+            if button_state != self.button_state:
+                dirty.append(menu_button.rect.inflate(2, 2))
+            
+            for rect in dirty:
+                self.redraw_rect(game, menu_button, rect, marks, progress)
+        
+        # Запоминаем нарисованное состояние
+        self.full_redraw = False
+        self.piece_state = piece_state
+        self.board = board
+        self.winning_line = game.winning_line
+        self.button_state = button_state
+        self.marks = marks
+        return dirty
+    
+    def redraw_rect(self, game, menu_button, rect, marks=(), progress=0.0):
+        """Восстановление фона и перерисовка всего, что попадает в прямоугольник"""
+        screen.set_clip(rect)
+        screen.blit(self.layer, rect, rect)
+        
+        # Видимые клетки, которые пересекает прямоугольник
+        first_row, first_col = viewport.cell_at(rect.left, rect.top)
+        last_row, last_col = viewport.cell_at(rect.right - 1, rect.bottom - 1)
+        first_row = max(first_row, viewport.top)
+        first_col = max(first_col, viewport.left)
+        last_row = min(last_row, viewport.top + viewport.rows - 1)
+        last_col = min(last_col, viewport.left + viewport.cols - 1)
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                draw_piece(game.board[row][col], row, col)
+        
+        draw_current_piece(game, progress)
+        draw_hints(marks)
+        draw_winning_line(game)
+        if game.game_over and rect.colliderect(menu_button.rect):
+            menu_button.draw(screen)
+        screen.set_clip(None)
+
+def cell_rect(row, col):
+    """Прямоугольник клетки на экране"""
+    return pygame.Rect(viewport.cell_pos(row, col), (viewport.cell_size, viewport.cell_size))
+
+def cells_rect(rect):
+    """Прямоугольник из целых видимых клеток, которые пересекает rect"""
+    first_row, first_col = viewport.cell_at(rect.left, rect.top)
+    last_row, last_col = viewport.cell_at(rect.right - 1, rect.bottom - 1)
+    return cell_rect(first_row, first_col).union(cell_rect(last_row, last_col)).clip(viewport.rect)
+
+def winning_line_rect(line):
+    """Прямоугольник, который накрывает выигрышную линию"""
+    start_row, start_col, end_row, end_col = line
+    return cell_rect(start_row, start_col).union(cell_rect(end_row, end_col))
+
+def draw_piece(piece, row, col):
+    """Отрисовка одной фигуры в клетке"""
+    if not piece:
+        return
+    x, y = viewport.cell_pos(row, col)
+    if piece == 'X':
+        draw_x(x, y)
+    else:  # 'O'
+        draw_o(x, y)
+
+def draw_full_frame(game, blue_score, red_score, last_winner, play_button, exit_button, menu_button, mouse_pos,
+                    marks=(), progress=0.0):
+    """Полная перерисовка кадра (режим --render full)"""
+    screen.fill(BACKGROUND)
+    
+    if game:
+        # Отрисовка игрового раунда
+        draw_game_board()
+        draw_pieces(game)
+        draw_current_piece(game, progress)
+        draw_hints(marks)
+        draw_winning_line(game)
+        
+        # Отрисовка кнопки "Меню" при завершении игры
+        if game.game_over:
+            menu_button.check_hover(mouse_pos)
+            menu_button.draw(screen)
+    else:
+        # Отрисовка главного меню
+        play_button.check_hover(mouse_pos)
+        exit_button.check_hover(mouse_pos)
+        draw_main_menu(blue_score, red_score, last_winner, play_button, exit_button)
+
+class ProfilerHud:
+    """Панель профилировщика в свободной полосе слева от поля.
+
+    Текст панели пересобирается несколько раз в секунду, в остальных
+    кадрах на экран копируется готовая поверхность. Если поле занимает
+    почти всю ширину экрана (большое поле), панель не выводится, чтобы не
+    закрывать клетки; замер кадров и трасса при этом продолжаются.
+    """
+    HEIGHT = 200
+    MIN_WIDTH = 80
+    REFRESH = 0.25
+
+    def __init__(self):
+        self.font = pygame.font.Font(None, 18)
+        self.surface = None
+        self.refreshed = 0.0
+
+    def rect(self, board_rect):
+        """Полоса слева от поля board_rect или None, если она уже MIN_WIDTH"""
+        width = board_rect.left - 4
+        if width < self.MIN_WIDTH:
+            return None
+        return pygame.Rect(0, 0, width, self.HEIGHT)
+
+    def compose(self, profiler, size):
+        """Поверхность панели по текущей статистике"""
+        summary = profiler.summary()
+        lines = [
+            f"FPS {summary['fps']:.0f}",
+            f"p50 {summary['p50'] * 1000:.2f} ms",
+            f"p95 {summary['p95'] * 1000:.2f} ms",
+            f"p99 {summary['p99'] * 1000:.2f} ms",
+            f"max {summary['max'] * 1000:.2f} ms",
+        ]
+        lines += [f"{name} {duration * 1000:.2f}" for name, duration in summary['phases'].items()]
+
+        surface = pygame.Surface(size)
+        surface.fill((32, 32, 32))
+        for i, line in enumerate(lines):
+            surface.blit(self.font.render(line, True, (255, 255, 255)), (4, 4 + i * 14))
+        return surface
+
+    def draw(self, surface, profiler, board_rect):
+        """Вывод панели слева от board_rect; возвращает ее прямоугольник или None"""
+        rect = self.rect(board_rect)
+        if rect is None:
+            return None
+        now = time.perf_counter()
+        if (self.surface is None or self.surface.get_size() != rect.size
+                or now - self.refreshed >= self.REFRESH):
+            self.surface = self.compose(profiler, rect.size)
+            self.refreshed = now
+        surface.blit(self.surface, rect)
+        return rect
+
+# Полоса прокрутки просмотра партий
+REPLAY_BAR = pygame.Rect(20, BOARD_HEIGHT + 12, SCREEN_WIDTH - 40, 10)
+
+def draw_replay_frame(core, info, ply, count):
+    """Кадр просмотра: доска в позиции ply, полоса прокрутки и подпись"""
+    screen.fill(BACKGROUND)
+    draw_game_board()
+    draw_pieces(core)
+    draw_current_piece(core)
+    draw_winning_line(core)
+    
+    # Полоса прокрутки с отметкой текущего такта
+    pygame.draw.rect(screen, TEXT_BG_COLOR, REPLAY_BAR, border_radius=5)
+    if info.plies:
+        x = REPLAY_BAR.left + REPLAY_BAR.width * ply // info.plies
+        pygame.draw.rect(screen, WIN_LINE_COLOR, (x - 3, REPLAY_BAR.top - 4, 6, REPLAY_BAR.height + 8))
+    
+    text = f"Партия {info.index + 1}/{count}   такт {ply}/{info.plies}"
+    text_surf = text_cache.render(font, text, TEXT_COLOR)
+    screen.blit(text_surf, text_surf.get_rect(midtop=(SCREEN_WIDTH // 2, REPLAY_BAR.bottom + 2)))
+
+def run_replay_viewer(path, round_index=0):
+    """Просмотр записанных партий.
+    
+    Влево/вправо - такт назад/вперед, вверх/вниз - на 10 тактов,
+    Home/End - начало/конец, PageUp/PageDown - предыдущая/следующая партия,
+    щелчок по полосе - переход к такту. Переход идет от ближайшего снимка
+    позиции, а не с начала партии.
+    """
+    from replay import ReplayReader
+    
+    with ReplayReader(path) as reader:
+        if not len(reader):
+            print("Архив пуст")
+            return
+        
+        round_index = min(max(round_index, 0), len(reader) - 1)
+        info = reader.info(round_index)
+        ply = 0
+        redraw = True
+        
+        while True:
+            if redraw:
+                core = reader.state_at(round_index, ply)
+                draw_replay_frame(core, info, ply, len(reader))
+                pygame.display.flip()
+                redraw = False
+            
+            # Кадр меняется только по действию пользователя
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                return
+            
+            new_round = round_index
+            new_ply = ply
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    return
+                elif event.key == pygame.K_RIGHT:
+                    new_ply += 1
+                elif event.key == pygame.K_LEFT:
+                    new_ply -= 1
+                elif event.key == pygame.K_DOWN:
+                    new_ply += 10
+                elif event.key == pygame.K_UP:
+                    new_ply -= 10
+                elif event.key == pygame.K_HOME:
+                    new_ply = 0
+                elif event.key == pygame.K_END:
+                    new_ply = info.plies
+                elif event.key == pygame.K_PAGEDOWN:
+                    new_round += 1
+                elif event.key == pygame.K_PAGEUP:
+                    new_round -= 1
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                if REPLAY_BAR.inflate(0, 20).collidepoint(event.pos):
+                    new_ply = round(info.plies * (event.pos[0] - REPLAY_BAR.left) / REPLAY_BAR.width)
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                redraw = True
+            
+            # Смена партии начинает ее с первого такта
+            new_round = min(max(new_round, 0), len(reader) - 1)
+            if new_round != round_index:
+                round_index = new_round
+                info = reader.info(round_index)
+                new_ply = 0
+                redraw = True
+            
+            new_ply = min(max(new_ply, 0), info.plies)
+            if new_ply != ply:
+                ply = new_ply
+                redraw = True
+
+def draw_spectator_frame(state, text):
+    """Кадр зрителя: доска из потока трансляции и подпись под ней"""
+    screen.fill(BACKGROUND)
+    draw_game_board()
+    draw_pieces(state)
+    draw_current_piece(state)
+    draw_winning_line(state)
+    
+    text_surf = text_cache.render(font, text, TEXT_COLOR)
+    screen.blit(text_surf, text_surf.get_rect(midtop=(SCREEN_WIDTH // 2, BOARD_HEIGHT + 12)))
+
+def spectator_caption(state):
+    """Подпись кадра зрителя: такт, итог раунда или ожидание ключевого кадра"""
+    if not state.synced:
+        return "Ожидание ключевого кадра..."
+    if state.game_over:
+        if state.result == 'draw':
+            return f"Ничья   такт {state.ply}"
+        winner = "Синие" if state.result == 'blue' else "Красные"
+        return f"{winner} победили   такт {state.ply}"
+    player = "синих" if state.current_player == 'blue' else "красных"
+    return f"Ход {player}   такт {state.ply}"
+
+def run_spectator(address):
+    """Просмотр трансляции раунда (python lab6.py --watch ADDRESS).
+    
+    Сокет неблокирующий: за кадр читается все, что пришло, и кадр
+    перерисовывается, только если состояние изменилось. Esc - выход.
+    """
+    from broadcast import SpectatorState, StreamDecoder, connect
+    
+    try:
+        sock = connect(address)
+    except OSError as error:
+        print(f"Не удалось подключиться к трансляции: {error}")
+        return
+    sock.setblocking(False)
+    decoder = StreamDecoder()
+    state = SpectatorState()
+    clock = pygame.time.Clock()
+    redraw = True
+    connected = True
+    
+    try:
+        while True:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    return
+                if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    redraw = True
+            
+            while connected:
+                try:
+                    data = sock.recv(65536)
+                except BlockingIOError:
+                    break
+                except OSError:
+                    data = b''
+                redraw = True
+                if not data:
+                    connected = False
+                    break
+                try:
+                    for message in decoder.feed(data):
+                        state.apply(message)
+                except (ValueError, LookupError, TypeError) as error:
+                    # Чужой или испорченный поток: неизвестный тип или поля вне допустимых значений
+                    print(f"Ошибка в потоке трансляции: {error!r}")
+                    connected = False
+                    sock.close()
+                    break
+            
+            if redraw:
+                text = spectator_caption(state) if connected else "Трансляция завершена"
+                draw_spectator_frame(state, text)
+                pygame.display.flip()
+                redraw = False
+            clock.tick(FPS_LIMIT)
+    finally:
+        sock.close()
+
+def parse_args():
+    """Параметры командной строки"""
+    parser = argparse.ArgumentParser(description="Крестики-нолики с гравитацией")
+    parser.add_argument('--computer', choices=['blue', 'red', 'both'],
+                        help="за какой цвет играет компьютер")
+    parser.add_argument('--think-time', type=float, default=0.3,
+                        help="время на обдумывание одного такта, секунд (меньше 1)")
+    parser.add_argument('--ai-stats', action='store_true',
+                        help="печатать статистику поиска после каждого хода компьютера")
+    parser.add_argument('--render', choices=['dirty', 'full'], default='dirty',
+                        help="dirty - обновлять только измененные области, full - весь экран каждый кадр")
+    parser.add_argument('--fps', type=int, default=FPS_LIMIT,
+                        help="предел частоты кадров во время раунда (0 - без ограничения)")
+    parser.add_argument('--headless', action='store_true',
+                        help="запуск без дисплея (фиктивный видеодрайвер SDL)")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="измерить время импорта, инициализации и первого кадра и выйти")
+    parser.add_argument('--record', metavar='PATH',
+                        help="дописывать сыгранные раунды в архив партий")
+    parser.add_argument('--replay', metavar='PATH',
+                        help="просмотр партий из архива вместо игры")
+    parser.add_argument('--round', type=int, default=0,
+                        help="номер партии для просмотра (с --replay)")
+    parser.add_argument('--broadcast', metavar='ADDRESS',
+                        help="транслировать раунды зрителям (host:port или путь Unix-сокета)")
+    parser.add_argument('--watch', metavar='ADDRESS',
+                        help="смотреть трансляцию вместо игры (host:port или путь Unix-сокета)")
+    parser.add_argument('--width', type=int, default=GRID_WIDTH, help="ширина поля в клетках")
+    parser.add_argument('--height', type=int, default=GRID_HEIGHT, help="высота поля в клетках")
+    parser.add_argument('--move-zone', type=int, default=DEFAULT_GEOMETRY.move_zone_rows,
+                        help="строк в зоне перемещения")
+    parser.add_argument('--win-length', type=int, default=DEFAULT_GEOMETRY.win_length,
+                        help="сколько фигур в ряд нужно для победы")
+    parser.add_argument('--history', metavar='PATH',
+                        help="файл истории раундов (SQLite, по умолчанию ~/.gravity_tictactoe_history.db)")
+    parser.add_argument('--no-history', action='store_true',
+                        help="не сохранять историю: счет только до выхода из программы")
+    parser.add_argument('--hints', action='store_true',
+                        help="подсказки: клетки приземления сдвигов, их оценка и угрозы соперника")
+    parser.add_argument('--tablebase', metavar='PATH',
+                        help="таблица эндшпиля для компьютера (строится tablebase.py)")
+    parser.add_argument('--profile', action='store_true',
+                        help="замер фаз каждого кадра и панель с FPS и временем фаз")
+    parser.add_argument('--profile-trace', metavar='PATH',
+                        help="при выходе сохранить трассу кадров в формате Chrome trace (включает --profile)")
+    args = parser.parse_args()
+    
+    # Ход компьютера применяется на следующем такте: поиск дольше такта всегда опаздывает
+    if not 0 < args.think_time < FALL_PERIOD:
+        parser.error(f"--think-time должно быть больше 0 и меньше периода такта ({FALL_PERIOD} с)")
+    try:
+        args.geometry = Geometry(args.width, args.height, args.move_zone, args.win_length)
+    except ValueError as error:
+        parser.error(str(error))
+    # Компьютер, архив партий, таблица эндшпиля и трансляция рассчитаны на стандартное поле
+    if args.geometry != DEFAULT_GEOMETRY:
+        for option, value in (('--computer', args.computer), ('--record', args.record),
+                              ('--tablebase', args.tablebase), ('--replay', args.replay),
+                              ('--broadcast', args.broadcast), ('--watch', args.watch)):
+            if value:
+                parser.error(f"{option} работает только со стандартным полем")
+    return args
+
+def measure_startup():
+    """Время импорта модуля, инициализации окна и первого кадра (в секундах)"""
+    # Импорт меряем в отдельном процессе, где модуль еще не загружен
+    code = "import time; t = time.perf_counter(); import lab6; print(time.perf_counter() - t)"
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    output = subprocess.check_output([sys.executable, '-c', code], env=env,
+                                     cwd=os.path.dirname(os.path.abspath(__file__)))
+    import_time = float(output.split()[-1])
+    
+    start = time.perf_counter()
+    init_app(headless=True)
+    init_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    draw_first_frame()
+    frame_time = time.perf_counter() - start
+    
+    return {'import': import_time, 'init_app': init_time, 'first_frame': frame_time}
+
+def draw_first_frame():
+    """Первый кадр после запуска: главное меню (кнопки создаются здесь же, как в main())"""
+    play_button = Button(PLAY_BUTTON_X, PLAY_BUTTON_Y, BUTTON_WIDTH, BUTTON_HEIGHT,
+                         "Играть", PLAY_BUTTON_COLOR, (100, 255, 100))
+    exit_button = Button(EXIT_BUTTON_X, EXIT_BUTTON_Y, BUTTON_WIDTH, BUTTON_HEIGHT,
+                         "Выход", EXIT_BUTTON_COLOR, (255, 100, 100))
+    menu_button = Button(MENU_BUTTON_X, MENU_BUTTON_Y, BUTTON_WIDTH, BUTTON_HEIGHT,
+                         "Меню", BUTTON_COLOR, (100, 255, 100))
+    draw_full_frame(None, 0, 0, None, play_button, exit_button, menu_button, (0, 0))
+    pygame.display.flip()
+
 def main():
+    args = parse_args()
+    
+    if args.startup_report:
+        report = measure_startup()
+        print(f"Импорт lab6:        {report['import'] * 1000:8.1f} мс")
+        print(f"Окно и шрифты:      {report['init_app'] * 1000:8.1f} мс")
+        print(f"Первый кадр:        {report['first_frame'] * 1000:8.1f} мс")
+        return
+    
+    init_app(args.headless)
+    set_geometry(args.geometry)
+    
+    if args.replay:
+        run_replay_viewer(args.replay, args.round)
+        pygame.quit()
+        return
+    
+    if args.watch:
+        from broadcast import parse_address
+        run_spectator(parse_address(args.watch))
+        pygame.quit()
+        return
+    
+    # Трансляция раундов: хаб в своем потоке, игра только ставит сообщения в очередь
+    broadcaster = None
+    if args.broadcast:
+        from broadcast import Broadcaster, HubThread, parse_address
+        try:
+            hub = HubThread(parse_address(args.broadcast))
+        except OSError as error:
+            print(f"Не удалось открыть трансляцию: {error}")
+            pygame.quit()
+            return
+        atexit.register(hub.close)
+        broadcaster = Broadcaster(hub.publish)
+    
+    # Архив для записи сыгранных раундов
+    recorder = None
+    if args.record:
+        from replay import ReplayWriter
+        recorder = ReplayWriter(args.record)
+    recorded = False
+    
+    # Цвета, за которые играет компьютер
+    if args.computer == 'both':
+        computer_colors = ('blue', 'red')
+    elif args.computer:
+        computer_colors = (args.computer,)
+    else:
+        computer_colors = ()
+    computers = []
+    if computer_colors:
+        from ai import ComputerPlayer
+    tablebase = None
+    if args.tablebase:
+        from tablebase import Tablebase
+        tablebase = Tablebase(args.tablebase)
+    
+    # Подсказки: анализ в фоновом потоке, поиск только для стандартного поля
+    analyzer = None
+    if args.hints:
+        from hints import HintAnalyzer
+        analyzer = HintAnalyzer(deep=args.geometry == DEFAULT_GEOMETRY)
+        atexit.register(analyzer.close)
+    marks = ()
+    
     # Состояния приложения
     in_game = False
     game = None
     
-    # Счет игроков
-    blue_score = 0
-    red_score = 0
-    last_winner = None
+    # История раундов; счет в меню берется из ее сводки в памяти.
+    # История необязательна: если файл недоступен, счет ведется только в памяти
+    import sqlite3
+    from history import HistoryStore, DEFAULT_PATH as DEFAULT_HISTORY_PATH
+    history_path = args.history or DEFAULT_HISTORY_PATH
+    try:
+        history = HistoryStore(None if args.no_history else history_path)
+    except sqlite3.Error as error:
+        print(f"История недоступна ({history_path}): {error}; счет не сохраняется")
+        history = HistoryStore(None)
+    atexit.register(history.close)
+    replay_index = None
+    score = history.summary()
     
     # Создание кнопок
     play_button = Button(
@@ -452,50 +1240,102 @@ def main():
         "Меню", BUTTON_COLOR, (100, 255, 100)
     )
 
+    # Отрисовка по измененным областям
+    renderer = DirtyRenderer()
+    menu_state = None
+
+    # Профилировщик кадров (выключенный ничего не замеряет)
+    if args.profile or args.profile_trace:
+        profiler = FrameProfiler(trace=bool(args.profile_trace))
+        hud = ProfilerHud()
+        if args.profile_trace:
+            atexit.register(profiler.save_trace, args.profile_trace)
+    else:
+        profiler = NullProfiler()
+
+    # Темп кадров: пока что-то движется - не чаще args.fps, иначе ожидание события
+    clock = pygame.time.Clock()
+    idle = False
+    progress = 0.0
+
     # Главный цикл программы
     while True:
+        profiler.begin_frame()
+        profiler.mark('wait')
+        if idle:
+            # Меню и конец раунда меняются только по событиям; панель профилировщика
+            # при этом обновляется по таймеру
+            if profiler.enabled:
+                events = [pygame.event.wait(int(ProfilerHud.REFRESH * 1000))]
+            else:
+                events = [pygame.event.wait()]
+            events += pygame.event.get()
+        else:
+            clock.tick(args.fps)
+            events = pygame.event.get()
+        
+        profiler.mark('events')
         mouse_pos = pygame.mouse.get_pos()
         
         # Обработка событий
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             
+            # Окно изменилось или было перекрыто - нужен полный кадр
+            if event.type in (pygame.VIDEORESIZE, pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
+                menu_state = None
+            
             if in_game:
                 # Обработка нажатий клавиш в игровом раунде
-                if event.type == pygame.KEYDOWN:
+                if event.type == pygame.KEYDOWN and game.current_player not in computer_colors:
                     if game.current_player == 'blue':
                         if event.key == pygame.K_a:  # A - влево
                             game.request_move(-1)
                         elif event.key == pygame.K_d:  # D - вправо
                             game.request_move(1)
+                        elif event.key == pygame.K_s:  # S - сброс вниз
+                            game.hard_drop()
                     else:  # red player
                         if event.key == pygame.K_LEFT:  # Стрелка влево
                             game.request_move(-1)
                         elif event.key == pygame.K_RIGHT:  # Стрелка вправо
                             game.request_move(1)
+                        elif event.key == pygame.K_DOWN:  # Стрелка вниз - сброс
+                            game.hard_drop()
+                
+                # Прокрутка и масштаб большого поля
+                if event.type == pygame.MOUSEWHEEL:
+                    if pygame.key.get_mods() & pygame.KMOD_SHIFT:
+                        viewport.scroll(0, -event.y)
+                    else:
+                        viewport.scroll(-event.y, event.x)
+                elif event.type == pygame.KEYDOWN and event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                    viewport.zoom(1)
+                elif event.type == pygame.KEYDOWN and event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    viewport.zoom(-1)
                 
                 # Обработка кнопки "Меню" после завершения игры
                 if game.game_over and menu_button.check_click(mouse_pos, event):
                     # Обновляем счет
-                    if game.winner == 'blue':
-                        blue_score += 1
-                        last_winner = 'blue'
-                    elif game.winner == 'red':
-                        red_score += 1
-                        last_winner = 'red'
-                    elif game.winner == 'draw':
-                        last_winner = 'draw'
+                    score = history.summary()
                     
                     # Возвращаемся в главное меню
                     in_game = False
+                    menu_state = None
             else:
                 # Обработка кнопок в главном меню
                 if play_button.check_click(mouse_pos, event):
                     # Начинаем новую игру
-                    game = Game()
+                    game = Game(args.geometry, broadcaster)
+                    followed = None
+                    recorded = False
+                    computers = [ComputerPlayer(color, args.think_time, tablebase=tablebase)
+                                 for color in computer_colors]
                     in_game = True
+                    renderer.invalidate()
                 
                 if exit_button.check_click(mouse_pos, event):
                     pygame.quit()
@@ -503,30 +1343,77 @@ def main():
         
         # Обновление состояния игры
         if in_game:
-            game.update()
-        
-        # Отрисовка
-        screen.fill(BACKGROUND)
-        
-        if in_game:
-            # Отрисовка игрового раунда
-            draw_game_board()
-            draw_pieces(game)
-            draw_current_piece(game)
-            draw_winning_line(game)
+            # Ходы компьютера (поиск идет в фоне, здесь только передача готового хода)
+            profiler.mark('ai')
+            for computer in computers:
+                computer.update(game)
+                stats = computer.pop_stats()
+                if args.ai_stats and stats:
+                    print(computer.color, stats)
+            # Логика - фиксированными тактами, отрисовка - в промежуточном положении
+            profiler.mark('update')
+            now = time.perf_counter()
+            game.update(now)
+            progress = game.fall_progress(now)
             
-            # Отрисовка кнопки "Меню" при завершении игры
-            if game.game_over:
-                menu_button.check_hover(mouse_pos)
-                menu_button.draw(screen)
+            # Видимая часть следует за фигурой, когда та сдвигается
+            piece = game.current_piece
+            if piece and (piece['row'], piece['col']) != followed:
+                followed = (piece['row'], piece['col'])
+                viewport.follow(*followed)
+            
+            # Подсказки для текущей позиции (если анализ уже опубликовал результат)
+            if analyzer:
+                analyzer.update(game)
+                marks = analyzer.marks(game)
+
+            # Завершенный раунд записывается один раз: в архив партий и в историю (в фоне)
+            if game.game_over and not recorded:
+                profiler.mark('record')
+                if recorder:
+                    replay_index = recorder.append('blue', game.actions).index
+                history.record(game.winner, game.core.end_reason, game.core.ply, time.time() - game.started,
+                               replay_path=args.record, replay_index=replay_index)
+                recorded = True
+
+        # Отрисовка: dirty - список измененных областей или None для всего экрана
+        profiler.mark('draw')
+        if args.render == 'full':
+            draw_full_frame(game if in_game else None, score['blue'], score['red'], score['last_winner'],
+                            play_button, exit_button, menu_button, mouse_pos, marks, progress)
+            dirty = None
+        elif in_game:
+            # Только изменившиеся области раунда
+            menu_button.check_hover(mouse_pos)
+            dirty = renderer.draw(game, menu_button, marks, progress)
         else:
-            # Отрисовка главного меню
+            # Меню перерисовывается только при изменении наведения или счета
             play_button.check_hover(mouse_pos)
             exit_button.check_hover(mouse_pos)
-            draw_main_menu(blue_score, red_score, last_winner, play_button, exit_button)
+            state = (play_button.is_hovered, exit_button.is_hovered, score['blue'], score['red'], score['last_winner'])
+            dirty = []
+            if state != menu_state:
+                menu_state = state
+                screen.fill(BACKGROUND)
+                draw_main_menu(score['blue'], score['red'], score['last_winner'], play_button, exit_button)
+                dirty = None
+
+        if profiler.enabled:
+            profiler.mark('hud')
+            # В раунде - рядом с видимой частью поля, в меню - в полосе стандартного поля
+            board_rect = viewport.rect if in_game else pygame.Rect(BOARD_X, BOARD_Y, BOARD_WIDTH, BOARD_HEIGHT)
+            hud_rect = hud.draw(screen, profiler, board_rect)
+            if hud_rect and dirty is not None:
+                dirty.append(hud_rect)
+
+        profiler.mark('flip')
+        if dirty is None:
+            pygame.display.flip()
+        elif dirty:
+            pygame.display.update(dirty)
         
-        # Обновление экрана
-        pygame.display.flip()
+        # Следующий кадр нужен без событий, только пока идет раунд
+        idle = not in_game or game.game_over
 
 if __name__ == "__main__":
     main()
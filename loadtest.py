@@ -0,0 +1,139 @@
+"""Нагрузочный тест сервера матчей через loopback.
+
+Запускает пары клиентов, которые играют случайными ходами и сразу встают в
+очередь снова. Опоздание такта - разница между временем получения сообщения
+клиентом и моментом, на который сервер запланировал такт.
+
+Запуск: python loadtest.py --matches 500 --duration 30 --tick 0.2 [--spawn-server]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from engine import MOVE_ZONE_ROWS
+from server import percentile
+
+
+class LoadStats:
+    """Замеры со всех клиентов"""
+    def __init__(self):
+        self.latencies = []
+        self.matches = 0
+        self.messages = 0
+
+
+async def request_stats(host, port):
+    """Статистика сервера через отдельное подключение"""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"type": "stats"}\n')
+    await writer.drain()
+    line = await reader.readline()
+    writer.close()
+    return json.loads(line)
+
+
+async def run_client(host, port, stats, seed):
+    """Клиент: подбор соперника, случайные сдвиги в свою очередь, повтор до отмены задачи"""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"type": "join"}\n')
+    color = None
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            received = time.time()
+            message = json.loads(line)
+            stats.messages += 1
+            kind = message['type']
+
+            if kind == 'start':
+                color = message['color']
+            elif kind == 'tick':
+                stats.latencies.append(received - message['due'])
+                piece = message['piece']
+                if message['player'] == color and piece and piece[0] < MOVE_ZONE_ROWS and rng.random() < 0.5:
+                    direction = rng.choice((-1, 1))
+                    writer.write(f'{{"type": "move", "dir": {direction}}}\n'.encode())
+            elif kind == 'over':
+                if color == 'blue':
+                    stats.matches += 1
+                color = None
+                writer.write(b'{"type": "join"}\n')
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, matches, duration, seed):
+    """Нагрузка ровно duration секунд.
+
+    Статистика сервера снимается в начале и в конце теста, такты в секунду
+    и загрузка процессора считаются по разнице между замерами, а не за все
+    время работы сервера. После второго замера клиенты отключаются, не
+    доигрывая матчи. Возвращает замеры клиентов, статистику сервера, такты
+    в секунду и загрузку процессора за время теста.
+    """
+    stats = LoadStats()
+    before = await request_stats(host, port)
+    clients = [asyncio.create_task(run_client(host, port, stats, seed + i)) for i in range(matches * 2)]
+    await asyncio.sleep(duration)
+    after = await request_stats(host, port)
+    for client in clients:
+        client.cancel()
+    await asyncio.gather(*clients, return_exceptions=True)
+
+    window = after['uptime'] - before['uptime']
+    ticks_per_sec = (after['ticks'] - before['ticks']) / window
+    cpu_load = (after['cpu_time'] - before['cpu_time']) / window
+    return stats, after, ticks_per_sec, cpu_load
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера матчей")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--matches', type=int, default=100, help="одновременных матчей")
+    parser.add_argument('--duration', type=float, default=20.0, help="длительность, секунд")
+    parser.add_argument('--tick', type=float, default=1.0, help="период такта для --spawn-server")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--spawn-server', action='store_true', help="запустить сервер в отдельном процессе")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn_server:
+        server = subprocess.Popen(
+            [sys.executable, 'server.py', '--host', args.host, '--port', str(args.port), '--tick', str(args.tick)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL
+        )
+        time.sleep(1.0)
+
+    try:
+        stats, server_stats, ticks_per_sec, cpu_load = asyncio.run(
+            run_load(args.host, args.port, args.matches, args.duration, args.seed)
+        )
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    latencies = stats.latencies
+    print(f"Матчей сыграно: {stats.matches}, сообщений получено: {stats.messages}")
+    print(f"Опоздание такта у клиента: p50 {percentile(latencies, 0.50) * 1000:.1f} мс, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} мс")
+    print(f"Опоздание таймера на сервере: p50 {server_stats['lateness_p50'] * 1000:.1f} мс, "
+          f"p99 {server_stats['lateness_p99'] * 1000:.1f} мс")
+    print(f"Тактов в секунду на сервере: {ticks_per_sec:.0f}, "
+          f"загрузка процессора: {cpu_load:.0%}, отключено медленных: {server_stats['dropped_clients']}")
+    if cpu_load > 0:
+        print(f"Оценка: одно ядро выдержит около {args.matches / cpu_load:.0f} матчей с таким тактом")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Покадровый профилировщик главного цикла.
+
+Кадр делится на фазы вызовами mark(): каждая отметка закрывает
+предыдущую фазу и открывает следующую, так что на фазу приходится один
+вызов часов. По последним кадрам считаются FPS, перцентили времени кадра
+и среднее время фаз, а события можно сохранить в формате Chrome trace
+(chrome://tracing, Perfetto) для разбора медленных кадров.
+
+Когда профилирование выключено, вместо FrameProfiler используется
+NullProfiler с пустыми методами - в цикле остаются только их вызовы.
+"""
+
+import collections
+import json
+import time
+
+# Сколько последних кадров учитывать в статистике
+FRAME_HISTORY = 600
+
+# Предел событий трассы в памяти (старые вытесняются)
+MAX_TRACE_EVENTS = 200000
+
+
+class NullProfiler:
+    """Выключенный профилировщик: ничего не замеряет"""
+    enabled = False
+
+    def begin_frame(self):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def save_trace(self, path):
+        pass
+
+
+class FrameProfiler:
+    """Замер фаз каждого кадра"""
+    enabled = True
+
+    def __init__(self, history=FRAME_HISTORY, trace=True, max_events=MAX_TRACE_EVENTS, clock=time.perf_counter):
+        self.clock = clock
+        self.origin = clock()
+        # (длительность кадра, {фаза: длительность}) последних кадров
+        self.frames = collections.deque(maxlen=history)
+        # (имя, начало, длительность) для трассы
+        self.events = collections.deque(maxlen=max_events) if trace else None
+        self.frame_count = 0
+        self.frame_start = None
+        self.phase = None
+        self.phase_start = 0.0
+        self.phases = {}
+
+    def begin_frame(self):
+        """Начало нового кадра (закрывает предыдущий)"""
+        now = self.clock()
+        if self.frame_start is not None:
+            self._end_frame(now)
+        self.frame_start = now
+        self.phase = None
+        self.phases = {}
+
+    def mark(self, name):
+        """Начало фазы name; текущая фаза заканчивается"""
+        now = self.clock()
+        if self.phase is not None:
+            self._end_phase(now)
+        self.phase = name
+        self.phase_start = now
+
+    def _end_phase(self, now):
+        duration = now - self.phase_start
+        self.phases[self.phase] = self.phases.get(self.phase, 0.0) + duration
+        if self.events is not None:
+            self.events.append((self.phase, self.phase_start, duration))
+
+    def _end_frame(self, now):
+        if self.phase is not None:
+            self._end_phase(now)
+        duration = now - self.frame_start
+        self.frames.append((duration, self.phases))
+        if self.events is not None:
+            self.events.append(('frame', self.frame_start, duration))
+        self.frame_count += 1
+
+    def summary(self):
+        """FPS, перцентили времени кадра и среднее время фаз (в секундах) по последним кадрам"""
+        if not self.frames:
+            return {'frames': 0, 'fps': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0, 'phases': {}}
+        durations = sorted(duration for duration, _ in self.frames)
+        count = len(durations)
+        total = sum(durations)
+        phases = {}
+        for _, frame_phases in self.frames:
+            for name, duration in frame_phases.items():
+                phases[name] = phases.get(name, 0.0) + duration
+        return {
+            'frames': count,
+            'fps': count / total if total else 0.0,
+            'p50': durations[min(int(count * 0.50), count - 1)],
+            'p95': durations[min(int(count * 0.95), count - 1)],
+            'p99': durations[min(int(count * 0.99), count - 1)],
+            'max': durations[-1],
+            'phases': {name: duration / count for name, duration in phases.items()},
+        }
+
+    def trace_events(self):
+        """События в формате Chrome trace (время в микросекундах от запуска)"""
+        origin = self.origin
+        return [
+            {'name': name, 'cat': 'frame' if name == 'frame' else 'phase', 'ph': 'X',
+             'ts': (start - origin) * 1e6, 'dur': duration * 1e6, 'pid': 1, 'tid': 1}
+            for name, start, duration in self.events or ()
+        ]
+
+    def save_trace(self, path):
+        """Сохранение трассы для chrome://tracing или Perfetto"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f)
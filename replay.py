@@ -0,0 +1,243 @@
+"""Компактный формат записи партий и архив с быстрым поиском.
+
+Партия хранится как первый игрок и по одному действию на каждый такт
+update(), по 2 бита на действие. Архив состоит из двух файлов:
+
+* PATH - заголовок и данные партий, дописываемые в конец;
+* PATH.idx - индекс из записей фиксированного размера (по одной на партию).
+
+Вместе с действиями партии записываются снимки позиции через каждые
+snapshot_interval тактов, поэтому к любому такту можно перейти от
+ближайшего снимка, не проигрывая партию с начала. Оба файла читаются
+через mmap, так что архив из миллионов партий не загружается в память.
+"""
+
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from engine import (GameCore, GRID_WIDTH, GRID_HEIGHT, MOVE_ZONE_ROWS, PIECES,
+                    LEFT, STAY, RIGHT, DROP, END_LINE, END_MOVE_ZONE, END_FULL)
+
+MAGIC = b'GTTR'
+VERSION = 1
+SNAPSHOT_INTERVAL = 32
+
+# Заголовок файла данных: сигнатура, версия, интервал снимков
+HEADER = struct.Struct('<4sHH8x')
+# Запись индекса: смещение данных, число тактов, первый игрок, победитель, причина завершения
+INDEX_RECORD = struct.Struct('<QIBBBx')
+# Снимок позиции: фигуры X и O в зоне размещения (по биту на клетку), падающая фигура, игрок
+SNAPSHOT = struct.Struct('<QQBBB')
+
+# 2-битные коды действий
+ACTION_CODES = {STAY: 0, LEFT: 1, RIGHT: 2, DROP: 3}
+CODE_ACTIONS = (STAY, LEFT, RIGHT, DROP)
+
+PLAYERS = ('blue', 'red')
+WINNERS = (None, 'blue', 'red', 'draw')
+END_REASONS = (None, END_LINE, END_MOVE_ZONE, END_FULL)
+
+RoundInfo = namedtuple('RoundInfo', 'index offset plies first_player winner end_reason')
+
+
+def pack_actions(actions):
+    """Упаковка действий по 4 в байт (младшие биты - раньше)"""
+    data = bytearray((len(actions) + 3) // 4)
+    for i, action in enumerate(actions):
+        data[i >> 2] |= ACTION_CODES[action] << ((i & 3) * 2)
+    return bytes(data)
+
+
+def unpack_actions(data, count, start=0):
+    """Действия с номерами start..count-1 из упакованных данных"""
+    return [CODE_ACTIONS[data[i >> 2] >> ((i & 3) * 2) & 3] for i in range(start, count)]
+
+
+def snapshot_count(plies, interval):
+    """Число снимков в партии: только для незавершенных позиций внутри партии"""
+    return max(plies - 1, 0) // interval
+
+
+def make_snapshot(core):
+    """Снимок позиции (в зоне перемещения фиксированных фигур быть не может)"""
+    bits = {'X': 0, 'O': 0}
+    for row in range(MOVE_ZONE_ROWS, GRID_HEIGHT):
+        for col, piece in enumerate(core.board[row]):
+            if piece:
+                bits[piece] |= 1 << ((row - MOVE_ZONE_ROWS) * GRID_WIDTH + col)
+    piece = core.current_piece
+    return SNAPSHOT.pack(bits['X'], bits['O'], piece['row'], piece['col'], PLAYERS.index(core.current_player))
+
+
+def restore_snapshot(data, ply):
+    """GameCore в позиции из снимка после ply тактов"""
+    x_bits, o_bits, row, col, player = SNAPSHOT.unpack(data)
+    core = GameCore(PLAYERS[player])
+    for cell in range((GRID_HEIGHT - MOVE_ZONE_ROWS) * GRID_WIDTH):
+        piece = 'X' if x_bits >> cell & 1 else 'O' if o_bits >> cell & 1 else None
+        if piece:
+            cell_row, cell_col = divmod(cell, GRID_WIDTH)
+            core.board[cell_row + MOVE_ZONE_ROWS][cell_col] = piece
+            core.heights[cell_col] += 1
+            core.filled += 1
+    core.current_piece = {'type': PIECES[core.current_player], 'row': row, 'col': col}
+    core.ply = ply
+    return core
+
+
+class ReplayWriter:
+    """Дописывание партий в архив"""
+    def __init__(self, path, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.data = open(path, 'ab')
+        self.index = open(path + '.idx', 'ab')
+
+        if new:
+            self.snapshot_interval = snapshot_interval
+            self.data.write(HEADER.pack(MAGIC, VERSION, snapshot_interval))
+            self.data.flush()
+        else:
+            with open(path, 'rb') as f:
+                self.snapshot_interval = read_header(f.read(HEADER.size))
+        self.count = os.path.getsize(path + '.idx') // INDEX_RECORD.size
+
+    def append(self, first_player, actions):
+        """Записать партию; возвращает RoundInfo с ее номером в архиве"""
+        interval = self.snapshot_interval
+        core = GameCore(first_player)
+        snapshots = []
+        for ply, action in enumerate(actions, 1):
+            if core.game_over:
+                raise ValueError("действия после завершения партии")
+            core.step(action)
+            if ply % interval == 0 and ply < len(actions):
+                snapshots.append(make_snapshot(core))
+
+        # Сначала данные, потом запись индекса: партия видна только целиком
+        self.data.seek(0, os.SEEK_END)
+        offset = self.data.tell()
+        self.data.write(b''.join(snapshots))
+        self.data.write(pack_actions(actions))
+        self.data.flush()
+
+        info = RoundInfo(self.count, offset, len(actions), first_player, core.winner(), core.end_reason)
+        self.index.write(INDEX_RECORD.pack(
+            offset, len(actions), PLAYERS.index(first_player),
+            WINNERS.index(info.winner), END_REASONS.index(info.end_reason)
+        ))
+        self.index.flush()
+        self.count += 1
+        return info
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(data):
+    """Проверка заголовка, возвращает интервал снимков"""
+    magic, version, interval = HEADER.unpack(data[:HEADER.size])
+    if magic != MAGIC:
+        raise ValueError("это не архив партий")
+    if version != VERSION:
+        raise ValueError(f"неподдерживаемая версия архива: {version}")
+    return interval
+
+
+class ReplayReader:
+    """Чтение архива через mmap: поиск партий и переход к любому такту"""
+    def __init__(self, path):
+        self._files = [open(path, 'rb'), open(path + '.idx', 'rb')]
+        self.data = self._map(self._files[0])
+        self.index = self._map(self._files[1])
+        self.snapshot_interval = read_header(self.data)
+        self.count = len(self.index) // INDEX_RECORD.size
+
+    @staticmethod
+    def _map(f):
+        """mmap файла (пустой файл отображать нельзя)"""
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        for view in (self.data, self.index):
+            if isinstance(view, mmap.mmap):
+                view.close()
+        for f in self._files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def info(self, index):
+        """Описание партии по номеру"""
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        record = INDEX_RECORD.unpack_from(self.index, index * INDEX_RECORD.size)
+        return self._info(index, record)
+
+    @staticmethod
+    def _info(index, record):
+        offset, plies, first_player, winner, end_reason = record
+        return RoundInfo(index, offset, plies, PLAYERS[first_player], WINNERS[winner], END_REASONS[end_reason])
+
+    def __iter__(self):
+        for index, record in enumerate(INDEX_RECORD.iter_unpack(self.index)):
+            yield self._info(index, record)
+
+    def find(self, winner=None, end_reason=None):
+        """Партии с заданным победителем и/или причиной завершения (по индексу, без чтения данных)"""
+        winner_code = WINNERS.index(winner) if winner else None
+        reason_code = END_REASONS.index(end_reason) if end_reason else None
+        for index, record in enumerate(INDEX_RECORD.iter_unpack(self.index)):
+            if winner_code is not None and record[3] != winner_code:
+                continue
+            if reason_code is not None and record[4] != reason_code:
+                continue
+            yield self._info(index, record)
+
+    def _actions_offset(self, info):
+        """Начало упакованных действий (после снимков)"""
+        return info.offset + snapshot_count(info.plies, self.snapshot_interval) * SNAPSHOT.size
+
+    def actions(self, index, start=0, stop=None):
+        """Действия партии на тактах start..stop-1"""
+        info = self.info(index)
+        stop = info.plies if stop is None else min(stop, info.plies)
+        begin = self._actions_offset(info)
+        data = self.data[begin:begin + (info.plies + 3) // 4]
+        return unpack_actions(data, stop, start)
+
+    def state_at(self, index, ply):
+        """GameCore после ply тактов партии: от ближайшего снимка, а не с начала"""
+        info = self.info(index)
+        if not 0 <= ply <= info.plies:
+            raise IndexError(ply)
+
+        interval = self.snapshot_interval
+        snapshot = min(ply // interval, snapshot_count(info.plies, interval))
+        if snapshot:
+            offset = info.offset + (snapshot - 1) * SNAPSHOT.size
+            core = restore_snapshot(self.data[offset:offset + SNAPSHOT.size], snapshot * interval)
+        else:
+            core = GameCore(info.first_player)
+
+        for action in self.actions(index, core.ply, ply):
+            core.step(action)
+        return core
@@ -0,0 +1,229 @@
+"""Планировщик тактов множества партий на куче таймеров.
+
+Вместо опроса каждой партии каждый кадр (как Game.update()) партии лежат
+в куче по моменту следующего такта. run_due() будит только те, чей срок
+наступил, а между ними процесс спит до ближайшего срока.
+
+Время планировщика - игровое: это часы clock(), умноженные на time_scale.
+time_scale=1 - реальное время, 10 - в десять раз быстрее, INSTANT -
+мгновенная симуляция, в которой время сразу перескакивает к следующему
+сроку. Для каждого такта запоминается опоздание (в секундах реального
+времени), по нему считаются перцентили и джиттер.
+
+Запуск: python scheduler.py --games 10000 --period 1.0 --time-scale 20 --duration 5
+"""
+
+import argparse
+import collections
+import heapq
+import itertools
+import math
+import random
+import time
+
+from engine import GameCore, ACTIONS, MOVE_ZONE_ROWS, STAY
+from server import percentile
+
+# Мгновенная симуляция: без ожидания, время перескакивает к следующему сроку
+INSTANT = math.inf
+
+# Сколько последних замеров опоздания хранить
+LATENESS_SAMPLES = 100000
+
+
+class Entry:
+    """Партия в планировщике"""
+    __slots__ = ('game', 'period', 'deadline', 'cancelled')
+
+    def __init__(self, game, period, deadline):
+        self.game = game
+        self.period = period
+        self.deadline = deadline
+        self.cancelled = False
+
+
+class TickScheduler:
+    """Куча партий по сроку следующего такта.
+
+    Партия - любой объект с методом tick(), который делает один такт и
+    возвращает False, когда партию больше не нужно будить.
+    """
+    def __init__(self, clock=time.perf_counter, time_scale=1.0, sleep=time.sleep):
+        if time_scale <= 0:
+            raise ValueError("time_scale должен быть положительным")
+        self.clock = clock
+        self.sleep = sleep
+        self.time_scale = time_scale
+        self._origin = clock()
+        self._virtual = 0.0  # игровое время мгновенной симуляции
+
+        self.heap = []
+        self.entries = {}
+        self._order = itertools.count()  # равные сроки - в порядке добавления
+
+        # Статистика
+        self.ticks = 0
+        self.wakeups = 0
+        self.lateness = collections.deque(maxlen=LATENESS_SAMPLES)
+
+    def now(self):
+        """Текущее игровое время"""
+        if self.time_scale == INSTANT:
+            return self._virtual
+        return (self.clock() - self._origin) * self.time_scale
+
+    def add(self, game, period=1.0, delay=None):
+        """Добавить партию: первый такт через delay (по умолчанию через period)"""
+        if game in self.entries:
+            self.remove(game)
+        entry = Entry(game, period, self.now() + (period if delay is None else delay))
+        self.entries[game] = entry
+        heapq.heappush(self.heap, (entry.deadline, next(self._order), entry))
+        return entry
+
+    def remove(self, game):
+        """Убрать партию (запись в куче отменяется и пропускается при извлечении)"""
+        entry = self.entries.pop(game, None)
+        if entry:
+            entry.cancelled = True
+
+    def restart(self, game):
+        """Отсчитать период заново от текущего момента (например, после жесткого сброса)"""
+        entry = self.entries.get(game)
+        if entry:
+            self.add(game, entry.period)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def next_deadline(self):
+        """Срок ближайшего такта или None, если партий нет"""
+        heap = self.heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def run_due(self):
+        """Такты всех партий, срок которых наступил; возвращает их число"""
+        heap = self.heap
+        now = self.now()
+        scale = self.time_scale
+        count = 0
+        while heap and heap[0][0] <= now:
+            deadline, _, entry = heapq.heappop(heap)
+            if entry.cancelled:
+                continue
+            if scale != INSTANT:
+                self.lateness.append((now - deadline) / scale)
+            count += 1
+            if entry.game.tick() is False:
+                self.entries.pop(entry.game, None)
+                continue
+            # Следующий такт - через период от срока, без накопления опоздания
+            entry.deadline = deadline + entry.period
+            heapq.heappush(heap, (entry.deadline, next(self._order), entry))
+        self.ticks += count
+        return count
+
+    def wait(self, timeout=None):
+        """Сон до ближайшего срока (не дольше timeout секунд реального времени).
+
+        Каждый вызов с непустой кучей - одно пробуждение; в мгновенной
+        симуляции пробуждение - перескок времени к ближайшему сроку.
+        """
+        deadline = self.next_deadline()
+        if deadline is None:
+            return
+        self.wakeups += 1
+        if self.time_scale == INSTANT:
+            self._virtual = max(self._virtual, deadline)
+            return
+        delay = (deadline - self.now()) / self.time_scale
+        if timeout is not None:
+            delay = min(delay, timeout)
+        if delay > 0:
+            self.sleep(delay)
+
+    def run(self, until=None):
+        """Такты до момента until игрового времени (или пока есть партии)"""
+        while self.entries:
+            deadline = self.next_deadline()
+            if until is not None and deadline > until:
+                if self.time_scale == INSTANT:
+                    self._virtual = max(self._virtual, until)
+                else:
+                    remaining = (until - self.now()) / self.time_scale
+                    if remaining > 0:
+                        self.sleep(remaining)
+                return
+            self.wait()
+            self.run_due()
+
+    def stats(self):
+        """Число тактов, перцентили опоздания и джиттер (стандартное отклонение опоздания), в секундах"""
+        lateness = list(self.lateness)
+        mean = sum(lateness) / len(lateness) if lateness else 0.0
+        variance = sum((x - mean) ** 2 for x in lateness) / len(lateness) if lateness else 0.0
+        return {
+            'games': len(self.entries),
+            'ticks': self.ticks,
+            'wakeups': self.wakeups,
+            'time': self.now(),
+            'lateness_mean': mean,
+            'lateness_p50': percentile(lateness, 0.50),
+            'lateness_p99': percentile(lateness, 0.99),
+            'lateness_max': max(lateness) if lateness else 0.0,
+            'jitter': math.sqrt(variance),
+        }
+
+
+class RandomGame:
+    """Партия со случайными сдвигами, которая сразу начинается заново (для нагрузки)"""
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.core = GameCore()
+        self.finished = 0
+
+    def tick(self):
+        core = self.core
+        core.step(self.rng.choice(ACTIONS) if core.current_piece['row'] < MOVE_ZONE_ROWS else STAY)
+        if core.game_over:
+            self.finished += 1
+            core.reset()
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Такты множества партий по куче таймеров")
+    parser.add_argument('--games', type=int, default=1000, help="число партий")
+    parser.add_argument('--period', type=float, default=1.0, help="период такта, секунд игрового времени")
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help="во сколько раз игровое время быстрее реального (0 - мгновенно)")
+    parser.add_argument('--duration', type=float, default=10.0, help="длительность, секунд игрового времени")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    scheduler = TickScheduler(time_scale=args.time_scale or INSTANT)
+    games = [RandomGame(args.seed + i) for i in range(args.games)]
+    # Такты партий равномерно разнесены по периоду
+    for i, game in enumerate(games):
+        scheduler.add(game, args.period, delay=args.period * i / args.games)
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    scheduler.run(until=args.duration)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    stats = scheduler.stats()
+    print(f"Тактов: {stats['ticks']}, партий завершено: {sum(game.finished for game in games)}, "
+          f"пробуждений: {stats['wakeups']}")
+    print(f"Реальное время: {elapsed:.2f} с, процессор: {cpu:.2f} с ({cpu / elapsed if elapsed else 0:.0%}), "
+          f"{stats['ticks'] / elapsed if elapsed else 0:.0f} тактов в секунду")
+    if args.time_scale:
+        print(f"Опоздание такта: p50 {stats['lateness_p50'] * 1000:.2f} мс, p99 {stats['lateness_p99'] * 1000:.2f} мс, "
+              f"max {stats['lateness_max'] * 1000:.2f} мс, джиттер {stats['jitter'] * 1000:.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Авторитетный сервер матчей на asyncio.
+
+Протокол - строки JSON через TCP, по одному сообщению на строку.
+
+Клиент -> сервер:
+    {"type": "join"}                 встать в очередь подбора соперника
+    {"type": "move", "dir": -1 | 1}  сдвиг фигуры (как Game.request_move)
+    {"type": "drop"}                 жесткий сброс фигуры
+    {"type": "stats"}                статистика сервера
+
+Сервер -> клиент:
+    {"type": "waiting"}
+    {"type": "start", "match": id, "color": "blue" | "red"}
+    {"type": "tick", "match": id, "ply": n, "player": ..., "piece": [row, col] | null,
+     "placed": [row, col, "X" | "O"] | null, "due": время такта (time.time())}
+    {"type": "over", "match": id, "winner": ..., "reason": ..., "line": [...] | null}
+    {"type": "stats", ...}
+    {"type": "error", "error": "invalid json" | "line too long"}
+                                      (после "line too long" клиент отключается)
+
+Такты матчей не опрашиваются в цикле: каждый матч ставит таймер цикла
+событий на момент своего следующего такта. Медленные клиенты, у которых
+копится неотправленный буфер, отключаются, чтобы не задерживать матчи.
+
+Запуск: python server.py --port 8765 [--tick 1.0]
+"""
+
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import time
+
+from bitboard import BitboardCore
+from engine import DROP, OPPONENT, STAY
+
+# Предел неотправленных данных клиента, после которого он считается медленным
+MAX_BUFFER = 64 * 1024
+
+# Сколько последних замеров опоздания тактов хранить для перцентилей
+LATENESS_SAMPLES = 100000
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированной копии значений"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Client:
+    """Подключение игрока"""
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.match = None
+        self.color = None
+        self.closed = False
+
+    def send(self, message):
+        """Отправка сообщения (словаря) клиенту"""
+        self.send_raw((json.dumps(message) + '\n').encode())
+
+    def send_raw(self, data):
+        """Отправка готовой строки; клиент с переполненным буфером отключается"""
+        if self.closed:
+            return
+        transport = self.writer.transport
+        if transport.get_write_buffer_size() > self.server.max_buffer:
+            self.server.dropped_clients += 1
+            self.close()
+            return
+        self.writer.write(data)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.writer.close()
+        self.server.client_gone(self)
+
+    async def run(self):
+        """Чтение команд до отключения"""
+        try:
+            while not self.closed:
+                try:
+                    line = await self.reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    # Строка длиннее предела StreamReader: остаток строки не разобрать, отключаем
+                    self.send({'type': 'error', 'error': 'line too long'})
+                    break
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    self.send({'type': 'error', 'error': 'invalid json'})
+                    continue
+                self.server.handle(self, message)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.close()
+
+
+class Match:
+    """Один матч: ядро игры и таймер следующего такта"""
+    def __init__(self, server, match_id, blue, red):
+        self.server = server
+        self.id = match_id
+        self.players = {'blue': blue, 'red': red}
+        self.core = BitboardCore()
+        self.pending = {'blue': STAY, 'red': STAY}
+        self.finished = False
+        self.loop = asyncio.get_running_loop()
+        self.deadline = self.loop.time() + server.tick_period
+        self.handle = self.loop.call_at(self.deadline, self.tick)
+
+    def request(self, client, action):
+        """Ход игрока применяется на ближайшем такте, если сейчас его очередь"""
+        if self.finished or self.core.current_player != client.color:
+            return
+        if action == DROP:
+            # Сброс не ждет такта, как и в графической версии
+            self.handle.cancel()
+            self.deadline = self.loop.time()
+            self.tick(action=DROP)
+        else:
+            self.pending[client.color] = action
+
+    def tick(self, action=None):
+        """Такт матча по таймеру"""
+        server = self.server
+        now = self.loop.time()
+        server.record_lateness(now - self.deadline)
+
+        core = self.core
+        player = core.current_player
+        piece = core.current_piece
+        if action is None:
+            action = self.pending[player]
+        self.pending[player] = STAY
+
+        placed = core.step(action)
+        server.ticks += 1
+
+        message = {
+            'type': 'tick',
+            'match': self.id,
+            'ply': core.ply,
+            'player': core.current_player,
+            'piece': [core.current_piece['row'], core.current_piece['col']] if core.current_piece else None,
+            'placed': [piece['row'], piece['col'], piece['type']] if placed else None,
+            'due': time.time() - (now - self.deadline),
+        }
+        self.broadcast(message)
+
+        # Матч мог завершиться при рассылке, если игрока отключили как медленного
+        if self.finished:
+            return
+        if core.game_over:
+            self.finish(core.winner(), core.end_reason, core.winning_line)
+            return
+
+        # Следующий такт - через период от запланированного момента, без накопления дрейфа
+        self.deadline += server.tick_period
+        if self.deadline < now:
+            self.deadline = now
+        self.handle = self.loop.call_at(self.deadline, self.tick)
+
+    def broadcast(self, message):
+        """Одно и то же сообщение обоим игрокам (сериализуется один раз)"""
+        data = (json.dumps(message) + '\n').encode()
+        for client in self.players.values():
+            client.send_raw(data)
+
+    def finish(self, winner, reason, line=None):
+        """Завершение матча и возврат игроков в лобби"""
+        if self.finished:
+            return
+        self.finished = True
+        self.handle.cancel()
+        self.broadcast({'type': 'over', 'match': self.id, 'winner': winner, 'reason': reason,
+                        'line': list(line) if line else None})
+        for client in self.players.values():
+            client.match = None
+            client.color = None
+        self.server.match_finished(self, reason)
+
+    def forfeit(self, client):
+        """Игрок отключился - победа сопернику"""
+        self.finish(OPPONENT[client.color], 'forfeit')
+
+
+class MatchServer:
+    """Подбор соперников и матчи в одном цикле событий"""
+    def __init__(self, tick_period=1.0, max_buffer=MAX_BUFFER):
+        self.tick_period = tick_period
+        self.max_buffer = max_buffer
+        self.waiting = collections.deque()
+        self.matches = {}
+        self.match_ids = itertools.count(1)
+
+        # Статистика
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        self.ticks = 0
+        self.clients = 0
+        self.matches_finished = 0
+        self.dropped_clients = 0
+        self.end_reasons = collections.Counter()
+        self.lateness = collections.deque(maxlen=LATENESS_SAMPLES)
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """Запуск прослушивания, возвращает asyncio.Server"""
+        return await asyncio.start_server(self.accept, host, port)
+
+    async def accept(self, reader, writer):
+        client = Client(self, reader, writer)
+        self.clients += 1
+        await client.run()
+
+    def handle(self, client, message):
+        """Разбор команды клиента"""
+        kind = message.get('type')
+        if kind == 'join':
+            self.join(client)
+        elif kind == 'move' and client.match:
+            direction = message.get('dir')
+            # Только целые -1 и 1: 1.0 и true из JSON тоже равны 1, но ядро ждет int
+            if type(direction) is int and direction in (-1, 1):
+                client.match.request(client, direction)
+        elif kind == 'drop' and client.match:
+            client.match.request(client, DROP)
+        elif kind == 'stats':
+            client.send(dict(self.stats(), type='stats'))
+
+    def join(self, client):
+        """Очередь подбора: двое ожидающих начинают матч"""
+        if client.match or client in self.waiting:
+            return
+        self.waiting.append(client)
+        client.send({'type': 'waiting'})
+        while len(self.waiting) >= 2:
+            blue = self.waiting.popleft()
+            red = self.waiting.popleft()
+            match = Match(self, next(self.match_ids), blue, red)
+            self.matches[match.id] = match
+            for color, player in (('blue', blue), ('red', red)):
+                player.match = match
+                player.color = color
+                player.send({'type': 'start', 'match': match.id, 'color': color})
+
+    def client_gone(self, client):
+        """Клиент отключился (сам или был отключен как медленный)"""
+        if client in self.waiting:
+            self.waiting.remove(client)
+        if client.match:
+            client.match.forfeit(client)
+
+    def match_finished(self, match, reason):
+        self.matches.pop(match.id, None)
+        self.matches_finished += 1
+        self.end_reasons[reason] += 1
+
+    def record_lateness(self, seconds):
+        self.lateness.append(seconds)
+
+    def stats(self):
+        """Статистика сервера: опоздание тактов и загрузка процессора"""
+        elapsed = time.perf_counter() - self.started
+        cpu = time.process_time() - self.cpu_started
+        lateness = list(self.lateness)
+        return {
+            'active_matches': len(self.matches),
+            'waiting': len(self.waiting),
+            'matches_finished': self.matches_finished,
+            'clients': self.clients,
+            'dropped_clients': self.dropped_clients,
+            'ticks': self.ticks,
+            # В среднем за все время работы; за отдельный замер - по разнице ticks и uptime
+            'ticks_per_sec': self.ticks / elapsed if elapsed else 0.0,
+            'lateness_p50': percentile(lateness, 0.50),
+            'lateness_p99': percentile(lateness, 0.99),
+            'uptime': elapsed,
+            'cpu_time': cpu,
+            'cpu_load': cpu / elapsed if elapsed else 0.0,
+            'end_reasons': dict(self.end_reasons),
+        }
+
+
+async def serve(host, port, tick_period):
+    server = MatchServer(tick_period)
+    listener = await server.start(host, port)
+    print(f"Сервер слушает {host}:{port}, такт {tick_period} с")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер матчей крестиков-ноликов с гравитацией")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--tick', type=float, default=1.0, help="период такта, секунд")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.tick))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""Таблица эндшпиля для зоны размещения.
+
+Позиция в начале хода описывается содержимым зоны размещения и игроком,
+который ходит. Для каждой позиции, где в зоне не меньше min_filled фигур,
+таблица хранит точный исход для ходящего (победа, ничья, поражение) при
+приземлении его фигуры в каждую из колонок. По исходам колонок для
+падающей фигуры в любой клетке зоны перемещения выбирается лучший
+достижимый столбец и сдвиг к нему.
+
+Перебрать все позиции с заданным заполнением невозможно (их порядка
+C(42, 21)), поэтому генератор берет стартовые позиции из случайных
+партий и полностью решает их поддеревья с запоминанием. Решенные
+позиции всех поддеревьев попадают в таблицу.
+
+Ключ позиции - 64 бита: по 9 бит на колонку (высота и фигуры X в
+строках 4-9) и бит игрока. Зеркальные позиции хранятся один раз - по
+меньшему из двух ключей. Файл - заголовок, отсортированный массив
+ключей и массив исходов; поиск - бинарный по mmap.
+
+Запуск: python tablebase.py endgame.tb --min-filled 36 --positions 2000 --workers 8
+"""
+
+import argparse
+import bisect
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from bitboard import STRIDE, find_win_line
+from engine import GameCore, GRID_WIDTH, GRID_HEIGHT, MOVE_ZONE_ROWS, PLACEMENT_CELLS, ACTIONS, STAY
+
+MAGIC = b'GTTB'
+VERSION = 1
+
+# Заголовок: сигнатура, версия, min_filled, число позиций, время построения (с выравниванием до 32 байт)
+HEADER = struct.Struct('<4sHHQd8x')
+
+# Исход для ходящего при приземлении в колонку (2 бита на колонку)
+LOSS = 0
+DRAW = 1
+WIN = 2
+FULL = 3  # колонка заполнена, в нее ходить нельзя
+
+RESULTS = {LOSS: 'loss', DRAW: 'draw', WIN: 'win'}
+
+ZONE_ROWS = GRID_HEIGHT - MOVE_ZONE_ROWS
+COLUMN_BITS = 9
+COLUMN_MASK = (1 << COLUMN_BITS) - 1
+PLAYER_BIT = 1 << 63
+
+# Номер пакета смешивается с общим зерном, как в tournament.py
+SEED_STRIDE = 1000003
+
+
+def column_field(height, x_column):
+    """Поле колонки в ключе: высота и фигуры X (бит j - строка MOVE_ZONE_ROWS + j)"""
+    return height | x_column << 3
+
+
+def make_key(fields, player):
+    """Ключ позиции по полям колонок и игроку"""
+    key = PLAYER_BIT if player == 'red' else 0
+    for col, field in enumerate(fields):
+        key |= field << (col * COLUMN_BITS)
+    return key
+
+
+def mirror_key(key):
+    """Ключ зеркальной (слева направо) позиции"""
+    mirrored = key & PLAYER_BIT
+    for col in range(GRID_WIDTH):
+        field = key >> (col * COLUMN_BITS) & COLUMN_MASK
+        mirrored |= field << ((GRID_WIDTH - 1 - col) * COLUMN_BITS)
+    return mirrored
+
+
+def mirror_outcomes(code):
+    """Исходы колонок в зеркальном порядке"""
+    mirrored = 0
+    for col in range(GRID_WIDTH):
+        mirrored |= (code >> (col * 2) & 3) << ((GRID_WIDTH - 1 - col) * 2)
+    return mirrored
+
+
+def canonical(key):
+    """(канонический ключ, отражена ли позиция)"""
+    mirrored = mirror_key(key)
+    if mirrored < key:
+        return mirrored, True
+    return key, False
+
+
+def core_key(core):
+    """Ключ позиции GameCore (фигуры в зоне размещения и ходящий игрок)"""
+    board = core.board
+    fields = []
+    for col in range(GRID_WIDTH):
+        x_column = 0
+        for j in range(ZONE_ROWS - core.heights[col], ZONE_ROWS):
+            if board[MOVE_ZONE_ROWS + j][col] == 'X':
+                x_column |= 1 << j
+        fields.append(column_field(core.heights[col], x_column))
+    return make_key(fields, core.current_player)
+
+
+def outcome_list(code):
+    """Исходы по колонкам из упакованного значения"""
+    return [code >> (col * 2) & 3 for col in range(GRID_WIDTH)]
+
+
+def drift_target(heights, row, col, action):
+    """Колонка фигуры после сдвига action со строки row (правило GameCore.step)"""
+    new_col = col + action
+    if not 0 <= new_col < GRID_WIDTH:
+        return col
+    # Сдвиг разрешен, только если клетка под новой колонкой свободна
+    if row + 1 >= MOVE_ZONE_ROWS and heights[new_col] >= ZONE_ROWS:
+        return col
+    return new_col
+
+
+def best_drift(outcomes, heights, row, col):
+    """(лучший исход, сдвиг) для фигуры в клетке (row, col) зоны перемещения.
+
+    Лучшие исходы считаются снизу вверх по строкам зоны перемещения;
+    фигура, вставшая на заполненную колонку в зоне перемещения, проигрывает.
+    """
+    def value(next_row, next_col):
+        if next_row >= MOVE_ZONE_ROWS:
+            return outcomes[next_col]
+        if next_row == MOVE_ZONE_ROWS - 1 and heights[next_col] >= ZONE_ROWS:
+            return LOSS
+        return below[next_col]
+
+    below = None
+    for r in range(MOVE_ZONE_ROWS - 1, row, -1):
+        below = [max(value(r + 1, drift_target(heights, r, c, action)) for action in ACTIONS)
+                 for c in range(GRID_WIDTH)]
+
+    # STAY первым: при равных исходах фигура не дергается
+    best = None
+    best_action = STAY
+    for action in (STAY,) + tuple(a for a in ACTIONS if a != STAY):
+        result = value(row + 1, drift_target(heights, row, col, action))
+        if best is None or result > best:
+            best = result
+            best_action = action
+    return best, best_action
+
+
+class Tablebase:
+    """Чтение таблицы через mmap"""
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise ValueError("таблица читается напрямую из памяти и требует little-endian")
+        self._file = open(path, 'rb')
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.min_filled, self.count, self.build_time = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError("это не таблица эндшпиля")
+        if version != VERSION:
+            raise ValueError(f"неподдерживаемая версия таблицы: {version}")
+
+        # Массивы читаются прямо из отображенного файла, без копирования
+        self._view = memoryview(self.data)
+        keys_end = HEADER.size + self.count * 8
+        self.keys = self._view[HEADER.size:keys_end].cast('Q')
+        self.values = self._view[keys_end:keys_end + self.count * 2].cast('H')
+
+    def close(self):
+        for view in (self.keys, self.values, self._view):
+            view.release()
+        self.data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def get(self, key):
+        """Упакованные исходы колонок по ключу (ориентация ключа) или None"""
+        key, mirrored = canonical(key)
+        keys = self.keys
+        index = bisect.bisect_left(keys, key)
+        if index == self.count or keys[index] != key:
+            return None
+        code = self.values[index]
+        return mirror_outcomes(code) if mirrored else code
+
+    def probe(self, core):
+        """Исходы по колонкам для ходящего игрока или None, если позиции нет в таблице"""
+        if core.game_over or core.filled < self.min_filled:
+            return None
+        code = self.get(core_key(core))
+        return None if code is None else outcome_list(code)
+
+    def lookup(self, core):
+        """(исход 'win' | 'draw' | 'loss', лучший сдвиг) для падающей фигуры или None"""
+        outcomes = self.probe(core)
+        if outcomes is None:
+            return None
+        piece = core.current_piece
+        if piece['row'] >= MOVE_ZONE_ROWS:
+            return RESULTS[outcomes[piece['col']]], STAY
+        value, action = best_drift(outcomes, core.heights, piece['row'], piece['col'])
+        return RESULTS[value], action
+
+
+class Solver:
+    """Полный перебор поддеревьев с запоминанием решенных позиций"""
+    def __init__(self):
+        # канонический ключ -> упакованные исходы колонок
+        self.solved = {}
+
+    def solve(self, mine, theirs, heights, filled, player, x_is_mine):
+        """Лучший исход для ходящего; mine/theirs - битовые доски, heights - список высот"""
+        x = mine if x_is_mine else theirs
+        fields = [column_field(heights[col], x >> (col * STRIDE + MOVE_ZONE_ROWS) & 0x3F)
+                  for col in range(GRID_WIDTH)]
+        key, mirrored = canonical(make_key(fields, player))
+        code = self.solved.get(key)
+        if code is not None:
+            return max(value for value in outcome_list(code) if value != FULL)
+
+        opponent = 'red' if player == 'blue' else 'blue'
+        code = 0
+        best = LOSS
+        for col in range(GRID_WIDTH):
+            height = heights[col]
+            if height >= ZONE_ROWS:
+                value = FULL
+            else:
+                row = GRID_HEIGHT - 1 - height
+                placed = mine | 1 << (col * STRIDE + row)
+                if find_win_line(placed, row, col):
+                    value = WIN
+                elif filled + 1 == PLACEMENT_CELLS:
+                    value = DRAW
+                else:
+                    heights[col] += 1
+                    value = WIN - self.solve(theirs, placed, heights, filled + 1, opponent, not x_is_mine)
+                    heights[col] -= 1
+                if value > best:
+                    best = value
+            code |= value << (col * 2)
+
+        self.solved[key] = mirror_outcomes(code) if mirrored else code
+        return best
+
+
+def seed_position(rng, min_filled):
+    """Случайная партия до min_filled фигур в зоне без завершения (или None)"""
+    core = GameCore()
+    while core.filled < min_filled:
+        open_cols = [col for col in range(GRID_WIDTH) if core.heights[col] < ZONE_ROWS]
+        col = rng.choice(open_cols)
+        core.current_piece['col'] = col
+        core.current_piece['row'] = core.landing_row(col)
+        core.place_piece()
+        if core.game_over:
+            return None
+    return core
+
+
+def solve_chunk(min_filled, positions, seed):
+    """Решить поддеревья positions стартовых позиций; вернуть отсортированные (ключ, исходы)"""
+    rng = random.Random(seed)
+    solver = Solver()
+    for _ in range(positions):
+        core = None
+        while core is None:
+            core = seed_position(rng, min_filled)
+        bits = {'X': 0, 'O': 0}
+        for row in range(MOVE_ZONE_ROWS, GRID_HEIGHT):
+            for col, piece in enumerate(core.board[row]):
+                if piece:
+                    bits[piece] |= 1 << (col * STRIDE + row)
+        piece = core.current_piece['type']
+        other = 'O' if piece == 'X' else 'X'
+        solver.solve(bits[piece], bits[other], list(core.heights), core.filled, core.current_player, piece == 'X')
+    return sorted(solver.solved.items())
+
+
+def write_table(path, items, min_filled, build_time=0.0):
+    """Запись отсортированных (ключ, исходы) в файл таблицы (атомарно, через временный файл)"""
+    temp = path + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, min_filled, len(items), build_time))
+        f.write(struct.pack(f'<{len(items)}Q', *(key for key, _ in items)))
+        f.write(struct.pack(f'<{len(items)}H', *(code for _, code in items)))
+    os.replace(temp, path)
+
+
+def read_items(path):
+    """Все записи файла таблицы"""
+    with Tablebase(path) as table:
+        return list(zip(table.keys.tolist(), table.values.tolist()))
+
+
+def build(path, min_filled, positions, workers=None, chunk_size=50, seed=0, progress=None):
+    """Построение таблицы. Готовые пакеты лежат в PATH.parts и при перезапуске не пересчитываются.
+
+    Содержимое пакета определяется min_filled, seed, размером пакетов, его
+    номером и числом позиций в нем - все это входит в имя файла, поэтому
+    перезапуск с другими --chunk или --positions не подхватит чужие пакеты
+    (при том же --chunk пересчитывается только последний, неполный пакет).
+
+    Возвращает (число позиций, размер файла, время построения).
+    """
+    start = time.perf_counter()
+    parts_dir = path + '.parts'
+    os.makedirs(parts_dir, exist_ok=True)
+
+    tasks = []
+    for index in range((positions + chunk_size - 1) // chunk_size):
+        size = min(chunk_size, positions - index * chunk_size)
+        part = os.path.join(parts_dir, f'{min_filled:02d}-{seed}-{chunk_size}-{index:05d}-{size}.tb')
+        tasks.append((part, size, seed * SEED_STRIDE + index))
+    pending = [task for task in tasks if not os.path.exists(task[0])]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(solve_chunk, min_filled, size, chunk_seed): part
+                   for part, size, chunk_seed in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            write_table(futures[future], future.result(), min_filled)
+            if progress:
+                progress(len(tasks) - len(pending) + done, len(tasks))
+
+    # Слияние пакетов: одинаковые позиции из разных пакетов имеют одинаковые исходы
+    merged = {}
+    for part, _, _ in tasks:
+        merged.update(read_items(part))
+    items = sorted(merged.items())
+    elapsed = time.perf_counter() - start
+    write_table(path, items, min_filled, elapsed)
+    return len(items), os.path.getsize(path), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Построение таблицы эндшпиля")
+    parser.add_argument('path', help="файл таблицы")
+    parser.add_argument('--min-filled', type=int, default=36, help="минимум фигур в зоне размещения")
+    parser.add_argument('--positions', type=int, default=2000, help="стартовых позиций из случайных партий")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="число процессов")
+    parser.add_argument('--chunk', type=int, default=50, help="стартовых позиций в одном пакете")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if not 0 < args.min_filled < PLACEMENT_CELLS:
+        parser.error(f"--min-filled должно быть от 1 до {PLACEMENT_CELLS - 1}")
+
+    def progress(done, total):
+        print(f"\rПакетов: {done}/{total}", end='', file=sys.stderr, flush=True)
+
+    count, size, elapsed = build(args.path, args.min_filled, args.positions, args.workers,
+                                 args.chunk, args.seed, progress)
+    print(file=sys.stderr)
+    print(f"Позиций: {count}, размер: {size / 1024:.1f} КБ ({size / max(count, 1):.1f} байт на позицию), "
+          f"построение: {elapsed:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Проверки протокола сервера матчей.
+
+Запуск: python -m unittest discover tests
+"""
+
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import MatchServer
+
+
+async def send(writer, message):
+    writer.write((json.dumps(message) + '\n').encode())
+    await writer.drain()
+
+
+async def read_until(reader, kind, ply=0):
+    """Первое сообщение типа kind (для тактов - с номером не меньше ply); ждет не дольше 5 с"""
+    while True:
+        message = json.loads(await asyncio.wait_for(reader.readline(), 5))
+        if message['type'] == kind and message.get('ply', 0) >= ply:
+            return message
+
+
+class MoveDirectionTest(unittest.TestCase):
+    def play(self, direction):
+        """Матч, в котором оба игрока шлют сдвиг direction; возвращает такт после 10-го"""
+        async def run():
+            server = MatchServer(tick_period=0.01)
+            listener = await server.start('127.0.0.1', 0)
+            port = listener.sockets[0].getsockname()[1]
+            clients = [await asyncio.open_connection('127.0.0.1', port) for _ in range(2)]
+            for reader, writer in clients:
+                await send(writer, {'type': 'join'})
+            for reader, writer in clients:
+                await read_until(reader, 'start')
+                await send(writer, {'type': 'move', 'dir': direction})
+
+            # Если такт матча упал на неверном сдвиге, следующих тактов не будет и ожидание прервется
+            tick = await read_until(clients[0][0], 'tick', ply=10)
+            for _, writer in clients:
+                writer.close()
+            listener.close()
+            # Даем серверу обработать отключения до закрытия цикла событий
+            await asyncio.sleep(0.05)
+            return tick
+        return asyncio.run(run())
+
+    def test_float_and_bool_directions_are_ignored(self):
+        # 1.0 и true равны 1, но не должны доходить до ядра и останавливать такты матча
+        for direction in (1.0, True, -1.0, False, '1'):
+            with self.subTest(direction=direction):
+                self.assertGreaterEqual(self.play(direction)['ply'], 10)
+
+    def test_integer_direction_is_accepted(self):
+        self.assertGreaterEqual(self.play(1)['ply'], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+"""Турнир ботов по круговой системе на нескольких процессах.
+
+Каждая пара ботов играет заданное число партий, половину - синими, половину -
+красными. Партии делятся на пакеты, пакеты раздаются процессам, а результаты
+суммируются по мере готовности: если процесс упадет, уже собранные пакеты
+останутся в итоге.
+
+Запуск: python tournament.py random greedy alphabeta:0.01 --games 200 --workers 8
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from bitboard import BitboardCore
+from bots import make_bot
+from engine import MOVE_ZONE_ROWS, STAY, END_REASONS
+
+# Номер пакета смешивается с общим зерном, чтобы каждый процесс получил свое
+SEED_STRIDE = 1000003
+
+
+def play_chunk(blue_spec, red_spec, games, seed):
+    """Сыграть пакет партий в процессе-исполнителе, вернуть суммарные счетчики"""
+    bots = {
+        'blue': make_bot(blue_spec, seed * 2),
+        'red': make_bot(red_spec, seed * 2 + 1),
+    }
+    winners = {'blue': 0, 'red': 0, 'draw': 0}
+    reasons = dict.fromkeys(END_REASONS, 0)
+    plies = 0
+
+    core = BitboardCore()
+    for _ in range(games):
+        core.reset()
+        while not core.game_over:
+            # Ниже зоны перемещения выбора нет, бота не спрашиваем
+            if core.current_piece['row'] < MOVE_ZONE_ROWS:
+                core.step(bots[core.current_player].choose_action(core))
+            else:
+                core.step(STAY)
+        winners[core.winner()] += 1
+        reasons[core.end_reason] += 1
+        plies += core.ply
+
+    return {
+        'blue': blue_spec,
+        'red': red_spec,
+        'games': games,
+        'winners': winners,
+        'reasons': reasons,
+        'plies': plies,
+    }
+
+
+def make_tasks(specs, games, chunk_size, seed):
+    """Пакеты (синий, красный, число партий, зерно) для всех пар и обоих цветов.
+
+    games - четное число: половина партий пары играется в каждом порядке цветов.
+    """
+    if games <= 0 or games % 2:
+        raise ValueError(f"число партий на пару должно быть четным и положительным: {games}")
+    tasks = []
+    for first, second in itertools.combinations(specs, 2):
+        for blue, red in ((first, second), (second, first)):
+            remaining = games // 2
+            while remaining > 0:
+                size = min(chunk_size, remaining)
+                tasks.append((blue, red, size, seed * SEED_STRIDE + len(tasks)))
+                remaining -= size
+    return tasks
+
+
+class Standings:
+    """Накопление результатов пакетов по мере их поступления"""
+    def __init__(self, specs):
+        self.specs = list(specs)
+        self.games = 0
+        self.plies = 0
+        self.reasons = dict.fromkeys(END_REASONS, 0)
+        # (бот, соперник) -> [победы, ничьи, поражения]
+        self.pairs = {}
+        for first, second in itertools.permutations(self.specs, 2):
+            self.pairs[first, second] = [0, 0, 0]
+
+    def add(self, result):
+        """Учесть результат одного пакета"""
+        blue = result['blue']
+        red = result['red']
+        winners = result['winners']
+        self.games += result['games']
+        self.plies += result['plies']
+        for reason, count in result['reasons'].items():
+            self.reasons[reason] += count
+
+        for bot, opponent, color, other in ((blue, red, 'blue', 'red'), (red, blue, 'red', 'blue')):
+            record = self.pairs[bot, opponent]
+            record[0] += winners[color]
+            record[1] += winners['draw']
+            record[2] += winners[other]
+
+    def totals(self, bot):
+        """Суммарные победы, ничьи и поражения бота против всех соперников"""
+        total = [0, 0, 0]
+        for (first, _), record in self.pairs.items():
+            if first == bot:
+                for i in range(3):
+                    total[i] += record[i]
+        return total
+
+    def to_dict(self, elapsed, failed_chunks):
+        """Итог в виде словаря для JSON"""
+        def rates(record):
+            games = sum(record) or 1
+            return {'win': record[0] / games, 'draw': record[1] / games, 'loss': record[2] / games,
+                    'games': sum(record)}
+
+        games = self.games or 1
+        return {
+            'games': self.games,
+            'elapsed': elapsed,
+            'games_per_sec': self.games / elapsed if elapsed else 0.0,
+            'plies_per_game': self.plies / games,
+            'failed_chunks': failed_chunks,
+            'end_reasons': {reason: count / games for reason, count in self.reasons.items()},
+            'bots': {bot: rates(self.totals(bot)) for bot in self.specs},
+            'pairs': {f"{first} vs {second}": rates(record) for (first, second), record in self.pairs.items()},
+        }
+
+
+def print_report(report):
+    """Текстовая таблица результатов"""
+    print(f"Партий: {report['games']}, {report['games_per_sec']:.1f} в секунду, "
+          f"в среднем {report['plies_per_game']:.1f} тактов")
+    reasons = report['end_reasons']
+    print(f"Завершение: 4 в ряд {reasons['line']:.1%}, зона перемещения {reasons['move_zone']:.1%}, "
+          f"поле заполнено {reasons['full']:.1%}")
+    print()
+    print(f"{'бот':<30} {'победы':>8} {'ничьи':>8} {'поражения':>10}")
+    for name, rates in list(report['bots'].items()) + list(report['pairs'].items()):
+        print(f"{name:<30} {rates['win']:>8.1%} {rates['draw']:>8.1%} {rates['loss']:>10.1%}")
+    if report['failed_chunks']:
+        print(f"\nПотеряно пакетов: {report['failed_chunks']}", file=sys.stderr)
+
+
+def run_tournament(specs, games, workers=None, chunk_size=20, seed=0, progress=None):
+    """Провести турнир, вернуть (Standings, время, число потерянных пакетов)"""
+    tasks = make_tasks(specs, games, chunk_size, seed)
+    standings = Standings(specs)
+    failed = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_chunk, *task) for task in tasks]
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                standings.add(future.result())
+            except BrokenProcessPool:
+                # Процесс-исполнитель упал: оставшиеся пакеты потеряны, собранное сохраняем
+                failed += 1
+            except Exception as error:
+                failed += 1
+                print(f"Пакет завершился с ошибкой: {error!r}", file=sys.stderr)
+            if progress:
+                progress(done, len(tasks), standings)
+
+    return standings, time.perf_counter() - start, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Круговой турнир ботов")
+    parser.add_argument('bots', nargs='+', help="боты: random, greedy, alphabeta[:секунд на такт]")
+    parser.add_argument('--games', type=int, default=100, help="партий на пару ботов (четное число)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="число процессов")
+    parser.add_argument('--chunk', type=int, default=20, help="партий в одном пакете")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help="сохранить итог в JSON")
+    args = parser.parse_args()
+
+    if len(set(args.bots)) < 2:
+        parser.error("нужно хотя бы два разных бота")
+    if args.games <= 0 or args.games % 2:
+        parser.error("--games должно быть четным и положительным: половина партий - синими, половина - красными")
+    for spec in args.bots:
+        try:
+            make_bot(spec)
+        except ValueError as error:
+            parser.error(str(error))
+
+    def progress(done, total, standings):
+        print(f"\rПакетов: {done}/{total}, партий: {standings.games}", end='', file=sys.stderr, flush=True)
+
+    standings, elapsed, failed = run_tournament(
+        args.bots, args.games, args.workers, args.chunk, args.seed, progress
+    )
+    print(file=sys.stderr)
+
+    report = standings.to_dict(elapsed, failed)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()